@@ -26,6 +26,18 @@ DETECT_MODEL_DIR = 'ch_PP-OCRv4_det_infer'
 # pp rec model dir
 REC_MODEL_DIR = 'ch_PP-OCRv4_rec_infer'
 
+# blank image check, pixels darker than this gray value are content
+BLANK_PIXEL_THRESHOLD = 200
+
+# blank image check, images with a lower ratio of content pixels are blank
+BLANK_CONTENT_RATIO = 0.0005
+
+# blank page check, max non-whitespace chars of the text layer (e.g. a page number)
+BLANK_PAGE_MAX_TEXT_CHARS = 8
+
+# blank page check of pages without a text layer, only pages with a lower ratio of content pixels are blank
+BLANK_SCANNED_PAGE_CONTENT_RATIO = 0.00002
+
 # pp rec char dict path
 REC_CHAR_DICT = 'ppocr_keys_v1.txt'
 
@@ -5,6 +5,7 @@ from typing import Callable, Iterator
 import fitz
 
 from magic_pdf.config.enums import SupportedPdfParseMethod
+from magic_pdf.data.raster_cache import PageRasterCache, render_page_raster
 from magic_pdf.data.schemas import PageInfo
 from magic_pdf.data.utils import fitz_doc_to_image
 from magic_pdf.filter import classify
@@ -21,6 +22,19 @@ class PageableData(ABC):
         """Get the pymudoc page."""
         pass
 
+    @abstractmethod
+    def get_raster(self, dpi, clip=None):
+        """Get the RGB raster of the page or of an area of the page.
+
+        Args:
+            dpi (float): the resolution to render with
+            clip (list[float] | None): [x0, y0, x1, y1] area to render, None means the whole page
+
+        Returns:
+            np.ndarray: the RGB image
+        """
+        pass
+
     @abstractmethod
     def get_page_info(self) -> PageInfo:
         """Get the page info of the page.
@@ -131,6 +145,15 @@ class Dataset(ABC):
         """
         pass
 
+    @abstractmethod
+    def get_raster_cache(self) -> PageRasterCache:
+        """Get the raster cache shared by the pages of this dataset.
+
+        Returns:
+            PageRasterCache: the raster cache
+        """
+        pass
+
 
 class PymuDocDataset(Dataset):
     def __init__(self, bits: bytes):
@@ -140,7 +163,8 @@ class PymuDocDataset(Dataset):
             bits (bytes): the bytes of the pdf
         """
         self._raw_fitz = fitz.open('pdf', bits)
-        self._records = [Doc(v) for v in self._raw_fitz]
+        self._raster_cache = PageRasterCache()
+        self._records = [Doc(v, self._raster_cache) for v in self._raw_fitz]
         self._data_bits = bits
         self._raw_data = bits
 
@@ -212,6 +236,14 @@ class PymuDocDataset(Dataset):
         """
         return PymuDocDataset(self._raw_data)
 
+    def get_raster_cache(self) -> PageRasterCache:
+        """Get the raster cache shared by the pages of this dataset.
+
+        Returns:
+            PageRasterCache: the raster cache
+        """
+        return self._raster_cache
+
 
 class ImageDataset(Dataset):
     def __init__(self, bits: bytes):
@@ -222,7 +254,8 @@ class ImageDataset(Dataset):
         """
         pdf_bytes = fitz.open(stream=bits).convert_to_pdf()
         self._raw_fitz = fitz.open('pdf', pdf_bytes)
-        self._records = [Doc(v) for v in self._raw_fitz]
+        self._raster_cache = PageRasterCache()
+        self._records = [Doc(v, self._raster_cache) for v in self._raw_fitz]
         self._raw_data = bits
         self._data_bits = pdf_bytes
 
@@ -293,11 +326,21 @@ class ImageDataset(Dataset):
         """
         return ImageDataset(self._raw_data)
 
+    def get_raster_cache(self) -> PageRasterCache:
+        """Get the raster cache shared by the pages of this dataset.
+
+        Returns:
+            PageRasterCache: the raster cache
+        """
+        return self._raster_cache
+
+
 class Doc(PageableData):
     """Initialized with pymudoc object."""
 
-    def __init__(self, doc: fitz.Page):
+    def __init__(self, doc: fitz.Page, raster_cache: PageRasterCache = None):
         self._doc = doc
+        self._raster_cache = raster_cache
 
     def get_image(self):
         """Return the image info.
@@ -309,8 +352,24 @@ class Doc(PageableData):
                 height: int
             }
         """
+        # 200dpi的分析图不进入raster缓存，截图需要216dpi，无法从中裁剪
         return fitz_doc_to_image(self._doc)
 
+    def get_raster(self, dpi, clip=None):
+        """Get the RGB raster of the page or of an area of the page, served
+        from the raster cache of the dataset when possible.
+
+        Args:
+            dpi (float): the resolution to render with
+            clip (list[float] | None): [x0, y0, x1, y1] area to render, None means the whole page
+
+        Returns:
+            np.ndarray: the RGB image
+        """
+        if self._raster_cache is not None:
+            return self._raster_cache.get(self._doc, dpi, clip)
+        return render_page_raster(self._doc, dpi, clip)
+
     def get_doc(self) -> fitz.Page:
         """Get the pymudoc object.
 
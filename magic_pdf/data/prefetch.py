@@ -0,0 +1,73 @@
+"""Render pages ahead of the models in background processes.
+
+fitz documents can not be shared between threads or processes, every worker
+opens its own handle from the pdf bytes of the dataset. This module is imported
+by the spawned workers, keep its imports light.
+"""
+import multiprocessing
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import Iterator
+
+import fitz
+
+from magic_pdf.data.utils import (fitz_doc_to_image, fitz_doc_to_image_size,
+                                  iter_page_images)
+
+_worker_doc = None
+
+
+def _init_worker(pdf_bytes: bytes):
+    global _worker_doc
+    _worker_doc = fitz.open('pdf', pdf_bytes)
+
+
+def _render_page(page_index: int) -> dict:
+    return fitz_doc_to_image(_worker_doc[page_index])
+
+
+def iter_page_images_prefetch(
+    dataset, start_page_id=0, end_page_id=None, prefetch_pages=0, workers=1
+) -> Iterator[tuple]:
+    """Same as `iter_page_images`, but the pages in range are rendered ahead in
+    `workers` background processes, at most `prefetch_pages` pages are rendered
+    or waiting to be consumed at any time.
+
+    Args:
+        dataset (Dataset): the dataset to walk
+        start_page_id (int, optional): the first page to rasterize. Defaults to 0.
+        end_page_id (int, optional): the last page to rasterize, None means the last page of dataset. Defaults to None.
+        prefetch_pages (int, optional): depth of the render-ahead queue, 0 disables prefetching. Defaults to 0.
+        workers (int, optional): number of render processes. Defaults to 1.
+
+    Yields:
+        tuple: (page index, {'img': numpy array or None, 'width': width, 'height': height})
+    """
+    if end_page_id is None or end_page_id < 0:
+        end_page_id = len(dataset) - 1
+
+    page_ids = [index for index in range(len(dataset)) if start_page_id <= index <= end_page_id]
+    if prefetch_pages <= 0 or workers <= 0 or len(page_ids) <= 1:
+        yield from iter_page_images(dataset, start_page_id, end_page_id)
+        return
+
+    # fork after torch/paddle have started their thread pools may dead lock, use spawn
+    mp_context = multiprocessing.get_context('spawn')
+    with ProcessPoolExecutor(
+        max_workers=min(workers, len(page_ids)),
+        mp_context=mp_context,
+        initializer=_init_worker,
+        initargs=(dataset.data_bits(),),
+    ) as executor:
+        pending = deque()
+        next_submit = 0
+        for index in range(len(dataset)):
+            if start_page_id <= index <= end_page_id:
+                while next_submit < len(page_ids) and len(pending) < prefetch_pages:
+                    pending.append(executor.submit(_render_page, page_ids[next_submit]))
+                    next_submit += 1
+                img_dict = pending.popleft().result()
+            else:
+                width, height = fitz_doc_to_image_size(dataset.get_page(index).get_doc())
+                img_dict = {'img': None, 'width': width, 'height': height}
+            yield index, img_dict
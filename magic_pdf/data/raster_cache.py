@@ -0,0 +1,154 @@
+from collections import OrderedDict, defaultdict
+
+import cv2
+import fitz
+import numpy as np
+
+
+# default byte budget of the rasters kept by one document
+DEFAULT_RASTER_CACHE_BYTES = 256 * 1024 * 1024
+
+# a page is rendered as a whole for crops only if it stays below this size
+MAX_FULL_PAGE_PIXELS = 4500 * 4500
+
+
+def render_page_raster(page: fitz.Page, dpi, clip=None) -> np.ndarray:
+    """Render the page, or the clip area of the page, to an RGB numpy array."""
+    mat = fitz.Matrix(dpi / 72, dpi / 72)
+    if clip is None:
+        pm = page.get_pixmap(matrix=mat, alpha=False)
+    else:
+        pm = page.get_pixmap(matrix=mat, clip=fitz.Rect(*clip), alpha=False)
+    return np.frombuffer(pm.samples, dtype=np.uint8).reshape(pm.height, pm.width, pm.n)[:, :, :3].copy()
+
+
+def _clip_key(clip):
+    if clip is None:
+        return None
+    return tuple(round(float(v), 2) for v in clip)
+
+
+class PageRasterCache:
+    """LRU cache of page rasters shared by the stages which render the pages
+    of one document.
+
+    Entries are keyed by (page_no, dpi, clip), clip is None for whole pages.
+    A region is cut out of a cached whole page raster when that raster has at
+    least the requested dpi, once a page has been asked for more than one region
+    at the same dpi the whole page is rendered and kept, so that the following
+    regions of the page do not render the page content again.
+    """
+
+    def __init__(self, max_bytes=DEFAULT_RASTER_CACHE_BYTES):
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._clip_misses = defaultdict(int)
+        self.hits = 0
+        self.misses = 0
+        self.derived = 0
+        self.evictions = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, page: fitz.Page, dpi, clip=None) -> np.ndarray:
+        """Get the RGB raster of the page, or of the clip area of the page.
+
+        Args:
+            page (fitz.Page): the pymupdf page
+            dpi (float): the resolution to render with
+            clip (list[float] | None): [x0, y0, x1, y1] in pdf coordinates, None means the whole page
+
+        Returns:
+            np.ndarray: RGB image, same size as page.get_pixmap(clip=clip, matrix=Matrix(dpi/72, dpi/72))
+        """
+        key = (page.number, dpi, _clip_key(clip))
+        if key in self._entries:
+            self.hits += 1
+            self._entries.move_to_end(key)
+            return self._entries[key]
+
+        if clip is not None:
+            img = self._crop_from_page(page, dpi, clip)
+            if img is not None:
+                self.derived += 1
+                return img
+
+        self.misses += 1
+        if clip is not None:
+            self._clip_misses[(page.number, dpi)] += 1
+            if self._clip_misses[(page.number, dpi)] > 1 and self._can_render_whole_page(page, dpi, clip):
+                self._put((page.number, dpi, None), render_page_raster(page, dpi))
+                img = self._crop_from_page(page, dpi, clip)
+                if img is not None:
+                    return img
+
+        img = render_page_raster(page, dpi, clip)
+        self._put(key, img)
+        return img
+
+    def stats(self) -> dict:
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'derived': self.derived,
+            'evictions': self.evictions,
+            'entries': len(self._entries),
+            'bytes': self._bytes,
+        }
+
+    def clear(self):
+        self._entries.clear()
+        self._clip_misses.clear()
+        self._bytes = 0
+
+    def _can_render_whole_page(self, page: fitz.Page, dpi, clip) -> bool:
+        # clip坐标与旋转后的页面坐标不一致，旋转页面不走整页裁剪
+        if page.rotation != 0 or not page.rect.contains(fitz.Rect(*clip)):
+            return False
+        scale = dpi / 72
+        return page.rect.width * scale * page.rect.height * scale <= MAX_FULL_PAGE_PIXELS
+
+    def _crop_from_page(self, page: fitz.Page, dpi, clip):
+        if page.rotation != 0 or not page.rect.contains(fitz.Rect(*clip)):
+            return None
+
+        # 选择dpi不低于请求值的最小整页图
+        source_dpi = None
+        for page_no, cached_dpi, cached_clip in self._entries.keys():
+            if page_no == page.number and cached_clip is None and cached_dpi >= dpi:
+                if source_dpi is None or cached_dpi < source_dpi:
+                    source_dpi = cached_dpi
+        if source_dpi is None:
+            return None
+
+        source_key = (page.number, source_dpi, None)
+        self._entries.move_to_end(source_key)
+        source_img = self._entries[source_key]
+
+        target = (fitz.Rect(*clip) * fitz.Matrix(dpi / 72, dpi / 72)).irect
+        source = (fitz.Rect(*clip) * fitz.Matrix(source_dpi / 72, source_dpi / 72)).irect
+        x0 = min(max(source.x0, 0), source_img.shape[1])
+        y0 = min(max(source.y0, 0), source_img.shape[0])
+        x1 = min(max(source.x1, x0), source_img.shape[1])
+        y1 = min(max(source.y1, y0), source_img.shape[0])
+        if x1 <= x0 or y1 <= y0 or target.width <= 0 or target.height <= 0:
+            return None
+
+        img = source_img[y0:y1, x0:x1]
+        if img.shape[1] != target.width or img.shape[0] != target.height:
+            img = cv2.resize(img, (target.width, target.height), interpolation=cv2.INTER_AREA)
+        return np.ascontiguousarray(img)
+
+    def _put(self, key, img: np.ndarray):
+        if key in self._entries:
+            self._bytes -= self._entries.pop(key).nbytes
+        if img.nbytes > self.max_bytes:
+            return
+        self._entries[key] = img
+        self._bytes += img.nbytes
+        while self._bytes > self.max_bytes:
+            _, evicted = self._entries.popitem(last=False)
+            self._bytes -= evicted.nbytes
+            self.evictions += 1
@@ -1,4 +1,7 @@
 
+import re
+from typing import Iterator, Optional
+
 import fitz
 import numpy as np
 
@@ -30,3 +33,138 @@ def fitz_doc_to_image(doc, dpi=200) -> dict:
     img_dict = {'img': img, 'width': pm.width, 'height': pm.height}
 
     return img_dict
+
+
+def fitz_doc_to_image_size(doc, dpi=200) -> tuple:
+    """Compute the size of the image `fitz_doc_to_image` would produce,
+    without rendering the page.
+
+    Args:
+        doc (_type_): pymudoc page
+        dpi (int, optional): reset the dpi of dpi. Defaults to 200.
+
+    Returns:
+        tuple: (width, height)
+    """
+    mat = fitz.Matrix(dpi / 72, dpi / 72)
+    irect = (doc.rect * mat).irect
+
+    # keep consistent with the fallback in fitz_doc_to_image
+    if irect.width > 4500 or irect.height > 4500:
+        irect = doc.rect.irect
+
+    return irect.width, irect.height
+
+
+def iter_page_images(dataset, start_page_id=0, end_page_id=None) -> Iterator[tuple]:
+    """Walk the dataset and rasterize only the pages in [start_page_id,
+    end_page_id].
+
+    Args:
+        dataset (Dataset): the dataset to walk
+        start_page_id (int, optional): the first page to rasterize. Defaults to 0.
+        end_page_id (int, optional): the last page to rasterize, None means the last page of dataset. Defaults to None.
+
+    Yields:
+        tuple: (page index, {'img': numpy array or None, 'width': width, 'height': height}),
+            the img of the pages out of range is None, their size is computed from page.rect
+    """
+    if end_page_id is None or end_page_id < 0:
+        end_page_id = len(dataset) - 1
+
+    for index in range(len(dataset)):
+        page_data = dataset.get_page(index)
+        if start_page_id <= index <= end_page_id:
+            img_dict = page_data.get_image()
+        else:
+            width, height = fitz_doc_to_image_size(page_data.get_doc())
+            img_dict = {'img': None, 'width': width, 'height': height}
+        yield index, img_dict
+
+
+def fitz_doc_to_text_lines(doc, width, height) -> list:
+    """Get the text lines of the pdf text layer, in the coordinates of the
+    page image of size (width, height).
+
+    Args:
+        doc (_type_): pymudoc page
+        width (int): width of the page image
+        height (int): height of the page image
+
+    Returns:
+        list: [{'bbox': [x0, y0, x1, y1], 'text': str}], empty for rotated pages
+    """
+    # 旋转页面的文本坐标与页面图片不一致
+    if doc.rotation != 0 or doc.rect.width <= 0 or doc.rect.height <= 0:
+        return []
+    scale_x = width / doc.rect.width
+    scale_y = height / doc.rect.height
+
+    text_lines = []
+    text_blocks = doc.get_text('dict', flags=fitz.TEXTFLAGS_TEXT)['blocks']
+    for block in text_blocks:
+        for line in block['lines']:
+            text = ''.join(span['text'] for span in line['spans']).strip()
+            if not text:
+                continue
+            x0, y0, x1, y1 = line['bbox']
+            text_lines.append({
+                'bbox': [x0 * scale_x, y0 * scale_y, x1 * scale_x, y1 * scale_y],
+                'text': text,
+            })
+    return text_lines
+
+
+# TeX、MathType、Office等常见数学字体
+MATH_FONT_PATTERN = re.compile(
+    r'CMMI|CMSY|CMEX|CMBSY|MSBM|MSAM|EUFM|RSFS|ESINT|STIX|MTMI|MTSY|MTEX|'
+    r'Math|Symbol|Euclid',
+    re.IGNORECASE,
+)
+
+# 数学运算符、数学字母数字符号等unicode区段
+MATH_CHAR_RANGES = (
+    (0x2200, 0x22FF),  # Mathematical Operators
+    (0x27C0, 0x27EF),  # Miscellaneous Mathematical Symbols-A
+    (0x2980, 0x2AFF),  # Miscellaneous Mathematical Symbols-B, Supplemental Mathematical Operators
+    (0x1D400, 0x1D7FF),  # Mathematical Alphanumeric Symbols
+)
+
+# Type3字体的名称不能说明字形内容
+TYPE3_FONT_PATTERN = re.compile(r'^T3|Type3', re.IGNORECASE)
+
+
+def fitz_doc_has_math(doc, min_text_chars=50) -> Optional[bool]:
+    """Check the text layer of the page for math, by the font names and the
+    unicode ranges of the chars.
+
+    Args:
+        doc (_type_): pymudoc page
+        min_text_chars (int, optional): pages with fewer text chars have no usable text layer. Defaults to 50.
+
+    Returns:
+        Optional[bool]: True if the text layer has math, False if it has none,
+            None if the text layer can not tell, e.g. scanned pages, pages with images or Type3 fonts
+    """
+    text_chars = 0
+    unknown_font = False
+    text_blocks = doc.get_text('dict', flags=fitz.TEXTFLAGS_TEXT)['blocks']
+    for block in text_blocks:
+        for line in block['lines']:
+            for span in line['spans']:
+                if MATH_FONT_PATTERN.search(span['font']):
+                    return True
+                if TYPE3_FONT_PATTERN.search(span['font']):
+                    unknown_font = True
+                for char in span['text']:
+                    code = ord(char)
+                    if any(start <= code <= end for start, end in MATH_CHAR_RANGES):
+                        return True
+                text_chars += len(span['text'].strip())
+
+    if text_chars < min_text_chars or unknown_font:
+        return None
+    # 图片中可能包含公式，交给模型判断
+    if len(doc.get_images()) > 0:
+        return None
+    return False
@@ -1,9 +1,10 @@
 # Copyright (c) Opendatalab. All rights reserved.
-import torch
 import gc
 
 
 def clean_memory():
+    import torch
+
     if torch.cuda.is_available():
         torch.cuda.empty_cache()
         torch.cuda.ipc_collect()
@@ -1,5 +1,6 @@
 """根据bucket的名字返回对应的s3 AK， SK，endpoint三元组."""
 
+import copy
 import json
 import os
 
@@ -7,24 +8,55 @@ from loguru import logger
 
 from magic_pdf.config.constants import MODEL_NAME
 from magic_pdf.libs.commons import parse_bucket_key
+from magic_pdf.libs.hash_utils import compute_md5
 
 # 定义配置文件名常量
 CONFIG_FILE_NAME = os.getenv('MINERU_TOOLS_CONFIG_JSON', 'magic-pdf.json')
 
 
-def read_config():
+# 已解析的配置，按(文件路径, 修改时间, 大小)缓存，配置文件被修改后自动重新读取
+_config_cache = {}
+
+
+def get_config_file():
+    """The path of magic-pdf.json, MINERU_TOOLS_CONFIG_JSON or relative to the home directory."""
     if os.path.isabs(CONFIG_FILE_NAME):
-        config_file = CONFIG_FILE_NAME
-    else:
-        home_dir = os.path.expanduser('~')
-        config_file = os.path.join(home_dir, CONFIG_FILE_NAME)
+        return CONFIG_FILE_NAME
+    home_dir = os.path.expanduser('~')
+    return os.path.join(home_dir, CONFIG_FILE_NAME)
+
 
-    if not os.path.exists(config_file):
+def get_config_identity():
+    """The path and the md5 of the content of magic-pdf.json, md5 is None if the file does not exist.
+
+    Used to check that another process parses with the same config as this one.
+    """
+    config_file = get_config_file()
+    try:
+        with open(config_file, 'rb') as f:
+            config_md5 = compute_md5(f.read())
+    except FileNotFoundError:
+        config_md5 = None
+    return {'path': config_file, 'md5': config_md5}
+
+
+def read_config():
+    config_file = get_config_file()
+
+    try:
+        stat = os.stat(config_file)
+    except FileNotFoundError:
         raise FileNotFoundError(f'{config_file} not found')
 
-    with open(config_file, 'r', encoding='utf-8') as f:
-        config = json.load(f)
-    return config
+    cache_key = (config_file, stat.st_mtime_ns, stat.st_size)
+    config = _config_cache.get(cache_key)
+    if config is None:
+        with open(config_file, 'r', encoding='utf-8') as f:
+            config = json.load(f)
+        _config_cache.clear()
+        _config_cache[cache_key] = config
+    # 调用方会修改返回的配置，每次返回副本
+    return copy.deepcopy(config)
 
 
 def get_s3_config(bucket_name: str):
@@ -77,6 +109,16 @@ def get_local_layoutreader_model_dir():
         return layoutreader_model_dir
 
 
+def get_reading_order_config():
+    config = read_config()
+    reading_order_config = config.get('reading-order-config')
+    if reading_order_config is None:
+        logger.warning(f"'reading-order-config' not found in {CONFIG_FILE_NAME}, use '16' as default batch_size and 'greedy' as default decoder")
+        return json.loads('{"batch_size": 16, "decoder": "greedy"}')
+    else:
+        return reading_order_config
+
+
 def get_device():
     config = read_config()
     device = config.get('device-mode')
@@ -117,5 +159,82 @@ def get_formula_config():
         return formula_config
 
 
+def get_ocr_config():
+    config = read_config()
+    ocr_config = config.get('ocr-config')
+    if ocr_config is None:
+        logger.warning(f"'ocr-config' not found in {CONFIG_FILE_NAME}, use 'True' as default")
+        return json.loads('{"batch_rec": true, "text_layer_det": true}')
+    else:
+        return ocr_config
+
+
+def get_render_config():
+    config = read_config()
+    render_config = config.get('render-config')
+    if render_config is None:
+        logger.warning(f"'render-config' not found in {CONFIG_FILE_NAME}, use '0' as default prefetch_pages")
+        return json.loads('{"prefetch_pages": 0, "workers": 1, "raster_cache_mb": 256}')
+    else:
+        return render_config
+
+
+def get_concurrency_config():
+    config = read_config()
+    concurrency_config = config.get('concurrency-config')
+    if concurrency_config is None:
+        logger.warning(f"'concurrency-config' not found in {CONFIG_FILE_NAME}, use '1' as default stage_workers")
+        return json.loads('{"stage_workers": 1}')
+    else:
+        return concurrency_config
+
+
+def get_inference_cache_config():
+    config = read_config()
+    inference_cache_config = config.get('inference-cache-config')
+    if inference_cache_config is None:
+        logger.warning(f"'inference-cache-config' not found in {CONFIG_FILE_NAME}, use 'False' as default")
+        return json.loads('{"enable": false}')
+    else:
+        return inference_cache_config
+
+
+def get_page_cache_config():
+    config = read_config()
+    page_cache_config = config.get('page-cache-config')
+    if page_cache_config is None:
+        logger.warning(f"'page-cache-config' not found in {CONFIG_FILE_NAME}, use 'False' as default")
+        return json.loads('{"enable": false}')
+    else:
+        return page_cache_config
+
+
+def get_threads_config():
+    config = read_config()
+    threads_config = config.get('threads-config')
+    if threads_config is None:
+        logger.warning(f"'threads-config' not found in {CONFIG_FILE_NAME}, use the thread defaults of each backend")
+    return threads_config
+
+
+def get_model_registry_config():
+    config = read_config()
+    model_registry_config = config.get('model-registry-config')
+    if model_registry_config is None:
+        logger.warning(f"'model-registry-config' not found in {CONFIG_FILE_NAME}, use '0' as default max_memory_mb, no limit")
+        return json.loads('{"max_memory_mb": 0, "max_pipelines": 0}')
+    else:
+        return model_registry_config
+
+
+def get_daemon_config():
+    config = read_config()
+    daemon_config = config.get('daemon-config')
+    if daemon_config is None:
+        return json.loads('{"enable": true, "socket_path": "~/.cache/magic_pdf/magic-pdf.sock"}')
+    else:
+        return daemon_config
+
+
 if __name__ == '__main__':
     ak, sk, endpoint = get_s3_config('llm-raw')
@@ -4,10 +4,20 @@ import fitz
 import numpy as np
 from PIL import Image
 from magic_pdf.data.data_reader_writer import DataWriter
+from magic_pdf.data.dataset import PageableData
 from magic_pdf.libs.commons import join_path
 from magic_pdf.libs.hash_utils import compute_sha256
 
 
+def get_clip_pixmap(bbox: tuple, page, zoom=3) -> fitz.Pixmap:
+    """Render the bbox area of the page with the zoom factor, the pages of a
+    dataset are served from the raster cache of the dataset."""
+    if isinstance(page, PageableData):
+        img = page.get_raster(zoom * 72, clip=bbox)
+        return fitz.Pixmap(fitz.csRGB, img.shape[1], img.shape[0], img.tobytes(), False)
+    return page.get_pixmap(clip=fitz.Rect(*bbox), matrix=fitz.Matrix(zoom, zoom))
+
+
 def cut_image(bbox: tuple, page_num: int, page: fitz.Page, return_path, imageWriter: DataWriter):
     """从第page_num页的page中，根据bbox进行裁剪出一张jpg图片，返回图片路径 save_path：需要同时支持s3和本地,
     图片存放在save_path下，文件名是:
@@ -21,12 +31,8 @@ def cut_image(bbox: tuple, page_num: int, page: fitz.Page, return_path, imageWri
     # 新版本生成平铺路径
     img_hash256_path = f'{compute_sha256(img_path)}.jpg'
 
-    # 将坐标转换为fitz.Rect对象
-    rect = fitz.Rect(*bbox)
-    # 配置缩放倍数为3倍
-    zoom = fitz.Matrix(3, 3)
-    # 截取图片
-    pix = page.get_pixmap(clip=rect, matrix=zoom)
+    # 配置缩放倍数为3倍, 截取图片
+    pix = get_clip_pixmap(bbox, page, zoom=3)
 
     byte_data = pix.tobytes(output='jpeg', jpg_quality=95)
 
@@ -37,6 +43,17 @@ def cut_image(bbox: tuple, page_num: int, page: fitz.Page, return_path, imageWri
 
 def cut_image_to_pil_image(bbox: tuple, page: fitz.Page, mode="pillow"):
 
+    if isinstance(page, PageableData):
+        # 从页面的raster缓存中获取，同一页多次截图时不必重复渲染
+        img = page.get_raster(3 * 72, clip=bbox)
+        if mode == "cv2":
+            image_result = cv2.cvtColor(img, cv2.COLOR_RGB2BGR)
+        elif mode == "pillow":
+            image_result = Image.fromarray(img)
+        else:
+            raise ValueError(f"mode: {mode} is not supported.")
+        return image_result
+
     # 将坐标转换为fitz.Rect对象
     rect = fitz.Rect(*bbox)
     # 配置缩放倍数为3倍
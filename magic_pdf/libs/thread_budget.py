@@ -0,0 +1,87 @@
+"""进程级cpu线程预算，统一设置torch、paddle、opencv等后端的线程数."""
+
+import os
+
+from loguru import logger
+
+# 这些环境变量只对之后才初始化线程池的库生效，同时会被子进程继承
+THREAD_ENV_VARS = ['OMP_NUM_THREADS', 'MKL_NUM_THREADS', 'OPENBLAS_NUM_THREADS', 'NUMEXPR_NUM_THREADS']
+
+_thread_budget = None
+
+
+def compute_thread_budget(threads_config: dict, stage_workers=1) -> dict:
+    """Compute the thread counts of every backend.
+
+    Args:
+        threads_config (dict): the threads-config of magic-pdf.json,
+            {"total_threads": int, 0 means cpu count / worker_processes, "worker_processes": int, "interop_threads": int}
+        stage_workers (int, optional): number of model stages running concurrently. Defaults to 1.
+
+    Returns:
+        dict: the thread counts
+    """
+    total_threads = int(threads_config.get('total_threads') or 0)
+    if total_threads <= 0:
+        worker_processes = max(1, int(threads_config.get('worker_processes') or 1))
+        total_threads = max(1, (os.cpu_count() or 1) // worker_processes)
+    stage_workers = max(1, int(stage_workers or 1))
+    # 并发执行的阶段平分进程的线程预算
+    stage_threads = max(1, total_threads // stage_workers)
+    return {
+        'total_threads': total_threads,
+        'stage_workers': stage_workers,
+        'torch_threads': stage_threads,
+        'torch_interop_threads': max(1, int(threads_config.get('interop_threads') or 1)),
+        'paddle_threads': stage_threads,
+        'opencv_threads': stage_threads,
+    }
+
+
+def apply_thread_budget(threads_config: dict, stage_workers=1):
+    """Apply the thread budget to torch, paddle and opencv of this process and
+    log the effective settings.
+
+    Nothing is changed when threads_config is None, each backend keeps its own
+    default then.
+
+    Returns:
+        dict | None: the applied thread counts
+    """
+    global _thread_budget
+    if threads_config is None:
+        return None
+
+    budget = compute_thread_budget(threads_config, stage_workers)
+    for env_var in THREAD_ENV_VARS:
+        os.environ[env_var] = str(budget['torch_threads'])
+
+    try:
+        import torch
+        torch.set_num_threads(budget['torch_threads'])
+        try:
+            torch.set_num_interop_threads(budget['torch_interop_threads'])
+        except RuntimeError:
+            # 已经执行过并行计算后不能再修改inter-op线程数
+            budget['torch_interop_threads'] = torch.get_num_interop_threads()
+    except ImportError:
+        pass
+
+    try:
+        import cv2
+        cv2.setNumThreads(budget['opencv_threads'])
+    except ImportError:
+        pass
+
+    _thread_budget = budget
+    logger.info(f'thread budget: {budget}')
+    return budget
+
+
+def get_thread_budget():
+    """Get the applied thread budget, None if no budget was applied.
+
+    paddle reads its thread count when a predictor is created, so the paddle
+    models take ``paddle_threads`` from here at init time.
+    """
+    return _thread_budget
@@ -1,3 +1,4 @@
+import copy
 import os
 import time
 
@@ -5,30 +6,36 @@ import fitz
 import numpy as np
 from loguru import logger
 
-# 关闭paddle的信号处理
-import paddle
-paddle.disable_signal_handler()
-
 os.environ['NO_ALBUMENTATIONS_UPDATE'] = '1'  # 禁止albumentations检查更新
 os.environ['YOLO_VERBOSE'] = 'False'  # disable yolo logger
 
-try:
-    import torchtext
-
-    if torchtext.__version__ >= '0.18.0':
-        torchtext.disable_torchtext_deprecation_warning()
-except ImportError:
-    pass
-
 import magic_pdf.model as model_config
+from magic_pdf.config.constants import (BLANK_PAGE_MAX_TEXT_CHARS,
+                                        BLANK_SCANNED_PAGE_CONTENT_RATIO)
 from magic_pdf.data.dataset import Dataset
+from magic_pdf.data.prefetch import iter_page_images_prefetch
+from magic_pdf.data.utils import fitz_doc_has_math, fitz_doc_to_text_lines
 from magic_pdf.libs.clean_memory import clean_memory
-from magic_pdf.libs.config_reader import (get_device, get_formula_config,
+from magic_pdf.libs.config_reader import (get_concurrency_config, get_device,
+                                          get_formula_config,
+                                          get_inference_cache_config,
                                           get_layout_config,
                                           get_local_models_dir,
-                                          get_table_recog_config)
+                                          get_model_registry_config,
+                                          get_ocr_config,
+                                          get_page_cache_config,
+                                          get_render_config,
+                                          get_table_recog_config,
+                                          get_threads_config)
+from magic_pdf.libs.thread_budget import apply_thread_budget
+from magic_pdf.model.inference_cache import (InferenceResultCache,
+                                             PageResultCache,
+                                             get_inference_result_cache,
+                                             get_page_result_cache)
 from magic_pdf.model.model_list import MODEL
+from magic_pdf.model.model_registry import ModelRegistry
 from magic_pdf.model.operators import InferenceResult
+from magic_pdf.model.sub_modules.model_utils import is_blank_image
 
 
 def dict_compare(d1, d2):
@@ -88,13 +95,30 @@ def load_images_from_pdf(
 
 class ModelSingleton:
     _instance = None
-    _models = {}
+    _registry = None
 
     def __new__(cls, *args, **kwargs):
         if cls._instance is None:
             cls._instance = super().__new__(cls)
         return cls._instance
 
+    @property
+    def registry(self) -> ModelRegistry:
+        """The registry of the model pipelines, at most max_pipelines of the
+        model-registry-config are kept.
+
+        The atom models of the pipelines are shared and accounted by
+        AtomModelSingleton, so the memory of the pipelines is not measured here.
+        """
+        if ModelSingleton._registry is None:
+            registry_config = get_model_registry_config()
+            ModelSingleton._registry = ModelRegistry(
+                'model pipeline registry',
+                max_entries=int(registry_config.get('max_pipelines', 0)),
+                measure=False,
+            )
+        return ModelSingleton._registry
+
     def get_model(
         self,
         ocr: bool,
@@ -105,16 +129,104 @@ class ModelSingleton:
         table_enable=None,
     ):
         key = (ocr, show_log, lang, layout_model, formula_enable, table_enable)
-        if key not in self._models:
-            self._models[key] = custom_model_init(
-                ocr=ocr,
-                show_log=show_log,
-                lang=lang,
-                layout_model=layout_model,
-                formula_enable=formula_enable,
-                table_enable=table_enable,
-            )
-        return self._models[key]
+        return self.registry.get(key, lambda: custom_model_init(
+            ocr=ocr,
+            show_log=show_log,
+            lang=lang,
+            layout_model=layout_model,
+            formula_enable=formula_enable,
+            table_enable=table_enable,
+        ))
+
+
+def init_backends():
+    """Import and configure the inference backends, called before the first
+    model is created.
+
+    paddle and torch take seconds to import, they are kept out of the module
+    imports so that the cli and the jobs which do not run the models start
+    quickly.
+    """
+    # 关闭paddle的信号处理
+    import paddle
+    paddle.disable_signal_handler()
+
+    try:
+        import torchtext
+
+        if torchtext.__version__ >= '0.18.0':
+            torchtext.disable_torchtext_deprecation_warning()
+    except ImportError:
+        pass
+
+
+def resolve_pek_configs(layout_model=None, formula_enable=None, table_enable=None):
+    """Read the layout, formula and table configs of magic-pdf.json and apply
+    the overrides of the doc_analyze arguments.
+
+    Returns:
+        tuple: (layout_config, formula_config, table_config)
+    """
+    layout_config = get_layout_config()
+    if layout_model is not None:
+        layout_config['model'] = layout_model
+
+    formula_config = get_formula_config()
+    if formula_enable is not None:
+        formula_config['enable'] = formula_enable
+
+    table_config = get_table_recog_config()
+    if table_enable is not None:
+        table_config['enable'] = table_enable
+
+    return layout_config, formula_config, table_config
+
+
+def _get_weights_identity(models_dir: str) -> dict:
+    """The weight paths of model_configs.yaml with their mtime and size, so
+    that replaced weights change the identity."""
+    import yaml
+
+    config_path = os.path.join(
+        os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'resources', 'model_config', 'model_configs.yaml'
+    )
+    with open(config_path, 'r', encoding='utf-8') as f:
+        weights = yaml.load(f, Loader=yaml.FullLoader)['weights']
+
+    weights_identity = {}
+    for model_name, weight_path in weights.items():
+        try:
+            stat = os.stat(os.path.join(models_dir, weight_path))
+            weights_identity[model_name] = [weight_path, stat.st_mtime_ns, stat.st_size]
+        except OSError:
+            weights_identity[model_name] = [weight_path, None, None]
+    return weights_identity
+
+
+def get_model_config_identity(ocr: bool, lang=None, layout_model=None, formula_enable=None, table_enable=None) -> dict:
+    """The resolved settings which decide the results of doc_analyze.
+
+    The doc_analyze arguments are usually None and the real settings come from
+    magic-pdf.json, the identity holds the resolved configs, the device and the
+    weights, so that the cached results are not served after any of them changes.
+
+    Returns:
+        dict: json serializable identity of the model config
+    """
+    identity = {'model_mode': model_config.__model_mode__, 'ocr': ocr, 'lang': lang}
+    if model_config.__model_mode__ == 'full':
+        layout_config, formula_config, table_config = resolve_pek_configs(layout_model, formula_enable, table_enable)
+        models_dir = get_local_models_dir()
+        identity.update({
+            'device': get_device(),
+            'layout_config': layout_config,
+            'formula_config': formula_config,
+            'table_config': table_config,
+            'ocr_config': get_ocr_config(),
+            'models_dir': models_dir,
+            'weights': _get_weights_identity(models_dir),
+        })
+    return identity
 
 
 def custom_model_init(
@@ -139,6 +251,10 @@ def custom_model_init(
 
     if model_config.__use_inside_model__:
         model_init_start = time.time()
+        # 线程相关的环境变量需在导入paddle、torch等后端之前设置
+        stage_workers = get_concurrency_config().get('stage_workers', 1) if model == MODEL.PEK else 1
+        apply_thread_budget(get_threads_config(), stage_workers)
+        init_backends()
         if model == MODEL.Paddle:
             from magic_pdf.model.pp_structure_v2 import CustomPaddleModel
 
@@ -150,17 +266,13 @@ def custom_model_init(
             local_models_dir = get_local_models_dir()
             device = get_device()
 
-            layout_config = get_layout_config()
-            if layout_model is not None:
-                layout_config['model'] = layout_model
+            layout_config, formula_config, table_config = resolve_pek_configs(
+                layout_model, formula_enable, table_enable
+            )
 
-            formula_config = get_formula_config()
-            if formula_enable is not None:
-                formula_config['enable'] = formula_enable
+            ocr_config = get_ocr_config()
 
-            table_config = get_table_recog_config()
-            if table_enable is not None:
-                table_config['enable'] = table_enable
+            concurrency_config = get_concurrency_config()
 
             model_input = {
                 'ocr': ocr,
@@ -170,6 +282,8 @@ def custom_model_init(
                 'table_config': table_config,
                 'layout_config': layout_config,
                 'formula_config': formula_config,
+                'ocr_config': ocr_config,
+                'concurrency_config': concurrency_config,
                 'lang': lang,
             }
 
@@ -186,6 +300,66 @@ def custom_model_init(
     return custom_model
 
 
+def is_blank_page(img, page: fitz.Page) -> bool:
+    """A page is blank if its image is almost white and its text layer holds
+    no more than a few chars, such as a page number.
+
+    A page without a text layer can not be confirmed by its text, it is blank
+    only if its image has almost no content pixels at all, so that a scanned
+    page holding a short line or a page number is still analyzed.
+    """
+    if not is_blank_image(img):
+        return False
+    page_text = ''.join(page.get_text().split())
+    if not page_text:
+        return is_blank_image(img, content_ratio=BLANK_SCANNED_PAGE_CONTENT_RATIO)
+    return len(page_text) <= BLANK_PAGE_MAX_TEXT_CHARS
+
+
+def analyze_pages(custom_model, images: list, page_ids: list, model_json: list, formula_queue=None,
+                  text_lines_list=None, math_hints=None):
+    """Analyze a group of in-range pages and fill ``layout_dets`` of
+    ``model_json`` in place.
+
+    When more than one page is given the layout detection of the whole group
+    runs as a single batched call, concurrently with the formula detection of
+    the group, the remaining stages still run per page.
+    If ``formula_queue`` is given the formula crops are only queued, their latex
+    is filled in when the queue is flushed. ``text_lines_list`` holds the text
+    layer lines of each page, used as the table cell content when given.
+    ``math_hints`` holds the text layer math evidence of each page for the
+    math gate.
+    """
+    if len(images) == 1:
+        page_start = time.time()
+        kwargs = {}
+        if formula_queue is not None:
+            kwargs['formula_queue'] = formula_queue
+        if text_lines_list is not None:
+            kwargs['text_lines'] = text_lines_list[0]
+        if math_hints is not None:
+            kwargs['math_hint'] = math_hints[0]
+        model_json[page_ids[0]]['layout_dets'] = custom_model(images[0], **kwargs)
+        logger.info(f'-----page_id : {page_ids[0]}, page total time: {round(time.time() - page_start, 2)}-----')
+        return
+
+    batch_start = time.time()
+    images_layout_res, images_mfd_res = custom_model.detect_pages(images, math_hints)
+    if text_lines_list is None:
+        text_lines_list = [None] * len(images)
+    for index, img, layout_res, mfd_res, text_lines in zip(
+        page_ids, images, images_layout_res, images_mfd_res, text_lines_list
+    ):
+        page_start = time.time()
+        model_json[index]['layout_dets'] = custom_model(
+            img, layout_res=layout_res, formula_queue=formula_queue, mfd_res=mfd_res, text_lines=text_lines
+        )
+        logger.info(f'-----page_id : {index}, page time without layout and mfd: {round(time.time() - page_start, 2)}-----')
+    logger.info(
+        f'-----page_ids : {page_ids[0]}-{page_ids[-1]}, batch total time: {round(time.time() - batch_start, 2)}-----'
+    )
+
+
 def doc_analyze(
     dataset: Dataset,
     ocr: bool = False,
@@ -201,6 +375,30 @@ def doc_analyze(
     if lang == '':
         lang = None
 
+    end_page_id = (
+        end_page_id
+        if end_page_id is not None and end_page_id >= 0
+        else len(dataset) - 1
+    )
+    if end_page_id > len(dataset) - 1:
+        logger.warning('end_page_id is out of range, use dataset length')
+        end_page_id = len(dataset) - 1
+
+    # 相同pdf和模型配置的推理结果可直接从缓存读取
+    inference_cache = get_inference_result_cache(get_inference_cache_config())
+    cache_key = None
+    if inference_cache is not None:
+        cache_key = InferenceResultCache.make_key(
+            dataset.data_bits(),
+            get_model_config_identity(ocr, lang, layout_model, formula_enable, table_enable),
+            start_page_id,
+            end_page_id,
+        )
+        cached_model_json = inference_cache.get(cache_key)
+        if cached_model_json is not None:
+            logger.info(f'inference cache hit: {cache_key}')
+            return InferenceResult(cached_model_json, dataset)
+
     model_manager = ModelSingleton()
     custom_model = model_manager.get_model(
         ocr, show_log, lang, layout_model, formula_enable, table_enable
@@ -209,36 +407,128 @@ def doc_analyze(
     model_json = []
     doc_analyze_start = time.time()
 
-    if end_page_id is None:
-        end_page_id = len(dataset)
-
-    for index in range(len(dataset)):
-        page_data = dataset.get_page(index)
-        img_dict = page_data.get_image()
+    # 仅full模式下的CustomPEKModel支持跨页批量layout检测
+    layout_batch_size = getattr(custom_model, 'layout_batch_size', 1)
+    # 公式识别使用文档级队列，攒满批次后统一识别
+    formula_queue = None
+    if hasattr(custom_model, 'create_formula_queue'):
+        formula_queue = custom_model.create_formula_queue()
+    # txt模式下文本行框和表格单元格内容直接使用pdf文本层
+    use_text_layer = getattr(custom_model, 'use_text_layer', False)
+    batch_images = []
+    batch_page_ids = []
+    batch_text_lines = [] if use_text_layer else None
+    # 公式门控需要文本层中的数学线索
+    math_gate = getattr(custom_model, 'math_gate', False)
+    batch_math_hints = [] if math_gate else None
+
+    # 内容相同的页面直接复用已有的layout_dets，文档内重复页在最后统一复制
+    page_cache = get_page_result_cache(get_page_cache_config())
+    page_model_config = None
+    if page_cache is not None:
+        page_model_config = get_model_config_identity(ocr, lang, layout_model, formula_enable, table_enable)
+    page_cache_keys = {}
+    duplicate_pages = {}
+    page_cache_hits = 0
+    blank_pages = 0
+
+    # 只对需要分析的页面渲染图片，范围外的页面仅计算宽高
+    # prefetch_pages大于0时在后台进程中提前渲染，与模型推理重叠
+    render_config = get_render_config()
+    # 页面图片缓存在dataset上，供后续截图等阶段复用
+    if 'raster_cache_mb' in render_config:
+        dataset.get_raster_cache().max_bytes = int(render_config['raster_cache_mb']) * 1024 * 1024
+    page_images = iter_page_images_prefetch(
+        dataset,
+        start_page_id,
+        end_page_id,
+        prefetch_pages=render_config.get('prefetch_pages', 0),
+        workers=render_config.get('workers', 1),
+    )
+    for index, img_dict in page_images:
         img = img_dict['img']
         page_width = img_dict['width']
         page_height = img_dict['height']
-        if start_page_id <= index <= end_page_id:
-            page_start = time.time()
-            result = custom_model(img)
-            logger.info(f'-----page_id : {index}, page total time: {round(time.time() - page_start, 2)}-----')
-        else:
-            result = []
 
         page_info = {'page_no': index, 'height': page_height, 'width': page_width}
-        page_dict = {'layout_dets': result, 'page_info': page_info}
+        page_dict = {'layout_dets': [], 'page_info': page_info}
         model_json.append(page_dict)
 
+        if start_page_id <= index <= end_page_id:
+            # 空白页(最多只有页码)不经过任何模型，layout_dets保持为空
+            if is_blank_page(img, dataset.get_page(index).get_doc()):
+                blank_pages += 1
+                continue
+
+            text_lines = None
+            if use_text_layer:
+                text_lines = fitz_doc_to_text_lines(dataset.get_page(index).get_doc(), page_width, page_height)
+
+            if page_cache is not None:
+                page_key = PageResultCache.make_key(img, page_model_config, text_lines)
+                if page_key in page_cache_keys:
+                    duplicate_pages[index] = page_cache_keys[page_key]
+                    continue
+                cached_layout_dets = page_cache.get(page_key)
+                if cached_layout_dets is not None:
+                    page_dict['layout_dets'] = cached_layout_dets
+                    page_cache_hits += 1
+                    continue
+                page_cache_keys[page_key] = index
+
+            batch_images.append(img)
+            batch_page_ids.append(index)
+            if use_text_layer:
+                batch_text_lines.append(text_lines)
+            if math_gate:
+                batch_math_hints.append(fitz_doc_has_math(dataset.get_page(index).get_doc()))
+            if len(batch_images) >= layout_batch_size:
+                analyze_pages(custom_model, batch_images, batch_page_ids, model_json, formula_queue,
+                              batch_text_lines, batch_math_hints)
+                batch_images, batch_page_ids = [], []
+                batch_text_lines = [] if use_text_layer else None
+                batch_math_hints = [] if math_gate else None
+
+    if len(batch_images) > 0:
+        analyze_pages(custom_model, batch_images, batch_page_ids, model_json, formula_queue,
+                      batch_text_lines, batch_math_hints)
+
+    if formula_queue is not None:
+        formula_queue.flush()
+
+    if blank_pages > 0:
+        logger.info(f'blank pages skipped: {blank_pages}')
+    if math_gate:
+        math_gate_stats = custom_model.pop_math_gate_stats()
+        logger.info(
+            f'math gate pages: {math_gate_stats["pages"]}, skipped by text layer: {math_gate_stats["text_layer_skips"]},'
+            f' skipped by probe: {math_gate_stats["probe_skips"]}'
+        )
+
+    if page_cache is not None:
+        # 公式队列flush后结果才完整，此时再写入缓存和复制重复页
+        for page_key, index in page_cache_keys.items():
+            page_cache.put(page_key, model_json[index]['layout_dets'])
+        for index, source_index in duplicate_pages.items():
+            model_json[index]['layout_dets'] = copy.deepcopy(model_json[source_index]['layout_dets'])
+        logger.info(
+            f'page cache hits: {page_cache_hits}, duplicate pages in document: {len(duplicate_pages)}'
+        )
+
     gc_start = time.time()
     clean_memory()
     gc_time = round(time.time() - gc_start, 2)
     logger.info(f'gc time: {gc_time}')
 
     doc_analyze_time = round(time.time() - doc_analyze_start, 2)
-    doc_analyze_speed = round((end_page_id + 1 - start_page_id) / doc_analyze_time, 2)
+    # 缓存命中和空白页不经过模型，耗时可能接近0
+    doc_analyze_speed = round((end_page_id + 1 - start_page_id) / max(doc_analyze_time, 0.01), 2)
     logger.info(
         f'doc analyze time: {round(time.time() - doc_analyze_start, 2)},'
         f' speed: {doc_analyze_speed} pages/second'
     )
 
+    if inference_cache is not None:
+        inference_cache.put(cache_key, model_json)
+
     return InferenceResult(model_json, dataset)
@@ -0,0 +1,357 @@
+import hashlib
+import json
+import os
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+
+from loguru import logger
+
+from magic_pdf.libs.commons import parse_bucket_key
+from magic_pdf.libs.config_reader import get_s3_config
+from magic_pdf.libs.hash_utils import compute_md5
+from magic_pdf.libs.version import __version__
+
+
+class InferenceCacheStorage(ABC):
+    """Storage of the cached model json, entries are addressed by key."""
+
+    @abstractmethod
+    def get(self, key: str):
+        """Get the cached bytes.
+
+        Args:
+            key (str): the cache key
+
+        Returns:
+            bytes | None: the cached bytes, None if the key is not cached
+        """
+        pass
+
+    @abstractmethod
+    def put(self, key: str, data: bytes) -> None:
+        """Store the bytes, then evict the least recently used entries until
+        the storage is within its size limit.
+
+        Args:
+            key (str): the cache key
+            data (bytes): the data to cache
+        """
+        pass
+
+
+class LocalInferenceCacheStorage(InferenceCacheStorage):
+    def __init__(self, cache_dir: str, max_bytes: int, evict_every: int = 1):
+        """Cache entries as files of cache_dir.
+
+        Args:
+            cache_dir (str): the directory of the cache files
+            max_bytes (int): the max total size of the cache files
+            evict_every (int, optional): check the size limit once every evict_every puts. Defaults to 1.
+        """
+        self._cache_dir = os.path.expanduser(cache_dir)
+        self._max_bytes = max_bytes
+        self._evict_every = max(1, evict_every)
+        self._puts = 0
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self._cache_dir, f'{key}.json')
+
+    def get(self, key: str):
+        fn_path = self._path(key)
+        if not os.path.exists(fn_path):
+            return None
+        with open(fn_path, 'rb') as f:
+            data = f.read()
+        # 更新修改时间，淘汰时按最近使用排序
+        os.utime(fn_path)
+        return data
+
+    def put(self, key: str, data: bytes) -> None:
+        os.makedirs(self._cache_dir, exist_ok=True)
+        fn_path = self._path(key)
+        # 先写临时文件再改名，避免并发读到不完整的文件
+        tmp_path = f'{fn_path}.{os.getpid()}.tmp'
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, fn_path)
+        self._puts += 1
+        if self._puts % self._evict_every == 0:
+            self._evict()
+
+    def _evict(self):
+        entries = []
+        for name in os.listdir(self._cache_dir):
+            if not name.endswith('.json'):
+                continue
+            try:
+                stat = os.stat(os.path.join(self._cache_dir, name))
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, name))
+
+        total_bytes = sum(size for _, size, _ in entries)
+        for _, size, name in sorted(entries):
+            if total_bytes <= self._max_bytes:
+                break
+            try:
+                os.remove(os.path.join(self._cache_dir, name))
+            except FileNotFoundError:
+                pass
+            total_bytes -= size
+
+
+class S3InferenceCacheStorage(InferenceCacheStorage):
+    def __init__(self, s3_path: str, max_bytes: int, evict_every: int = 1):
+        """Cache entries as objects under s3_path, the credentials are read
+        from bucket_info of magic-pdf.json.
+
+        Args:
+            s3_path (str): s3://bucket/prefix of the cache objects
+            max_bytes (int): the max total size of the cache objects
+            evict_every (int, optional): check the size limit once every evict_every puts. Defaults to 1.
+        """
+        import boto3
+        from botocore.config import Config
+
+        self._bucket, self._prefix = parse_bucket_key(s3_path)
+        self._prefix = self._prefix.strip('/')
+        self._max_bytes = max_bytes
+        self._evict_every = max(1, evict_every)
+        self._puts = 0
+        ak, sk, endpoint_url = get_s3_config(self._bucket)
+        self._s3_client = boto3.client(
+            service_name='s3',
+            aws_access_key_id=ak,
+            aws_secret_access_key=sk,
+            endpoint_url=endpoint_url,
+            config=Config(
+                s3={'addressing_style': 'auto'},
+                retries={'max_attempts': 5, 'mode': 'standard'},
+            ),
+        )
+
+    def _key(self, key: str) -> str:
+        return f'{self._prefix}/{key}.json' if self._prefix else f'{key}.json'
+
+    def get(self, key: str):
+        try:
+            res = self._s3_client.get_object(Bucket=self._bucket, Key=self._key(key))
+        except self._s3_client.exceptions.NoSuchKey:
+            return None
+        data = res['Body'].read()
+        # 对象复制到自身以更新LastModified，淘汰时按最近使用排序
+        try:
+            self._s3_client.copy_object(
+                Bucket=self._bucket,
+                Key=self._key(key),
+                CopySource={'Bucket': self._bucket, 'Key': self._key(key)},
+                MetadataDirective='REPLACE',
+            )
+        except Exception as e:
+            logger.warning(f'inference cache touch failed: {e}')
+        return data
+
+    def put(self, key: str, data: bytes) -> None:
+        self._s3_client.put_object(Bucket=self._bucket, Key=self._key(key), Body=data)
+        self._puts += 1
+        if self._puts % self._evict_every == 0:
+            self._evict()
+
+    def _evict(self):
+        prefix = f'{self._prefix}/' if self._prefix else ''
+        entries = []
+        paginator = self._s3_client.get_paginator('list_objects_v2')
+        for page in paginator.paginate(Bucket=self._bucket, Prefix=prefix):
+            for obj in page.get('Contents', []):
+                entries.append((obj['LastModified'], obj['Size'], obj['Key']))
+
+        total_bytes = sum(size for _, size, _ in entries)
+        to_delete = []
+        for _, size, obj_key in sorted(entries):
+            if total_bytes <= self._max_bytes:
+                break
+            to_delete.append({'Key': obj_key})
+            total_bytes -= size
+        # delete_objects每次最多1000个key
+        for index in range(0, len(to_delete), 1000):
+            self._s3_client.delete_objects(
+                Bucket=self._bucket, Delete={'Objects': to_delete[index: index + 1000]}
+            )
+
+
+class InferenceResultCache:
+    """Opt-in cache of the model json produced by doc_analyze, keyed by the
+    md5 of the pdf and the resolved model config of the run.
+
+    Errors of the storage are logged and treated as cache misses, the cache
+    never fails the analysis.
+    """
+
+    def __init__(self, storage: InferenceCacheStorage):
+        self._storage = storage
+
+    @staticmethod
+    def make_key(pdf_bytes: bytes, model_config: dict, start_page_id=0, end_page_id=None) -> str:
+        """Compute the cache key.
+
+        Args:
+            pdf_bytes (bytes): the bytes of the pdf
+            model_config (dict): the resolved model config, see get_model_config_identity of doc_analyze_by_custom_model
+            start_page_id (int, optional): the first analyzed page. Defaults to 0.
+            end_page_id (int, optional): the last analyzed page. Defaults to None.
+
+        Returns:
+            str: the cache key
+        """
+        # 版本号也参与计算，升级模型后旧结果自动失效
+        config_str = json.dumps(
+            [model_config, start_page_id, end_page_id, __version__], ensure_ascii=False, sort_keys=True
+        )
+        return f'{compute_md5(pdf_bytes)}_{compute_md5(config_str.encode("utf-8"))}'
+
+    def get(self, key: str):
+        """Get the cached model json, None on a miss."""
+        try:
+            data = self._storage.get(key)
+            if data is None:
+                return None
+            return json.loads(data.decode('utf-8'))
+        except Exception as e:
+            logger.warning(f'inference cache read failed: {e}')
+            return None
+
+    def put(self, key: str, model_json: list) -> None:
+        """Cache the model json."""
+        put_start = time.time()
+        try:
+            self._storage.put(key, json.dumps(model_json, ensure_ascii=False).encode('utf-8'))
+        except Exception as e:
+            logger.warning(f'inference cache write failed: {e}')
+            return
+        logger.info(f'inference cache write time: {round(time.time() - put_start, 2)}')
+
+
+class PageResultCache:
+    """Cache of the layout_dets of single pages, keyed by the hash of the
+    rendered page image and the resolved model config.
+
+    Entries are kept in memory for the life of the process, least recently
+    used first out once there are more than ``max_pages``. With a storage the
+    entries are also persisted and shared across runs.
+    """
+
+    def __init__(self, max_pages=1024, storage: InferenceCacheStorage = None):
+        self.max_pages = max_pages
+        self._storage = storage
+        self._entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def make_key(img, model_config: dict, extra=None) -> str:
+        """Compute the cache key of a page.
+
+        Args:
+            img (np.ndarray): the rendered page image
+            model_config (dict): the resolved model config, see get_model_config_identity of doc_analyze_by_custom_model
+            extra (optional): other json serializable inputs of the page which affect the result
+
+        Returns:
+            str: the cache key
+        """
+        hasher = hashlib.md5()
+        hasher.update(str(img.shape).encode('utf-8'))
+        hasher.update(img.tobytes())
+        hasher.update(json.dumps([model_config, extra, __version__], ensure_ascii=False, sort_keys=True).encode('utf-8'))
+        return f'page_{hasher.hexdigest().upper()}'
+
+    def get(self, key: str):
+        """Get a copy of the cached layout_dets, None on a miss."""
+        data = self._entries.get(key)
+        if data is not None:
+            self._entries.move_to_end(key)
+        elif self._storage is not None:
+            try:
+                data = self._storage.get(key)
+            except Exception as e:
+                logger.warning(f'page result cache read failed: {e}')
+                data = None
+            if data is not None:
+                data = data.decode('utf-8')
+                self._put_memory(key, data)
+
+        if data is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return json.loads(data)
+
+    def put(self, key: str, layout_dets: list) -> None:
+        """Cache the layout_dets of a page."""
+        data = json.dumps(layout_dets, ensure_ascii=False)
+        self._put_memory(key, data)
+        if self._storage is not None:
+            try:
+                self._storage.put(key, data.encode('utf-8'))
+            except Exception as e:
+                logger.warning(f'page result cache write failed: {e}')
+
+    def _put_memory(self, key: str, data: str):
+        self._entries[key] = data
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_pages:
+            self._entries.popitem(last=False)
+
+
+def _create_storage(path: str, max_bytes: int, evict_every: int = 1) -> InferenceCacheStorage:
+    if path.startswith('s3://'):
+        return S3InferenceCacheStorage(path, max_bytes, evict_every)
+    return LocalInferenceCacheStorage(path, max_bytes, evict_every)
+
+
+def get_inference_result_cache(cache_config: dict):
+    """Create the cache from the inference-cache-config, None if the cache
+    is disabled.
+
+    Args:
+        cache_config (dict): {"enable": bool, "path": local dir or s3://bucket/prefix, "max_size_mb": int}
+
+    Returns:
+        InferenceResultCache | None: the cache
+    """
+    if not cache_config or not cache_config.get('enable', False):
+        return None
+    path = cache_config.get('path', '~/.cache/magic_pdf/inference')
+    max_bytes = int(cache_config.get('max_size_mb', 10240)) * 1024 * 1024
+    return InferenceResultCache(_create_storage(path, max_bytes))
+
+
+# 页面缓存需要跨文档复用，同一配置在进程内只创建一次
+_page_result_caches = {}
+
+
+def get_page_result_cache(cache_config: dict):
+    """Get the process wide page result cache of the page-cache-config,
+    None if the cache is disabled.
+
+    Args:
+        cache_config (dict): {"enable": bool, "max_pages": int, "path": None, local dir or s3://bucket/prefix, "max_size_mb": int}
+
+    Returns:
+        PageResultCache | None: the cache
+    """
+    if not cache_config or not cache_config.get('enable', False):
+        return None
+    config_key = json.dumps(cache_config, sort_keys=True)
+    if config_key not in _page_result_caches:
+        storage = None
+        path = cache_config.get('path')
+        if path:
+            max_bytes = int(cache_config.get('max_size_mb', 2048)) * 1024 * 1024
+            # 页面条目数量多，每写入一批再检查一次总大小
+            storage = _create_storage(path, max_bytes, evict_every=64)
+        _page_result_caches[config_key] = PageResultCache(
+            max_pages=int(cache_config.get('max_pages', 1024)), storage=storage
+        )
+    return _page_result_caches[config_key]
@@ -0,0 +1,244 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from loguru import logger
+
+from magic_pdf.libs.clean_memory import clean_memory
+
+
+def get_process_rss():
+    """Get the resident memory of this process in bytes, None if it cannot be
+    read on this platform."""
+    try:
+        import psutil
+        return psutil.Process().memory_info().rss
+    except ImportError:
+        pass
+    try:
+        with open('/proc/self/statm', 'r') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def get_model_bytes(model, max_depth=3) -> int:
+    """Get the bytes of the parameters and buffers of the torch modules in
+    model, the modules are searched in the attributes of model up to
+    max_depth levels. Tensors shared by several modules are counted once.
+
+    Returns:
+        int: 0 if torch is not installed or no torch module is found
+    """
+    try:
+        import torch
+    except ImportError:
+        return 0
+
+    seen_objects = set()
+    seen_tensors = set()
+    total = 0
+
+    def visit(obj, depth):
+        nonlocal total
+        if id(obj) in seen_objects:
+            return
+        seen_objects.add(id(obj))
+        if isinstance(obj, torch.nn.Module):
+            for tensor in list(obj.parameters()) + list(obj.buffers()):
+                if tensor.data_ptr() in seen_tensors:
+                    continue
+                seen_tensors.add(tensor.data_ptr())
+                total += tensor.numel() * tensor.element_size()
+            return
+        if depth >= max_depth:
+            return
+        if isinstance(obj, (list, tuple)):
+            children = obj
+        elif isinstance(obj, dict):
+            children = obj.values()
+        elif hasattr(obj, '__dict__') and not isinstance(obj, type):
+            children = vars(obj).values()
+        else:
+            return
+        for child in children:
+            visit(child, depth + 1)
+
+    visit(model, 0)
+    return total
+
+
+def get_cuda_allocated():
+    """Get the allocated cuda memory in bytes, None without cuda."""
+    try:
+        import torch
+    except ImportError:
+        return None
+    if not torch.cuda.is_available():
+        return None
+    return torch.cuda.memory_allocated()
+
+
+class ModelRegistry:
+    """LRU registry of loaded models with a memory budget.
+
+    The size of a model is the bytes of the parameters and buffers of its torch
+    modules. Models without torch modules, e.g. the paddle ocr models, are sized
+    by the growth of the allocated cuda memory or of the process resident
+    memory while the model is loaded. Once the loaded models take more than ``max_bytes``, or
+    there are more than ``max_entries`` of them, the least recently used models
+    are dropped from the registry, a dropped model is freed once the callers
+    which still use it are done, and loaded again when it is asked for next.
+
+    Load and evict events are logged, counted in ``stats()`` and passed to the
+    listeners added by ``add_listener``.
+    """
+
+    def __init__(self, name: str, max_bytes=0, max_entries=0, measure=True):
+        """
+        Args:
+            name (str): name of the registry in the logs
+            max_bytes (int, optional): memory budget of the models, 0 means no limit. Defaults to 0.
+            max_entries (int, optional): max number of models, 0 means no limit. Defaults to 0.
+            measure (bool, optional): measure the memory of every load, disable it when the
+                models are composed of models which are accounted by another registry. Defaults to True.
+        """
+        self.name = name
+        self.max_bytes = max(0, int(max_bytes))
+        self.max_entries = max(0, int(max_entries))
+        self.measure = measure
+        self._entries = OrderedDict()
+        self._sizes = {}
+        self._bytes = 0
+        self._listeners = []
+        # 模型加载期间持有锁，既避免重复加载，也避免并发加载干扰内存统计
+        self._lock = threading.RLock()
+        self.hits = 0
+        self.loads = 0
+        self.evictions = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, key):
+        return key in self._entries
+
+    def add_listener(self, callback):
+        """Add a callback of the load and evict events.
+
+        Args:
+            callback (Callable): called as callback(event, key, size_bytes), event is 'load' or 'evict'
+        """
+        self._listeners.append(callback)
+
+    def get(self, key, loader):
+        """Get the model of key, load it with loader on a miss.
+
+        Args:
+            key (Hashable): the model key
+            loader (Callable): creates the model, called without arguments
+
+        Returns:
+            the model
+        """
+        with self._lock:
+            if key in self._entries:
+                self.hits += 1
+                self._entries.move_to_end(key)
+                return self._entries[key]
+
+            load_start = time.time()
+            cuda_before = get_cuda_allocated() if self.measure else None
+            rss_before = get_process_rss() if self.measure else None
+            model = loader()
+            size = self._measure(model, cuda_before, rss_before) if self.measure else 0
+
+            self._entries[key] = model
+            self._sizes[key] = size
+            self._bytes += size
+            self.loads += 1
+            logger.info(
+                f'{self.name} load: {key}, size: {round(size / 1024 / 1024)}MB, '
+                f'time: {round(time.time() - load_start, 2)}, total: {round(self._bytes / 1024 / 1024)}MB'
+            )
+            self._notify('load', key, size)
+            self._evict(keep=key)
+            return model
+
+    @staticmethod
+    def _measure(model, cuda_before, rss_before) -> int:
+        size = get_model_bytes(model)
+        if size:
+            return size
+        # 非torch模型按加载期间显存或常驻内存的增长估计
+        if cuda_before is not None:
+            size = max(0, get_cuda_allocated() - cuda_before)
+            if size:
+                return size
+        if rss_before is not None:
+            rss_after = get_process_rss()
+            if rss_after is not None:
+                return max(0, rss_after - rss_before)
+        return 0
+
+    def evict(self, key) -> bool:
+        """Drop the model of key from the registry.
+
+        Returns:
+            bool: False if the key was not loaded
+        """
+        with self._lock:
+            if key not in self._entries:
+                return False
+            self._remove(key)
+        clean_memory()
+        return True
+
+    def clear(self):
+        with self._lock:
+            for key in list(self._entries.keys()):
+                self._remove(key)
+        clean_memory()
+
+    def stats(self) -> dict:
+        return {
+            'hits': self.hits,
+            'loads': self.loads,
+            'evictions': self.evictions,
+            'entries': len(self._entries),
+            'bytes': self._bytes,
+        }
+
+    def _over_budget(self) -> bool:
+        if self.max_entries and len(self._entries) > self.max_entries:
+            return True
+        return bool(self.max_bytes) and self._bytes > self.max_bytes
+
+    def _evict(self, keep):
+        evicted = False
+        # 刚加载的模型位于末尾，不会被淘汰
+        while self._over_budget() and len(self._entries) > 1:
+            self._remove(next(iter(self._entries)))
+            evicted = True
+        if self._over_budget():
+            logger.warning(
+                f'{self.name}: {keep} alone exceeds the memory budget of {round(self.max_bytes / 1024 / 1024)}MB'
+            )
+        if evicted:
+            clean_memory()
+
+    def _remove(self, key):
+        self._entries.pop(key)
+        size = self._sizes.pop(key)
+        self._bytes -= size
+        self.evictions += 1
+        logger.info(f'{self.name} evict: {key}, size: {round(size / 1024 / 1024)}MB')
+        self._notify('evict', key, size)
+
+    def _notify(self, event: str, key, size: int):
+        for callback in self._listeners:
+            try:
+                callback(event, key, size)
+            except Exception as e:
+                logger.warning(f'{self.name} listener failed: {e}')
@@ -1,4 +1,5 @@
 # flake8: noqa
+import math
 import os
 import time
 
@@ -24,9 +25,13 @@ from magic_pdf.config.constants import *
 from magic_pdf.model.model_list import AtomicModel
 from magic_pdf.model.sub_modules.model_init import AtomModelSingleton
 from magic_pdf.model.sub_modules.model_utils import (
-    clean_vram, crop_img, get_res_list_from_layout_res)
+    clean_vram, crop_img, get_res_list_from_layout_res, is_blank_image)
 from magic_pdf.model.sub_modules.ocr.paddleocr.ocr_utils import (
-    get_adjusted_mfdetrec_res, get_ocr_result_list)
+    get_adjusted_mfdetrec_res, get_ocr_result_list, get_text_layer_dt_boxes,
+    merge_det_boxes, update_det_boxes)
+from magic_pdf.model.sub_modules.stage_executor import StageExecutor
+from magic_pdf.model.sub_modules.table.table_utils import (
+    TableDeadlineRunner, get_table_ocr_result)
 
 
 class CustomPEKModel:
@@ -54,6 +59,8 @@ class CustomPEKModel:
         self.layout_model_name = self.layout_config.get(
             'model', MODEL_NAME.DocLayout_YOLO
         )
+        self.layout_batch_size = max(1, int(self.layout_config.get('batch_size', 1)))
+        self.layout_backend = self.layout_config.get('backend', 'torch')
 
         # formula config
         self.formula_config = kwargs.get('formula_config')
@@ -64,16 +71,40 @@ class CustomPEKModel:
             'mfr_model', MODEL_NAME.UniMerNet_v2_Small
         )
         self.apply_formula = self.formula_config.get('enable', True)
+        self.mfd_backend = self.formula_config.get('mfd_backend', 'torch')
+        self.mfr_quantize = self.formula_config.get('mfr_quantize', None)
+        self.mfr_batch_size = max(1, int(self.formula_config.get('mfr_batch_size', 64)))
+        self.mfr_queue_enable = self.formula_config.get('mfr_queue', True)
+        # 无数学内容的页面跳过公式检测与识别
+        self.math_gate = self.formula_config.get('math_gate', False)
+        self.math_gate_imgsz = int(self.formula_config.get('math_gate_imgsz', 640))
+        self.math_gate_stats = {'pages': 0, 'text_layer_skips': 0, 'probe_skips': 0}
 
         # table config
         self.table_config = kwargs.get('table_config')
         self.apply_table = self.table_config.get('enable', False)
         self.table_max_time = self.table_config.get('max_time', TABLE_MAX_TIME_VALUE)
         self.table_model_name = self.table_config.get('model', MODEL_NAME.RAPID_TABLE)
+        self.table_batch_size = max(1, int(self.table_config.get('batch_size', 1)))
 
         # ocr config
         self.apply_ocr = ocr
         self.lang = kwargs.get('lang', None)
+        self.ocr_config = kwargs.get('ocr_config') or {}
+        self.ocr_batch_rec = self.ocr_config.get('batch_rec', True)
+        # txt模式下文本行框直接取自pdf文本层，只对没有文本覆盖的区域做检测
+        self.ocr_text_layer_det = not self.apply_ocr and self.ocr_config.get('text_layer_det', True)
+
+        # concurrency config
+        self.concurrency_config = kwargs.get('concurrency_config') or {}
+        self.stage_workers = max(1, int(self.concurrency_config.get('stage_workers', 1)))
+
+        # txt模式下表格单元格内容可直接取自pdf文本层，无需RapidTable再做一次ocr
+        self.table_use_text_layer = (
+            self.apply_table and not self.apply_ocr and self.table_model_name == MODEL_NAME.RAPID_TABLE
+        )
+        # 需要调用方传入页面的文本层文本行
+        self.use_text_layer = self.table_use_text_layer or self.ocr_text_layer_det
 
         logger.info(
             'DocAnalysis init, this may take some times, layout_model: {}, apply_formula: {}, apply_ocr: {}, '
@@ -89,17 +120,21 @@ class CustomPEKModel:
         # 初始化解析方案
         self.device = kwargs.get('device', 'cpu')
         logger.info('using device: {}'.format(self.device))
+        # layout与公式检测、ocr与表格识别互不依赖，可以并发执行
+        self.stage_executor = StageExecutor(self.stage_workers)
         models_dir = kwargs.get(
             'models_dir', os.path.join(root_dir, 'resources', 'models')
         )
         logger.info('using models_dir: {}'.format(models_dir))
 
-        atom_model_manager = AtomModelSingleton()
+        # 模型统一由AtomModelSingleton管理，这里只记录各模型的初始化参数而不持有模型，
+        # 不同配置的CustomPEKModel共享同一份模型，模型也可以按内存预算被淘汰
+        self._atom_model_kwargs = {}
 
         # 初始化公式识别
         if self.apply_formula:
-            # 初始化公式检测模型
-            self.mfd_model = atom_model_manager.get_atom_model(
+            # 公式检测模型
+            self._atom_model_kwargs['mfd_model'] = dict(
                 atom_model_name=AtomicModel.MFD,
                 mfd_weights=str(
                     os.path.join(
@@ -107,23 +142,25 @@ class CustomPEKModel:
                     )
                 ),
                 device=self.device,
+                backend=self.mfd_backend,
             )
 
-            # 初始化公式解析模型
+            # 公式解析模型
             mfr_weight_dir = str(
                 os.path.join(models_dir, self.configs['weights'][self.mfr_model_name])
             )
             mfr_cfg_path = str(os.path.join(model_config_dir, 'UniMERNet', 'demo.yaml'))
-            self.mfr_model = atom_model_manager.get_atom_model(
+            self._atom_model_kwargs['mfr_model'] = dict(
                 atom_model_name=AtomicModel.MFR,
                 mfr_weight_dir=mfr_weight_dir,
                 mfr_cfg_path=mfr_cfg_path,
                 device=self.device,
+                mfr_quantize=self.mfr_quantize,
             )
 
-        # 初始化layout模型
+        # layout模型
         if self.layout_model_name == MODEL_NAME.LAYOUTLMv3:
-            self.layout_model = atom_model_manager.get_atom_model(
+            self._atom_model_kwargs['layout_model'] = dict(
                 atom_model_name=AtomicModel.Layout,
                 layout_model_name=MODEL_NAME.LAYOUTLMv3,
                 layout_weights=str(
@@ -139,7 +176,7 @@ class CustomPEKModel:
                 device=self.device,
             )
         elif self.layout_model_name == MODEL_NAME.DocLayout_YOLO:
-            self.layout_model = atom_model_manager.get_atom_model(
+            self._atom_model_kwargs['layout_model'] = dict(
                 atom_model_name=AtomicModel.Layout,
                 layout_model_name=MODEL_NAME.DocLayout_YOLO,
                 doclayout_yolo_weights=str(
@@ -148,73 +185,240 @@ class CustomPEKModel:
                     )
                 ),
                 device=self.device,
+                backend=self.layout_backend,
             )
-        # 初始化ocr
-        self.ocr_model = atom_model_manager.get_atom_model(
+
+        # ocr模型
+        self._atom_model_kwargs['ocr_model'] = dict(
             atom_model_name=AtomicModel.OCR,
             ocr_show_log=show_log,
             det_db_box_thresh=0.3,
             lang=self.lang
         )
-        # init table model
+
+        # table模型
         if self.apply_table:
             table_model_dir = self.configs['weights'][self.table_model_name]
-            self.table_model = atom_model_manager.get_atom_model(
+            self._atom_model_kwargs['table_model'] = dict(
                 atom_model_name=AtomicModel.Table,
                 table_model_name=self.table_model_name,
                 table_model_path=str(os.path.join(models_dir, table_model_dir)),
                 table_max_time=self.table_max_time,
+                table_batch_size=self.table_batch_size,
                 device=self.device,
             )
+            # 所有表格模型都由runner限制等待时间，StructEqTable每批生成也按max_time停止
+            self.table_runner = TableDeadlineRunner(self.table_max_time)
+
+        # layout与公式模型每页都会用到，在初始化时加载；ocr与表格模型在第一次使用时才加载，
+        # 没有ocr区域和表格的文档无需加载
+        for name in ['layout_model', 'mfd_model', 'mfr_model']:
+            if name in self._atom_model_kwargs:
+                self._get_atom_model(name)
 
         logger.info('DocAnalysis init done!')
 
-    def __call__(self, image):
+    def _get_atom_model(self, name: str):
+        return AtomModelSingleton().get_atom_model(**self._atom_model_kwargs[name])
+
+    @property
+    def layout_model(self):
+        return self._get_atom_model('layout_model')
+
+    @property
+    def mfd_model(self):
+        return self._get_atom_model('mfd_model')
+
+    @property
+    def mfr_model(self):
+        return self._get_atom_model('mfr_model')
 
-        # layout检测
+    @property
+    def ocr_model(self):
+        return self._get_atom_model('ocr_model')
+
+    @property
+    def table_model(self):
+        return self._get_atom_model('table_model')
+
+    def layout_predict(self, images: list) -> list:
+        """Run layout detection on a list of page images.
+
+        Pages are fed to the layout backend in chunks of ``layout_batch_size``,
+        the result for each page is returned in input order.
+        """
         layout_start = time.time()
-        layout_res = []
+        images_layout_res = []
         if self.layout_model_name == MODEL_NAME.LAYOUTLMv3:
             # layoutlmv3
-            layout_res = self.layout_model(image, ignore_catids=[])
+            if len(images) == 1:
+                images_layout_res.append(self.layout_model(images[0], ignore_catids=[]))
+            else:
+                images_layout_res = self.layout_model.batch_predict(
+                    images, self.layout_batch_size, ignore_catids=[]
+                )
         elif self.layout_model_name == MODEL_NAME.DocLayout_YOLO:
             # doclayout_yolo
-            img_pil = Image.fromarray(image)
-            width, height = img_pil.size
-            # logger.info(f'width: {width}, height: {height}')
-            input_res = {"poly":[0,0,width,0,width,height,0,height]}
-            new_image, useful_list = crop_img(input_res, img_pil, crop_paste_x=width//2, crop_paste_y=0)
-            paste_x, paste_y, xmin, ymin, xmax, ymax, new_width, new_height = useful_list
-            layout_res = self.layout_model.predict(new_image)
-            for res in layout_res:
-                p1, p2, p3, p4, p5, p6, p7, p8 = res['poly']
-                p1 = p1 - paste_x + xmin
-                p2 = p2 - paste_y + ymin
-                p3 = p3 - paste_x + xmin
-                p4 = p4 - paste_y + ymin
-                p5 = p5 - paste_x + xmin
-                p6 = p6 - paste_y + ymin
-                p7 = p7 - paste_x + xmin
-                p8 = p8 - paste_y + ymin
-                res['poly'] = [p1, p2, p3, p4, p5, p6, p7, p8]
+            layout_images = []
+            useful_lists = []
+            for image in images:
+                img_pil = Image.fromarray(image)
+                width, height = img_pil.size
+                # logger.info(f'width: {width}, height: {height}')
+                input_res = {"poly":[0,0,width,0,width,height,0,height]}
+                new_image, useful_list = crop_img(input_res, img_pil, crop_paste_x=width//2, crop_paste_y=0)
+                layout_images.append(new_image)
+                useful_lists.append(useful_list)
+
+            if len(layout_images) == 1:
+                images_layout_res.append(self.layout_model.predict(layout_images[0]))
+            else:
+                images_layout_res = self.layout_model.batch_predict(
+                    layout_images, self.layout_batch_size
+                )
+
+            for layout_res, useful_list in zip(images_layout_res, useful_lists):
+                paste_x, paste_y, xmin, ymin, xmax, ymax, new_width, new_height = useful_list
+                for res in layout_res:
+                    p1, p2, p3, p4, p5, p6, p7, p8 = res['poly']
+                    p1 = p1 - paste_x + xmin
+                    p2 = p2 - paste_y + ymin
+                    p3 = p3 - paste_x + xmin
+                    p4 = p4 - paste_y + ymin
+                    p5 = p5 - paste_x + xmin
+                    p6 = p6 - paste_y + ymin
+                    p7 = p7 - paste_x + xmin
+                    p8 = p8 - paste_y + ymin
+                    res['poly'] = [p1, p2, p3, p4, p5, p6, p7, p8]
 
         layout_cost = round(time.time() - layout_start, 2)
-        logger.info(f'layout detection time: {layout_cost}')
+        logger.info(f'layout detection time: {layout_cost}, page nums: {len(images)}')
+        return images_layout_res
 
-        pil_img = Image.fromarray(image)
+    def mfd_predict(self, images: list, math_hints: list = None) -> list:
+        """Run formula detection on a list of page images.
 
-        if self.apply_formula:
-            # 公式检测
-            mfd_start = time.time()
-            mfd_res = self.mfd_model.predict(image)
-            logger.info(f'mfd time: {round(time.time() - mfd_start, 2)}')
+        With the math gate enabled, ``math_hints`` tells per page whether the
+        text layer has math (True), has none (False) or can not tell (None).
+        Pages without math are skipped, pages that can not tell are probed at
+        ``math_gate_imgsz`` first and skipped when the probe finds nothing.
+
+        Returns:
+            list: the formula detection result of each page, None for skipped
+                pages and for every page if formula recognition is disabled
+        """
+        if not self.apply_formula:
+            return [None] * len(images)
+        if math_hints is None:
+            math_hints = [None] * len(images)
+        mfd_start = time.time()
+        images_mfd_res = []
+        for image, math_hint in zip(images, math_hints):
+            if self.math_gate:
+                self.math_gate_stats['pages'] += 1
+                if math_hint is False:
+                    self.math_gate_stats['text_layer_skips'] += 1
+                    images_mfd_res.append(None)
+                    continue
+                if math_hint is None:
+                    # 低分辨率、低阈值试探，没有检出才跳过
+                    probe_res = self.mfd_model.predict(image, imgsz=self.math_gate_imgsz, conf=0.1)
+                    if len(probe_res.boxes) == 0:
+                        self.math_gate_stats['probe_skips'] += 1
+                        images_mfd_res.append(None)
+                        continue
+            images_mfd_res.append(self.mfd_model.predict(image))
+        logger.info(f'mfd time: {round(time.time() - mfd_start, 2)}, page nums: {len(images)}')
+        return images_mfd_res
+
+    def pop_math_gate_stats(self) -> dict:
+        """Return the math gate counters since the last call and reset them."""
+        stats = self.math_gate_stats
+        self.math_gate_stats = {'pages': 0, 'text_layer_skips': 0, 'probe_skips': 0}
+        return stats
+
+    def detect_pages(self, images: list, math_hints: list = None):
+        """Run layout detection and formula detection on a list of page
+        images, the two stages only read the page images and run concurrently.
+
+        Returns:
+            tuple: (layout results, formula detection results), one item per page
+        """
+        results = self.stage_executor.run({
+            'layout': lambda: self.layout_predict(images),
+            'mfd': lambda: self.mfd_predict(images, math_hints),
+        })
+        return results['layout'], results['mfd']
+
+    def batch_ocr(self, pil_img, ocr_res_list, single_page_mfdetrec_res):
+        """Detect text lines in every ocr region of a page, then recognize the
+        lines of all regions with a single recognizer call.
+
+        Returns the category 15 spans of the page, in the same form as the
+        region by region path produces.
+        """
+        ocr_model = self.ocr_model
+        region_det_res = []
+        img_crop_list = []
+        for res in ocr_res_list:
+            new_image, useful_list = crop_img(res, pil_img, crop_paste_x=50, crop_paste_y=50)
+            adjusted_mfdetrec_res = get_adjusted_mfdetrec_res(single_page_mfdetrec_res, useful_list)
+            new_image = cv2.cvtColor(np.asarray(new_image), cv2.COLOR_RGB2BGR)
+
+            dt_boxes = ocr_model.ocr(new_image, mfd_res=adjusted_mfdetrec_res, rec=False)[0]
+            if not dt_boxes:
+                continue
+            region_det_res.append((useful_list, dt_boxes))
+            img_crop_list.extend(ocr_model.get_text_line_crops(new_image, dt_boxes))
+
+        rec_res = ocr_model.batch_rec(img_crop_list)
+
+        ocr_result_list = []
+        rec_index = 0
+        for useful_list, dt_boxes in region_det_res:
+            ocr_res = []
+            for box in dt_boxes:
+                text, score = rec_res[rec_index]
+                rec_index += 1
+                if score >= ocr_model.drop_score:
+                    ocr_res.append([box, (text, score)])
+            if ocr_res:
+                ocr_result_list.extend(get_ocr_result_list(ocr_res, useful_list))
+        logger.info(f'ocr text line nums: {len(img_crop_list)}, region nums: {len(region_det_res)}')
+        return ocr_result_list
+
+    def create_formula_queue(self):
+        """Create a document level formula recognition queue, return None if
+        formula recognition or the queue is disabled."""
+        if not self.apply_formula or not self.mfr_queue_enable:
+            return None
+        from magic_pdf.model.sub_modules.mfr.unimernet.Unimernet import \
+            FormulaRecognitionQueue
+
+        return FormulaRecognitionQueue(self.mfr_model, batch_size=self.mfr_batch_size)
 
+    def __call__(self, image, layout_res=None, formula_queue=None, mfd_res=None, text_lines=None, math_hint=None):
+
+        # layout检测与公式检测，传入layout_res时mfd_res需一并传入，None表示跳过公式
+        if layout_res is None:
+            images_layout_res, images_mfd_res = self.detect_pages([image], [math_hint])
+            layout_res, mfd_res = images_layout_res[0], images_mfd_res[0]
+
+        pil_img = Image.fromarray(image)
+
+        if self.apply_formula and mfd_res is not None:
             # 公式识别
-            mfr_start = time.time()
-            formula_list = self.mfr_model.predict(mfd_res, image)
-            layout_res.extend(formula_list)
-            mfr_cost = round(time.time() - mfr_start, 2)
-            logger.info(f'formula nums: {len(formula_list)}, mfr time: {mfr_cost}')
+            if formula_queue is not None:
+                # latex在文档级队列flush时回填
+                formula_list, mf_image_list = self.mfr_model.get_formula_crops(mfd_res, image)
+                formula_queue.put(formula_list, mf_image_list)
+                layout_res.extend(formula_list)
+            else:
+                mfr_start = time.time()
+                formula_list = self.mfr_model.predict(mfd_res, image, batch_size=self.mfr_batch_size)
+                layout_res.extend(formula_list)
+                mfr_cost = round(time.time() - mfr_start, 2)
+                logger.info(f'formula nums: {len(formula_list)}, mfr time: {mfr_cost}')
 
         # 清理显存
         clean_vram(self.device, vram_threshold=8)
@@ -224,8 +428,62 @@ class CustomPEKModel:
             get_res_list_from_layout_res(layout_res)
         )
 
-        # ocr识别
+        # ocr与表格识别处理不同的区域，并发执行；表格结果直接写回table_res_list中的区域
+        stages = {'ocr': lambda: self.ocr_predict(pil_img, ocr_res_list, single_page_mfdetrec_res, text_lines)}
+        if self.apply_table:
+            stages['table'] = lambda: self.table_predict(pil_img, table_res_list, text_lines)
+        results = self.stage_executor.run(stages)
+        layout_res.extend(results['ocr'])
+
+        return layout_res
+
+    def ocr_predict(self, pil_img, ocr_res_list, single_page_mfdetrec_res, text_lines=None) -> list:
+        """Run ocr (or text detection only when ocr is disabled) on the ocr
+        regions of a page, return the category 15 spans.
+
+        When ocr is disabled and the page has ``text_lines`` from the pdf text
+        layer, the boxes of the regions covered by text lines are built from
+        those lines and only the other regions go through the text detector.
+        """
         ocr_start = time.time()
+        ocr_result_list = []
+        # 跳过几乎全白的区域
+        page_arr = np.asarray(pil_img)
+        non_blank_res_list = []
+        for res in ocr_res_list:
+            xmin, ymin = max(int(res['poly'][0]), 0), max(int(res['poly'][1]), 0)
+            xmax, ymax = int(res['poly'][4]), int(res['poly'][5])
+            if not is_blank_image(page_arr[ymin:ymax, xmin:xmax]):
+                non_blank_res_list.append(res)
+        if len(non_blank_res_list) < len(ocr_res_list):
+            logger.info(f'skip blank ocr regions: {len(ocr_res_list) - len(non_blank_res_list)}')
+        ocr_res_list = non_blank_res_list
+
+        if self.ocr_text_layer_det and text_lines:
+            det_res_list = []
+            for res in ocr_res_list:
+                region_bbox = [res['poly'][0], res['poly'][1], res['poly'][4], res['poly'][5]]
+                dt_boxes = get_text_layer_dt_boxes(text_lines, region_bbox)
+                if not dt_boxes:
+                    det_res_list.append(res)
+                    continue
+                # 与检测模型的后处理一致：合并同一行的框，再避开公式区域
+                dt_boxes = merge_det_boxes(dt_boxes)
+                if single_page_mfdetrec_res:
+                    dt_boxes = update_det_boxes(dt_boxes, single_page_mfdetrec_res)
+                ocr_result_list.extend(
+                    get_ocr_result_list([box.tolist() for box in dt_boxes], [0, 0, 0, 0, 0, 0, 0, 0])
+                )
+            logger.info(f'text layer det regions: {len(ocr_res_list) - len(det_res_list)}, '
+                        f'detector regions: {len(det_res_list)}')
+            ocr_res_list = det_res_list
+
+        if self.apply_ocr and self.ocr_batch_rec:
+            # 先逐区域检测文本行，再把整页的文本行一次性送入识别模型
+            ocr_result_list.extend(
+                self.batch_ocr(pil_img, ocr_res_list, single_page_mfdetrec_res)
+            )
+            ocr_res_list = []
         # Process each area that requires OCR processing
         for res in ocr_res_list:
             new_image, useful_list = crop_img(res, pil_img, crop_paste_x=50, crop_paste_y=50)
@@ -241,53 +499,83 @@ class CustomPEKModel:
 
             # Integration results
             if ocr_res:
-                ocr_result_list = get_ocr_result_list(ocr_res, useful_list)
-                layout_res.extend(ocr_result_list)
+                ocr_result_list.extend(get_ocr_result_list(ocr_res, useful_list))
 
         ocr_cost = round(time.time() - ocr_start, 2)
         if self.apply_ocr:
             logger.info(f"ocr time: {ocr_cost}")
         else:
             logger.info(f"det time: {ocr_cost}")
+        return ocr_result_list
 
-        # 表格识别 table recognition
-        if self.apply_table:
-            table_start = time.time()
-            for res in table_res_list:
-                new_image, _ = crop_img(res, pil_img)
-                single_table_start_time = time.time()
+    def _struct_eqtable_batch_predict(self, table_images):
+        with torch.no_grad():
+            return self.table_model.batch_predict(table_images, 'html')
+
+    def table_predict(self, pil_img, table_res_list, text_lines=None):
+        """Recognize the table regions of a page, the html is written to the
+        ``html`` key of each region.
+
+        ``text_lines`` are the existing text lines of the page in image
+        coordinates, RapidTable uses the lines inside a table as its ocr result
+        and only runs its own ocr on the tables they do not cover.
+
+        Tables that fail or run over ``table_max_time`` get no html and are
+        kept as images by the later stages.
+        """
+        if not table_res_list:
+            return
+        table_start = time.time()
+        table_crops = [crop_img(res, pil_img) for res in table_res_list]
+        table_images = [new_image for new_image, _ in table_crops]
+        if self.table_model_name == MODEL_NAME.STRUCT_EQTABLE:
+            # 整页的表格按batch_size分批送入模型，每批最多max_time
+            batch_nums = math.ceil(len(table_images) / self.table_batch_size)
+            html_codes = self.table_runner.run(
+                self._struct_eqtable_batch_predict, table_images, deadline=self.table_max_time * batch_nums
+            )
+            if html_codes is None:
+                html_codes = [None] * len(table_images)
+        else:
+            html_codes = []
+            reused_nums = 0
+            for new_image, useful_list in table_crops:
                 html_code = None
-                if self.table_model_name == MODEL_NAME.STRUCT_EQTABLE:
-                    with torch.no_grad():
-                        table_result = self.table_model.predict(new_image, 'html')
-                        if len(table_result) > 0:
-                            html_code = table_result[0]
-                elif self.table_model_name == MODEL_NAME.TABLE_MASTER:
-                    html_code = self.table_model.img2html(new_image)
+                if self.table_model_name == MODEL_NAME.TABLE_MASTER:
+                    html_code = self.table_runner.run(self.table_model.img2html, new_image)
                 elif self.table_model_name == MODEL_NAME.RAPID_TABLE:
-                    html_code, table_cell_bboxes, elapse = self.table_model.predict(
-                        new_image
-                    )
-                run_time = time.time() - single_table_start_time
-                if run_time > self.table_max_time:
-                    logger.warning(
-                        f'table recognition processing exceeds max time {self.table_max_time}s'
-                    )
-                # 判断是否返回正常
-                if html_code:
-                    expected_ending = html_code.strip().endswith(
-                        '</html>'
-                    ) or html_code.strip().endswith('</table>')
-                    if expected_ending:
-                        res['html'] = html_code
-                    else:
-                        logger.warning(
-                            'table recognition processing fails, not found expected HTML table end'
-                        )
+                    ocr_result = None
+                    if text_lines:
+                        _, _, xmin, ymin, xmax, ymax, _, _ = useful_list
+                        ocr_result = get_table_ocr_result(text_lines, [xmin, ymin, xmax, ymax])
+                        reused_nums += 1 if ocr_result else 0
+                    table_result = self.table_runner.run(self.table_model.predict, new_image, ocr_result)
+                    if table_result is not None:
+                        html_code, table_cell_bboxes, elapse = table_result
+                html_codes.append(html_code)
+            if reused_nums > 0:
+                logger.info(f'table nums using existing text: {reused_nums}')
+
+        for res, html_code in zip(table_res_list, html_codes):
+            # 判断是否返回正常
+            if html_code:
+                expected_ending = html_code.strip().endswith(
+                    '</html>'
+                ) or html_code.strip().endswith('</table>')
+                if expected_ending:
+                    res['html'] = html_code
                 else:
                     logger.warning(
-                        'table recognition processing fails, not get html return'
+                        'table recognition processing fails, not found expected HTML table end'
                     )
-            logger.info(f'table time: {round(time.time() - table_start, 2)}')
-
-        return layout_res
+            else:
+                logger.warning(
+                    'table recognition processing fails, not get html return'
+                )
+        table_stats = self.table_runner.pop_stats()
+        if table_stats['timeouts'] or table_stats['skipped']:
+            logger.warning(
+                f'table predictions timed out: {table_stats["timeouts"]}, '
+                f'skipped while the model was busy: {table_stats["skipped"]}'
+            )
+        logger.info(f'table nums: {len(table_res_list)}, table time: {round(time.time() - table_start, 2)}')
@@ -1,14 +1,43 @@
 from doclayout_yolo import YOLOv10
+from loguru import logger
+
+from magic_pdf.model.sub_modules.model_utils import get_onnx_weights
 
 
 class DocLayoutYOLOModel(object):
-    def __init__(self, weight, device):
+    def __init__(self, weight, device, backend='torch'):
         self.model = YOLOv10(weight)
         self.device = device
+        if backend == 'onnx':
+            # 导出一次onnx，之后用onnxruntime在cpu上推理
+            onnx_weight = get_onnx_weights(self.model, weight, imgsz=1024)
+            if onnx_weight is not None:
+                self.model = YOLOv10(onnx_weight, task='detect')
+                self.device = 'cpu'
+                logger.info(f'doclayout_yolo backend: onnx, {onnx_weight}')
 
     def predict(self, image):
-        layout_res = []
         doclayout_yolo_res = self.model.predict(image, imgsz=1024, conf=0.25, iou=0.45, verbose=True, device=self.device)[0]
+        return self._parse_result(doclayout_yolo_res)
+
+    def batch_predict(self, images: list, batch_size: int) -> list:
+        images_layout_res = []
+        for index in range(0, len(images), batch_size):
+            doclayout_yolo_res = self.model.predict(
+                images[index: index + batch_size],
+                imgsz=1024,
+                conf=0.25,
+                iou=0.45,
+                verbose=False,
+                device=self.device,
+            )
+            for image_res in doclayout_yolo_res:
+                images_layout_res.append(self._parse_result(image_res))
+        return images_layout_res
+
+    @staticmethod
+    def _parse_result(doclayout_yolo_res):
+        layout_res = []
         for xyxy, conf, cla in zip(doclayout_yolo_res.boxes.xyxy.cpu(), doclayout_yolo_res.boxes.conf.cpu(),
                                    doclayout_yolo_res.boxes.cls.cpu()):
             xmin, ymin, xmax, ymax = [int(p.item()) for p in xyxy]
@@ -1,3 +1,5 @@
+import torch
+
 from .visualizer import Visualizer
 from .rcnn_vl import *
 from .backbone import *
@@ -130,8 +132,34 @@ class Layoutlmv3_Predictor(object):
         # page_layout_result = {
         #     "layout_dets": []
         # }
-        layout_dets = []
         outputs = self.predictor(image)
+        return self._parse_outputs(outputs, ignore_catids)
+
+    def batch_predict(self, images: list, batch_size: int, ignore_catids=[]) -> list:
+        """Run several pages through the detector in one forward pass.
+
+        Mirrors the preprocessing of DefaultPredictor.__call__, but feeds a list
+        of inputs to the underlying model instead of a single one.
+        """
+        images_layout_res = []
+        for index in range(0, len(images), batch_size):
+            inputs = []
+            for image in images[index: index + batch_size]:
+                if self.predictor.input_format == "RGB":
+                    image = image[:, :, ::-1]
+                height, width = image.shape[:2]
+                transformed = self.predictor.aug.get_transform(image).apply_image(image)
+                transformed = torch.as_tensor(transformed.astype("float32").transpose(2, 0, 1))
+                inputs.append({"image": transformed, "height": height, "width": width})
+            with torch.no_grad():
+                batch_outputs = self.predictor.model(inputs)
+            for outputs in batch_outputs:
+                images_layout_res.append(self._parse_outputs(outputs, ignore_catids))
+        return images_layout_res
+
+    @staticmethod
+    def _parse_outputs(outputs, ignore_catids):
+        layout_dets = []
         boxes = outputs["instances"].to("cpu")._fields["pred_boxes"].tensor.tolist()
         labels = outputs["instances"].to("cpu")._fields["pred_classes"].tolist()
         scores = outputs["instances"].to("cpu")._fields["scores"].tolist()
@@ -1,12 +1,22 @@
+from loguru import logger
 from ultralytics import YOLO
 
+from magic_pdf.model.sub_modules.model_utils import get_onnx_weights
+
 
 class YOLOv8MFDModel(object):
-    def __init__(self, weight, device='cpu'):
+    def __init__(self, weight, device='cpu', backend='torch'):
         self.mfd_model = YOLO(weight)
         self.device = device
+        if backend == 'onnx':
+            # 导出一次onnx，之后用onnxruntime在cpu上推理
+            onnx_weight = get_onnx_weights(self.mfd_model, weight, imgsz=1888)
+            if onnx_weight is not None:
+                self.mfd_model = YOLO(onnx_weight, task='detect')
+                self.device = 'cpu'
+                logger.info(f'mfd backend: onnx, {onnx_weight}')
 
-    def predict(self, image):
-        mfd_res = self.mfd_model.predict(image, imgsz=1888, conf=0.25, iou=0.45, verbose=True, device=self.device)[0]
+    def predict(self, image, imgsz=1888, conf=0.25):
+        mfd_res = self.mfd_model.predict(image, imgsz=imgsz, conf=conf, iou=0.45, verbose=True, device=self.device)[0]
         return mfd_res
 
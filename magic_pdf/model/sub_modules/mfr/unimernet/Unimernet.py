@@ -1,7 +1,10 @@
 import os
 import argparse
+import math
 import re
+import time
 
+from loguru import logger
 from PIL import Image
 import torch
 from torch.utils.data import Dataset, DataLoader
@@ -49,8 +52,40 @@ def latex_rm_whitespace(s: str):
     return s
 
 
+def quantize_linear_layers(model, scope='decoder'):
+    """Dynamic int8 quantization of the linear layers, for cpu inference.
+
+    Args:
+        model: the unimernet model
+        scope (str): 'decoder' quantizes only the decoder, 'all' also the encoder
+
+    Returns:
+        the quantized model
+    """
+    qconfig_spec = {torch.nn.Linear}
+    if scope == 'decoder':
+        # 按模块名限定量化范围，取最外层的decoder
+        decoder_names = [name for name, _ in model.named_modules() if name.split('.')[-1] == 'decoder']
+        if decoder_names:
+            qconfig_spec = {min(decoder_names, key=lambda name: name.count('.'))}
+        else:
+            logger.warning('decoder of unimernet not found, quantize all linear layers')
+    return torch.ao.quantization.quantize_dynamic(model, qconfig_spec, dtype=torch.qint8)
+
+
+def formula_batch_key(image) -> tuple:
+    """Sort key of a formula crop, (aspect ratio bucket, area).
+
+    Crops of the same area can be a wide one line formula or a tall multi line
+    one, which pad and decode very differently, so the crops are first bucketed
+    by the power of two of their width / height ratio and then ordered by area.
+    """
+    width, height = image.size
+    return math.floor(math.log2(max(width, 1) / max(height, 1))), width * height
+
+
 class UnimernetModel(object):
-    def __init__(self, weight_dir, cfg_path, _device_='cpu'):
+    def __init__(self, weight_dir, cfg_path, _device_='cpu', quantize=None):
 
         args = argparse.Namespace(cfg_path=cfg_path, options=None)
         cfg = Config(args)
@@ -62,13 +97,23 @@ class UnimernetModel(object):
         self.device = _device_
         self.model.to(_device_)
         self.model.eval()
+        if quantize in ['decoder', 'all']:
+            if str(_device_).startswith('cpu'):
+                quantize_start = time.time()
+                self.model = quantize_linear_layers(self.model, quantize)
+                logger.warning(
+                    f'unimernet quantize: {quantize} is experimental, the accuracy is not measured, '
+                    f'time: {round(time.time() - quantize_start, 2)}'
+                )
+            else:
+                logger.warning(f'unimernet quantize only works on cpu, ignored on {_device_}')
         vis_processor = load_processor('formula_image_eval', cfg.config.datasets.formula_rec_eval.vis_processor.eval)
         self.mfr_transform = transforms.Compose([vis_processor, ])
 
-    def predict(self, mfd_res, image):
-
+    def get_formula_crops(self, mfd_res, image):
         formula_list = []
         mf_image_list = []
+        pil_img = Image.fromarray(image)
         for xyxy, conf, cla in zip(mfd_res.boxes.xyxy.cpu(), mfd_res.boxes.conf.cpu(), mfd_res.boxes.cls.cpu()):
             xmin, ymin, xmax, ymax = [int(p.item()) for p in xyxy]
             new_item = {
@@ -78,21 +123,74 @@ class UnimernetModel(object):
                 'latex': '',
             }
             formula_list.append(new_item)
-            pil_img = Image.fromarray(image)
             bbox_img = pil_img.crop((xmin, ymin, xmax, ymax))
             mf_image_list.append(bbox_img)
+        return formula_list, mf_image_list
 
-        dataset = MathDataset(mf_image_list, transform=self.mfr_transform)
-        dataloader = DataLoader(dataset, batch_size=64, num_workers=0)
+    def predict(self, mfd_res, image, batch_size=64):
+        formula_list, mf_image_list = self.get_formula_crops(mfd_res, image)
+        self.batch_predict(formula_list, mf_image_list, batch_size)
+        return formula_list
+
+    def batch_predict(self, formula_list: list, mf_image_list: list, batch_size=64):
+        """Recognize formula crops and write the latex back to formula_list.
+
+        Crops are ordered by formula_batch_key before batching, so that the
+        formulas in one batch have similar shapes and decode lengths and the
+        generate loop does not keep running for a single long formula while the
+        rest of the batch is done.
+        """
+        if len(mf_image_list) == 0:
+            return formula_list
+
+        sorted_indices = sorted(range(len(mf_image_list)), key=lambda i: formula_batch_key(mf_image_list[i]))
+        sorted_images = [mf_image_list[i] for i in sorted_indices]
+
+        dataset = MathDataset(sorted_images, transform=self.mfr_transform)
+        dataloader = DataLoader(dataset, batch_size=batch_size, num_workers=0)
         mfr_res = []
         for mf_img in dataloader:
             mf_img = mf_img.to(self.device)
             with torch.no_grad():
                 output = self.model.generate({'image': mf_img})
             mfr_res.extend(output['pred_str'])
-        for res, latex in zip(formula_list, mfr_res):
-            res['latex'] = latex_rm_whitespace(latex)
+
+        for index, latex in zip(sorted_indices, mfr_res):
+            formula_list[index]['latex'] = latex_rm_whitespace(latex)
         return formula_list
 
 
+class FormulaRecognitionQueue(object):
+    """Collect formula crops from many pages and recognize them together.
+
+    Formula detection boxes are enough for the following ocr and table stages,
+    so the latex of every formula can be filled in later, once a whole document
+    has been walked. The queue is flushed automatically when more than
+    ``max_pending`` crops are waiting, to keep the memory bounded.
+    """
 
+    def __init__(self, mfr_model: UnimernetModel, batch_size=64, max_pending=4096):
+        self.mfr_model = mfr_model
+        self.batch_size = batch_size
+        self.max_pending = max_pending
+        self.formula_list = []
+        self.mf_image_list = []
+
+    def __len__(self):
+        return len(self.formula_list)
+
+    def put(self, formula_list: list, mf_image_list: list):
+        self.formula_list.extend(formula_list)
+        self.mf_image_list.extend(mf_image_list)
+        if len(self) >= self.max_pending:
+            self.flush()
+
+    def flush(self):
+        if len(self) == 0:
+            return
+        mfr_start = time.time()
+        formula_nums = len(self)
+        self.mfr_model.batch_predict(self.formula_list, self.mf_image_list, self.batch_size)
+        self.formula_list = []
+        self.mf_image_list = []
+        logger.info(f'formula nums: {formula_nums}, queued mfr time: {round(time.time() - mfr_start, 2)}')
@@ -1,34 +1,33 @@
 from loguru import logger
 
 from magic_pdf.config.constants import MODEL_NAME
+from magic_pdf.libs.config_reader import get_model_registry_config
+from magic_pdf.libs.thread_budget import get_thread_budget
 from magic_pdf.model.model_list import AtomicModel
-from magic_pdf.model.sub_modules.layout.doclayout_yolo.DocLayoutYOLO import \
-    DocLayoutYOLOModel
-from magic_pdf.model.sub_modules.layout.layoutlmv3.model_init import \
-    Layoutlmv3_Predictor
-from magic_pdf.model.sub_modules.mfd.yolov8.YOLOv8 import YOLOv8MFDModel
-from magic_pdf.model.sub_modules.mfr.unimernet.Unimernet import UnimernetModel
-from magic_pdf.model.sub_modules.ocr.paddleocr.ppocr_273_mod import \
-    ModifiedPaddleOCR
-from magic_pdf.model.sub_modules.table.rapidtable.rapid_table import \
-    RapidTableModel
-# from magic_pdf.model.sub_modules.ocr.paddleocr.ppocr_291_mod import ModifiedPaddleOCR
-from magic_pdf.model.sub_modules.table.structeqtable.struct_eqtable import \
-    StructTableModel
-from magic_pdf.model.sub_modules.table.tablemaster.tablemaster_paddle import \
-    TableMasterPaddleModel
-
-
-def table_model_init(table_model_type, model_path, max_time, _device_='cpu'):
+from magic_pdf.model.model_registry import ModelRegistry
+
+# 各后端的依赖较重，只在初始化选中的模型时才导入
+
+
+def table_model_init(table_model_type, model_path, max_time, _device_='cpu', batch_size=1):
     if table_model_type == MODEL_NAME.STRUCT_EQTABLE:
-        table_model = StructTableModel(model_path, max_new_tokens=2048, max_time=max_time)
+        from magic_pdf.model.sub_modules.table.structeqtable.struct_eqtable import \
+            StructTableModel
+        table_model = StructTableModel(model_path, max_new_tokens=2048, max_time=max_time, batch_size=batch_size)
     elif table_model_type == MODEL_NAME.TABLE_MASTER:
+        from magic_pdf.model.sub_modules.table.tablemaster.tablemaster_paddle import \
+            TableMasterPaddleModel
         config = {
             'model_dir': model_path,
             'device': _device_
         }
+        thread_budget = get_thread_budget()
+        if thread_budget is not None:
+            config['cpu_threads'] = thread_budget['paddle_threads']
         table_model = TableMasterPaddleModel(config)
     elif table_model_type == MODEL_NAME.RAPID_TABLE:
+        from magic_pdf.model.sub_modules.table.rapidtable.rapid_table import \
+            RapidTableModel
         table_model = RapidTableModel()
     else:
         logger.error('table model type not allow')
@@ -37,23 +36,30 @@ def table_model_init(table_model_type, model_path, max_time, _device_='cpu'):
     return table_model
 
 
-def mfd_model_init(weight, device='cpu'):
-    mfd_model = YOLOv8MFDModel(weight, device)
+def mfd_model_init(weight, device='cpu', backend='torch'):
+    from magic_pdf.model.sub_modules.mfd.yolov8.YOLOv8 import YOLOv8MFDModel
+    mfd_model = YOLOv8MFDModel(weight, device, backend)
     return mfd_model
 
 
-def mfr_model_init(weight_dir, cfg_path, device='cpu'):
-    mfr_model = UnimernetModel(weight_dir, cfg_path, device)
+def mfr_model_init(weight_dir, cfg_path, device='cpu', quantize=None):
+    from magic_pdf.model.sub_modules.mfr.unimernet.Unimernet import \
+        UnimernetModel
+    mfr_model = UnimernetModel(weight_dir, cfg_path, device, quantize)
     return mfr_model
 
 
 def layout_model_init(weight, config_file, device):
+    from magic_pdf.model.sub_modules.layout.layoutlmv3.model_init import \
+        Layoutlmv3_Predictor
     model = Layoutlmv3_Predictor(weight, config_file, device)
     return model
 
 
-def doclayout_yolo_model_init(weight, device='cpu'):
-    model = DocLayoutYOLOModel(weight, device)
+def doclayout_yolo_model_init(weight, device='cpu', backend='torch'):
+    from magic_pdf.model.sub_modules.layout.doclayout_yolo.DocLayoutYOLO import \
+        DocLayoutYOLOModel
+    model = DocLayoutYOLOModel(weight, device, backend)
     return model
 
 
@@ -63,6 +69,13 @@ def ocr_model_init(show_log: bool = False,
                    use_dilation=True,
                    det_db_unclip_ratio=1.8,
                    ):
+    from magic_pdf.model.sub_modules.ocr.paddleocr.ppocr_273_mod import \
+        ModifiedPaddleOCR
+    # from magic_pdf.model.sub_modules.ocr.paddleocr.ppocr_291_mod import ModifiedPaddleOCR
+    ocr_kwargs = {}
+    thread_budget = get_thread_budget()
+    if thread_budget is not None:
+        ocr_kwargs['cpu_threads'] = thread_budget['paddle_threads']
     if lang is not None and lang != '':
         model = ModifiedPaddleOCR(
             show_log=show_log,
@@ -70,6 +83,7 @@ def ocr_model_init(show_log: bool = False,
             lang=lang,
             use_dilation=use_dilation,
             det_db_unclip_ratio=det_db_unclip_ratio,
+            **ocr_kwargs,
         )
     else:
         model = ModifiedPaddleOCR(
@@ -78,37 +92,58 @@ def ocr_model_init(show_log: bool = False,
             use_dilation=use_dilation,
             det_db_unclip_ratio=det_db_unclip_ratio,
             # use_angle_cls=True,
+            **ocr_kwargs,
         )
     return model
 
 
 class AtomModelSingleton:
     _instance = None
-    _models = {}
+    _registry = None
 
     def __new__(cls, *args, **kwargs):
         if cls._instance is None:
             cls._instance = super().__new__(cls)
         return cls._instance
 
+    @property
+    def registry(self) -> ModelRegistry:
+        """The registry of the loaded atom models, models are unloaded by LRU
+        once they take more than max_memory_mb of the model-registry-config."""
+        if AtomModelSingleton._registry is None:
+            registry_config = get_model_registry_config()
+            AtomModelSingleton._registry = ModelRegistry(
+                'atom model registry',
+                max_bytes=int(registry_config.get('max_memory_mb', 0)) * 1024 * 1024,
+            )
+        return AtomModelSingleton._registry
+
     def get_atom_model(self, atom_model_name: str, **kwargs):
 
         lang = kwargs.get('lang', None)
         layout_model_name = kwargs.get('layout_model_name', None)
         table_model_name = kwargs.get('table_model_name', None)
+        backend = kwargs.get('backend', 'torch')
 
         if atom_model_name in [AtomicModel.OCR]:
             key = (atom_model_name, lang)
         elif atom_model_name in [AtomicModel.Layout]:
-            key = (atom_model_name, layout_model_name)
+            key = (atom_model_name, layout_model_name, backend)
+        elif atom_model_name in [AtomicModel.MFD]:
+            key = (atom_model_name, backend)
+        elif atom_model_name in [AtomicModel.MFR]:
+            key = (atom_model_name, kwargs.get('mfr_quantize', None))
         elif atom_model_name in [AtomicModel.Table]:
-            key = (atom_model_name, table_model_name)
+            key = (
+                atom_model_name,
+                table_model_name,
+                kwargs.get('table_max_time', None),
+                kwargs.get('table_batch_size', 1),
+            )
         else:
             key = atom_model_name
 
-        if key not in self._models:
-            self._models[key] = atom_model_init(model_name=atom_model_name, **kwargs)
-        return self._models[key]
+        return self.registry.get(key, lambda: atom_model_init(model_name=atom_model_name, **kwargs))
 
 def atom_model_init(model_name: str, **kwargs):
     atom_model = None
@@ -122,18 +157,21 @@ def atom_model_init(model_name: str, **kwargs):
         elif kwargs.get('layout_model_name') == MODEL_NAME.DocLayout_YOLO:
             atom_model = doclayout_yolo_model_init(
                 kwargs.get('doclayout_yolo_weights'),
-                kwargs.get('device')
+                kwargs.get('device'),
+                kwargs.get('backend', 'torch'),
             )
     elif model_name == AtomicModel.MFD:
         atom_model = mfd_model_init(
             kwargs.get('mfd_weights'),
-            kwargs.get('device')
+            kwargs.get('device'),
+            kwargs.get('backend', 'torch'),
         )
     elif model_name == AtomicModel.MFR:
         atom_model = mfr_model_init(
             kwargs.get('mfr_weight_dir'),
             kwargs.get('mfr_cfg_path'),
-            kwargs.get('device')
+            kwargs.get('device'),
+            kwargs.get('mfr_quantize'),
         )
     elif model_name == AtomicModel.OCR:
         atom_model = ocr_model_init(
@@ -146,7 +184,8 @@ def atom_model_init(model_name: str, **kwargs):
             kwargs.get('table_model_name'),
             kwargs.get('table_model_path'),
             kwargs.get('table_max_time'),
-            kwargs.get('device')
+            kwargs.get('device'),
+            kwargs.get('table_batch_size', 1),
         )
     else:
         logger.error('model name not allow')
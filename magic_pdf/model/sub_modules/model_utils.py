@@ -1,9 +1,12 @@
+import os
 import time
 
-import torch
+import numpy as np
 from PIL import Image
 from loguru import logger
 
+from magic_pdf.config.constants import (BLANK_CONTENT_RATIO,
+                                        BLANK_PIXEL_THRESHOLD)
 from magic_pdf.libs.clean_memory import clean_memory
 
 
@@ -23,6 +26,45 @@ def crop_img(input_res, input_pil_img, crop_paste_x=0, crop_paste_y=0):
     return return_image, return_list
 
 
+def is_blank_image(img, pixel_threshold=BLANK_PIXEL_THRESHOLD, content_ratio=BLANK_CONTENT_RATIO) -> bool:
+    """Check whether an RGB or gray image is (almost) white, by the ratio of
+    pixels darker than pixel_threshold."""
+    img = np.asarray(img)
+    if img.size == 0:
+        return True
+    # 取最暗的通道，彩色内容也算作非空白
+    gray = img.min(axis=2) if img.ndim == 3 else img
+    # 大图下采样后统计，短边保留约512个像素
+    step = max(1, min(gray.shape[:2]) // 512)
+    sample = gray[::step, ::step]
+    return np.count_nonzero(sample < pixel_threshold) <= sample.size * content_ratio
+
+
+def get_onnx_weights(model, weight, imgsz):
+    """Get the onnx graph of an ultralytics style detector, stored next to
+    its weights, export it on first use.
+
+    Args:
+        model: the loaded pytorch detector, used only for the export
+        weight (str): path of the pytorch weights
+        imgsz (int): the image size to export with, the graph has dynamic axes
+
+    Returns:
+        str | None: path of the onnx graph, None if the export failed
+    """
+    onnx_path = os.path.splitext(weight)[0] + '.onnx'
+    if os.path.exists(onnx_path):
+        return onnx_path
+    try:
+        export_start = time.time()
+        exported_path = model.export(format='onnx', imgsz=imgsz, dynamic=True, device='cpu')
+        logger.info(f'export onnx: {exported_path}, time: {round(time.time() - export_start, 2)}')
+        return str(exported_path)
+    except Exception as e:
+        logger.warning(f'export onnx of {weight} failed, use pytorch instead: {e}')
+        return None
+
+
 # Select regions for OCR / formula regions / table regions
 def get_res_list_from_layout_res(layout_res):
     ocr_res_list = []
@@ -51,6 +93,8 @@ def clean_vram(device, vram_threshold=8):
 
 
 def get_vram(device):
+    import torch
+
     if torch.cuda.is_available() and device != 'cpu':
         total_memory = torch.cuda.get_device_properties(device).total_memory / (1024 ** 3)  # 将字节转换为 GB
         return total_memory
@@ -250,6 +250,24 @@ def get_adjusted_mfdetrec_res(single_page_mfdetrec_res, useful_list):
     return adjusted_mfdetrec_res
 
 
+def get_text_layer_dt_boxes(text_lines, region_bbox):
+    """Build text detection boxes of a region from the pdf text layer lines
+    whose center is inside the region, clipped to the region.
+
+    :param text_lines: [{'bbox': [x0, y0, x1, y1], 'text': str}] in page image coordinates
+    :param region_bbox: [x0, y0, x1, y1] of the region in page image coordinates
+    :return: A list of boxes represented by four corner points, in page image coordinates
+    """
+    rx0, ry0, rx1, ry1 = region_bbox
+    dt_boxes = []
+    for line in text_lines:
+        x0, y0, x1, y1 = line['bbox']
+        cx, cy = (x0 + x1) / 2, (y0 + y1) / 2
+        if rx0 <= cx <= rx1 and ry0 <= cy <= ry1:
+            dt_boxes.append(bbox_to_points([max(x0, rx0), max(y0, ry0), min(x1, rx1), min(y1, ry1)]))
+    return dt_boxes
+
+
 def get_ocr_result_list(ocr_res, useful_list):
     paste_x, paste_y, xmin, ymin, xmax, ymax, new_width, new_height = useful_list
     ocr_result_list = []
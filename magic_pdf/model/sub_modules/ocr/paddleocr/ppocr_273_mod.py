@@ -1,4 +1,3 @@
-import copy
 import time
 import cv2
 import numpy as np
@@ -132,8 +131,6 @@ class ModifiedPaddleOCR(PaddleOCR):
         else:
             logger.debug("dt_boxes num : {}, elapsed : {}".format(
                 len(dt_boxes), elapse))
-        img_crop_list = []
-
         dt_boxes = sorted_boxes(dt_boxes)
 
         # merge_det_boxes 和 update_det_boxes 都会把poly转成bbox再转回poly，因此需要过滤所有倾斜程度较大的文本框
@@ -146,13 +143,7 @@ class ModifiedPaddleOCR(PaddleOCR):
             logger.debug("split text box by formula, new dt_boxes num : {}, elapsed : {}".format(
                 len(dt_boxes), aft - bef))
 
-        for bno in range(len(dt_boxes)):
-            tmp_box = copy.deepcopy(dt_boxes[bno])
-            if self.args.det_box_type == "quad":
-                img_crop = get_rotate_crop_image(ori_im, tmp_box)
-            else:
-                img_crop = get_minarea_rect_crop(ori_im, tmp_box)
-            img_crop_list.append(img_crop)
+        img_crop_list = self.get_text_line_crops(ori_im, dt_boxes)
         if self.use_angle_cls and cls:
             img_crop_list, angle_list, elapse = self.text_classifier(
                 img_crop_list)
@@ -175,4 +166,35 @@ class ModifiedPaddleOCR(PaddleOCR):
                 filter_rec_res.append(rec_result)
         end = time.time()
         time_dict['all'] = end - start
-        return filter_boxes, filter_rec_res, time_dict
\ No newline at end of file
+        return filter_boxes, filter_rec_res, time_dict
+
+    def get_text_line_crops(self, img, dt_boxes):
+        """Crop every detected text line out of img."""
+        img_crop_list = []
+        for bno in range(len(dt_boxes)):
+            # np.array会复制一份，不会修改原始box
+            tmp_box = np.array(dt_boxes[bno], dtype=np.float32)
+            if self.args.det_box_type == "quad":
+                img_crop = get_rotate_crop_image(img, tmp_box)
+            else:
+                img_crop = get_minarea_rect_crop(img, tmp_box)
+            img_crop_list.append(img_crop)
+        return img_crop_list
+
+    def batch_rec(self, img_crop_list, cls=True):
+        """Recognize text line crops, possibly coming from many regions, in one call.
+
+        text_recognizer sorts the crops by aspect ratio before it splits them into
+        batches of rec_batch_num, so a large list gives better filled batches than
+        many small calls. The result keeps the order of img_crop_list.
+        """
+        if len(img_crop_list) == 0:
+            return []
+        if self.use_angle_cls and cls:
+            img_crop_list, angle_list, elapse = self.text_classifier(img_crop_list)
+            logger.debug("cls num  : {}, elapsed : {}".format(
+                len(img_crop_list), elapse))
+        rec_res, elapse = self.text_recognizer(img_crop_list)
+        logger.debug("rec_res num  : {}, elapsed : {}".format(
+            len(rec_res), elapse))
+        return rec_res
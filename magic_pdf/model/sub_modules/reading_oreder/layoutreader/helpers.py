@@ -1,7 +1,9 @@
 from collections import defaultdict
+from functools import lru_cache
 from typing import List, Dict
 
 import torch
+from loguru import logger
 from transformers import LayoutLMv3ForTokenClassification
 
 MAX_LEN = 510
@@ -74,6 +76,29 @@ def boxes2inputs(boxes: List[List[int]]) -> Dict[str, torch.Tensor]:
     }
 
 
+def batch_boxes2inputs(boxes_list: List[List[List[int]]]) -> Dict[str, torch.Tensor]:
+    """
+    build the inputs of a batch of pages, padded to the longest page in the same way as DataCollator
+
+    :param boxes_list: boxes of every page, a page has at most MAX_LEN boxes
+    :return: batched inputs
+    """
+    max_len = max(len(boxes) for boxes in boxes_list) + 2
+    bbox = []
+    input_ids = []
+    attention_mask = []
+    for boxes in boxes_list:
+        pad_len = max_len - len(boxes) - 2
+        bbox.append([[0, 0, 0, 0]] + boxes + [[0, 0, 0, 0]] + [[0, 0, 0, 0]] * pad_len)
+        input_ids.append([CLS_TOKEN_ID] + [UNK_TOKEN_ID] * len(boxes) + [EOS_TOKEN_ID] + [EOS_TOKEN_ID] * pad_len)
+        attention_mask.append([1] + [1] * len(boxes) + [1] + [0] * pad_len)
+    return {
+        "bbox": torch.tensor(bbox),
+        "attention_mask": torch.tensor(attention_mask),
+        "input_ids": torch.tensor(input_ids),
+    }
+
+
 def prepare_inputs(
     inputs: Dict[str, torch.Tensor], model: LayoutLMv3ForTokenClassification
 ) -> Dict[str, torch.Tensor]:
@@ -121,5 +146,61 @@ def parse_logits(logits: torch.Tensor, length: int) -> List[int]:
     return ret
 
 
+def parse_logits_by_assignment(logits: torch.Tensor, length: int) -> List[int]:
+    """
+    parse logits to orders by solving the assignment of lines to orders in one step,
+    the orders maximize the sum of the log probabilities of the lines
+
+    :param logits: logits from model
+    :param length: input length
+    :return: orders
+    """
+    from scipy.optimize import linear_sum_assignment
+
+    logits = logits[1 : length + 1, :length].detach().float()
+    # 每行的logits为该行在各位置上的分布，取log概率使各行的得分可以相加
+    scores = torch.log_softmax(logits, dim=-1).numpy()
+    _, cols = linear_sum_assignment(scores, maximize=True)
+    return cols.tolist()
+
+
+DECODERS = {
+    "greedy": parse_logits,
+    "assignment": parse_logits_by_assignment,
+}
+
+
+@lru_cache(maxsize=None)
+def resolve_decoder(decoder: str) -> str:
+    """
+    resolve the decoder of reading-order-config.decoder to an available one, the warnings are logged once
+
+    :param decoder: the configured decoder
+    :return: "greedy" or "assignment"
+    """
+    if decoder not in DECODERS:
+        logger.warning(f"unknown layoutreader decoder: {decoder}, use greedy")
+        return "greedy"
+    if decoder == "assignment":
+        try:
+            import scipy.optimize  # noqa: F401
+        except ImportError:
+            logger.warning("scipy is not installed, the assignment decoder falls back to greedy")
+            return "greedy"
+    return decoder
+
+
+def decode_logits(logits: torch.Tensor, length: int, decoder: str = "greedy") -> List[int]:
+    """
+    parse logits to orders with the decoder selected by reading-order-config.decoder
+
+    :param logits: logits from model
+    :param length: input length
+    :param decoder: "greedy" for parse_logits, "assignment" for parse_logits_by_assignment, resolved by resolve_decoder
+    :return: orders
+    """
+    return DECODERS[decoder](logits, length)
+
+
 def check_duplicate(a: List[int]) -> bool:
     return len(a) != len(set(a))
@@ -17,11 +17,12 @@ def projection_by_bboxes(boxes: np.array, axis: int) -> np.ndarray:
     """
     assert axis in [0, 1]
     length = np.max(boxes[:, axis::2])
-    res = np.zeros(length, dtype=int)
-    # TODO: how to remove for loop?
-    for start, end in boxes[:, axis::2]:
-        res[start:end] += 1
-    return res
+    starts = boxes[:, axis]
+    ends = boxes[:, axis + 2]
+    # 差分数组：起点+1，终点-1，前缀和即为每个坐标上的框数，空框不计入
+    valid = ends > starts
+    diff = np.bincount(starts[valid], minlength=length + 1) - np.bincount(ends[valid], minlength=length + 1)
+    return np.cumsum(diff[:length])
 
 
 # from: https://dothinking.github.io/2021-06-19-%E9%80%92%E5%BD%92%E6%8A%95%E5%BD%B1%E5%88%86%E5%89%B2%E7%AE%97%E6%B3%95/#:~:text=%E9%80%92%E5%BD%92%E6%8A%95%E5%BD%B1%E5%88%86%E5%89%B2%EF%BC%88Recursive%20XY,%EF%BC%8C%E5%8F%AF%E4%BB%A5%E5%88%92%E5%88%86%E6%AE%B5%E8%90%BD%E3%80%81%E8%A1%8C%E3%80%82
@@ -61,8 +62,8 @@ def split_projection_profile(arr_values: np.array, min_value: float, min_gap: fl
 
     # convert to index of projection range:
     # the start index of zero interval is the end index of projection
-    arr_start = np.insert(arr_zero_intvl_end, 0, arr_index[0])
-    arr_end = np.append(arr_zero_intvl_start, arr_index[-1])
+    arr_start = np.concatenate((arr_index[:1], arr_zero_intvl_end))
+    arr_end = np.concatenate((arr_zero_intvl_start, arr_index[-1:]))
     arr_end += 1  # end index will be excluded as index slice
 
     return arr_start, arr_end
@@ -77,27 +78,49 @@ def recursive_xy_cut(boxes: np.ndarray, indices: List[int], res: List[int]):
         res: 保存输出结果
 
     """
-    # 向 y 轴投影
     assert len(boxes) == len(indices)
 
+    # 用显式栈代替递归，栈中为待切分的区域或已确定顺序的索引，逆序入栈以保持输出顺序
+    stack = [(boxes, np.asarray(indices))]
+    while stack:
+        item = stack.pop()
+        if not isinstance(item, tuple):
+            res.extend(item)
+            continue
+        stack.extend(reversed(_xy_cut_once(*item)))
+
+
+def _xy_cut_once(boxes: np.ndarray, indices: np.ndarray) -> list:
+    """Cut a region once in y and then in x.
+
+    Returns:
+        list: in reading order, the (boxes, indices) of the sub regions to cut again,
+            and the index arrays of the rows which can not be cut in x
+    """
+    items = []
+    # 向 y 轴投影
     _indices = boxes[:, 1].argsort()
     y_sorted_boxes = boxes[_indices]
     y_sorted_indices = indices[_indices]
 
-    # debug_vis(y_sorted_boxes, y_sorted_indices)
-
     y_projection = projection_by_bboxes(boxes=y_sorted_boxes, axis=1)
     pos_y = split_projection_profile(y_projection, 0, 1)
     if not pos_y:
-        return
+        return items
 
+    # 框已按y0排序，每个水平切分区域内的框是连续的一段
     arr_y0, arr_y1 = pos_y
-    for r0, r1 in zip(arr_y0, arr_y1):
-        # [r0, r1] 表示按照水平切分，有 bbox 的区域，对这些区域会再进行垂直切分
-        _indices = (r0 <= y_sorted_boxes[:, 1]) & (y_sorted_boxes[:, 1] < r1)
-
-        y_sorted_boxes_chunk = y_sorted_boxes[_indices]
-        y_sorted_indices_chunk = y_sorted_indices[_indices]
+    row_starts = np.searchsorted(y_sorted_boxes[:, 1], arr_y0, side='left')
+    row_ends = np.searchsorted(y_sorted_boxes[:, 1], arr_y1, side='left')
+    for row_start, row_end in zip(row_starts, row_ends):
+        y_sorted_boxes_chunk = y_sorted_boxes[row_start:row_end]
+        y_sorted_indices_chunk = y_sorted_indices[row_start:row_end]
+        if len(y_sorted_boxes_chunk) == 0:
+            continue
+        if len(y_sorted_boxes_chunk) == 1 and y_sorted_boxes_chunk[0, 2] > y_sorted_boxes_chunk[0, 0]:
+            # 单个框无需再切分，宽度为0的框与原逻辑一致交给x方向投影丢弃
+            items.append(y_sorted_indices_chunk)
+            continue
 
         _indices = y_sorted_boxes_chunk[:, 0].argsort()
         x_sorted_boxes_chunk = y_sorted_boxes_chunk[_indices]
@@ -112,17 +135,34 @@ def recursive_xy_cut(boxes: np.ndarray, indices: List[int], res: List[int]):
         arr_x0, arr_x1 = pos_x
         if len(arr_x0) == 1:
             # x 方向无法切分
-            res.extend(x_sorted_indices_chunk)
+            items.append(x_sorted_indices_chunk)
             continue
 
-        # x 方向上能分开，继续递归调用
-        for c0, c1 in zip(arr_x0, arr_x1):
-            _indices = (c0 <= x_sorted_boxes_chunk[:, 0]) & (
-                x_sorted_boxes_chunk[:, 0] < c1
-            )
-            recursive_xy_cut(
-                x_sorted_boxes_chunk[_indices], x_sorted_indices_chunk[_indices], res
-            )
+        # x 方向上能分开，继续切分
+        col_starts = np.searchsorted(x_sorted_boxes_chunk[:, 0], arr_x0, side='left')
+        col_ends = np.searchsorted(x_sorted_boxes_chunk[:, 0], arr_x1, side='left')
+        for col_start, col_end in zip(col_starts, col_ends):
+            items.append((x_sorted_boxes_chunk[col_start:col_end], x_sorted_indices_chunk[col_start:col_end]))
+    return items
+
+
+def batch_xy_cut(boxes_list: List[np.ndarray]) -> List[List[int]]:
+    """Order the boxes of many pages by xy-cut in one call.
+
+    Args:
+        boxes_list: the int boxes (N, 4) of every page
+
+    Returns:
+        the xy-cut order of the box indices of every page
+    """
+    orders_list = []
+    for boxes in boxes_list:
+        boxes = np.asarray(boxes).astype(int).reshape(-1, 4)
+        res = []
+        if len(boxes) > 0:
+            recursive_xy_cut(boxes, np.arange(len(boxes)), res)
+        orders_list.append([int(i) for i in res])
+    return orders_list
 
 
 def points_to_bbox(points):
@@ -0,0 +1,60 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from loguru import logger
+
+
+class StageExecutor:
+    """Run the independent model stages of a page concurrently.
+
+    Stages are plain callables, they are submitted to a shared thread pool and
+    the results are returned by stage name once all of them are done. With
+    ``max_workers`` of 1 the stages run one after the other in the calling
+    thread, which is the behavior before the executor was introduced.
+
+    The cpu threads of each backend are divided among the concurrent stages by
+    the thread budget, see magic_pdf.libs.thread_budget.
+    """
+
+    def __init__(self, max_workers=1):
+        self.max_workers = max(1, int(max_workers))
+        self._pool = None
+        if self.max_workers > 1:
+            self._pool = ThreadPoolExecutor(
+                max_workers=self.max_workers, thread_name_prefix='magic_pdf_stage'
+            )
+
+    def run(self, stages: dict) -> dict:
+        """Run the stages and wait for all of them.
+
+        Args:
+            stages (dict): stage name -> callable without arguments
+
+        Returns:
+            dict: stage name -> return value of the callable
+        """
+        stage_start = time.time()
+        if self._pool is None or len(stages) <= 1:
+            results = {name: fn() for name, fn in stages.items()}
+        else:
+            futures = {name: self._pool.submit(fn) for name, fn in stages.items()}
+            # 等待全部阶段结束后再抛出异常，避免后台线程仍在使用模型
+            results = {}
+            first_exc = None
+            for name, future in futures.items():
+                try:
+                    results[name] = future.result()
+                except Exception as e:
+                    if first_exc is None:
+                        first_exc = e
+            if first_exc is not None:
+                raise first_exc
+            logger.info(
+                f'concurrent stages: {list(stages.keys())}, wall time: {round(time.time() - stage_start, 2)}'
+            )
+        return results
+
+    def shutdown(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=True)
+            self._pool = None
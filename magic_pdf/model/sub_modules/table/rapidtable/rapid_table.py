@@ -8,8 +8,10 @@ class RapidTableModel(object):
         self.table_model = RapidTable()
         self.ocr_engine = RapidOCR(det_use_cuda=True, cls_use_cuda=True, rec_use_cuda=True)
 
-    def predict(self, image):
-        ocr_result, _ = self.ocr_engine(np.asarray(image))
+    def predict(self, image, ocr_result=None):
+        # 没有传入已有的文本时才对表格截图做ocr
+        if not ocr_result:
+            ocr_result, _ = self.ocr_engine(np.asarray(image))
         if ocr_result is None:
             return None, None, None
         html_code, table_cell_bboxes, elapse = self.table_model(np.asarray(image), ocr_result)
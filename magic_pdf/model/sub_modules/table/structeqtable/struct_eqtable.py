@@ -5,7 +5,7 @@ from magic_pdf.model.sub_modules.table.table_utils import minify_html
 
 
 class StructTableModel:
-    def __init__(self, model_path, max_new_tokens=1024, max_time=60):
+    def __init__(self, model_path, max_new_tokens=1024, max_time=60, batch_size=1):
         # init
         assert torch.cuda.is_available(), "CUDA must be available for StructEqTable model."
         self.model = build_model(
@@ -14,9 +14,10 @@ class StructTableModel:
             max_time=max_time,
             lmdeploy=False,
             flash_attn=False,
-            batch_size=1,
+            batch_size=batch_size,
         ).cuda()
         self.default_format = "html"
+        self.batch_size = batch_size
 
     def predict(self, images, output_format=None, **kwargs):
 
@@ -35,3 +36,10 @@ class StructTableModel:
 
         return results
 
+    def batch_predict(self, images, output_format=None):
+        """Recognize a list of table images in chunks of ``batch_size``, the
+        max_time of the model bounds the generation time of each chunk."""
+        results = []
+        for index in range(0, len(images), self.batch_size):
+            results.extend(self.predict(images[index: index + self.batch_size], output_format))
+        return results
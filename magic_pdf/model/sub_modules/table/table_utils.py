@@ -1,4 +1,9 @@
 import re
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from concurrent.futures import wait
+
+from loguru import logger
 
 
 def minify_html(html):
@@ -8,4 +13,82 @@ def minify_html(html):
     html = re.sub(r'\s*>\s*', '>', html)
     # 移除标签前的空白字符
     html = re.sub(r'\s*<\s*', '<', html)
-    return html.strip()
\ No newline at end of file
+    return html.strip()
+
+
+class TableDeadlineRunner:
+    """Run table predictions in a worker thread and stop waiting for a
+    prediction once it runs over its deadline.
+
+    The running prediction can not be interrupted, it is left to finish in the
+    background and its result is dropped. The table model never runs twice at
+    the same time, a following table first waits up to ``max_time`` more for the
+    timed out prediction to finish, and is only skipped if the model is still
+    busy then. Timed out and skipped tables are counted.
+    """
+
+    def __init__(self, max_time):
+        self.max_time = max_time
+        self._pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix='magic_pdf_table')
+        self._running = None
+        self.timeouts = 0
+        self.skipped = 0
+
+    def run(self, fn, *args, deadline=None, **kwargs):
+        """Call fn(*args, **kwargs), return None if the deadline is exceeded
+        or the model is still busy with a timed out prediction.
+
+        Args:
+            fn (Callable): the prediction
+            deadline (float, optional): seconds to wait for the result, defaults to max_time
+
+        Returns:
+            the result of fn, None on timeout or skip
+        """
+        if self._running is not None and not self._running.done():
+            # 超时的预测仍在运行，最多再等待max_time
+            wait([self._running], timeout=self.max_time)
+            if not self._running.done():
+                self.skipped += 1
+                logger.warning('table model is still busy with a timed out table, skip table recognition')
+                return None
+        deadline = self.max_time if deadline is None else deadline
+        self._running = self._pool.submit(fn, *args, **kwargs)
+        try:
+            return self._running.result(timeout=deadline)
+        except FutureTimeoutError:
+            self.timeouts += 1
+            logger.warning(f'table recognition processing exceeds max time {deadline}s, give up')
+            return None
+
+    def pop_stats(self) -> dict:
+        """Get and reset the counts of the timed out and the skipped predictions."""
+        stats = {'timeouts': self.timeouts, 'skipped': self.skipped}
+        self.timeouts = 0
+        self.skipped = 0
+        return stats
+
+
+def get_table_ocr_result(text_lines, table_bbox):
+    """Select the text lines whose center is inside the table, in the
+    ``ocr_result`` format of RapidTable and in the coordinates of the table crop.
+
+    Args:
+        text_lines (list): [{'bbox': [x0, y0, x1, y1], 'text': str}] in page image coordinates
+        table_bbox (list): [x0, y0, x1, y1] of the table crop in page image coordinates
+
+    Returns:
+        list: [[[[x0, y0], [x1, y0], [x1, y1], [x0, y1]], text, score]], empty if no line is inside the table
+    """
+    tx0, ty0, tx1, ty1 = table_bbox
+    ocr_result = []
+    for line in text_lines:
+        x0, y0, x1, y1 = line['bbox']
+        cx, cy = (x0 + x1) / 2, (y0 + y1) / 2
+        if not (tx0 <= cx <= tx1 and ty0 <= cy <= ty1):
+            continue
+        # 裁剪到表格范围内再平移到截图坐标
+        x0, y0 = max(x0, tx0) - tx0, max(y0, ty0) - ty0
+        x1, y1 = min(x1, tx1) - tx0, min(y1, ty1) - ty0
+        ocr_result.append([[[x0, y0], [x1, y0], [x1, y1], [x0, y1]], line['text'], 1.0])
+    return ocr_result
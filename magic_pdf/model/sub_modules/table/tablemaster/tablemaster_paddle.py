@@ -67,5 +67,7 @@ class TableMasterPaddleModel(object):
             'rec_model_dir': rec_model_dir,
             'rec_char_dict_path': rec_char_dict_path,
         }
+        if 'cpu_threads' in kwargs:
+            config['cpu_threads'] = kwargs['cpu_threads']
         parser.set_defaults(**config)
         return parser.parse_args([])
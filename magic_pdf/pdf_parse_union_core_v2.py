@@ -1,11 +1,11 @@
 import copy
+import math
 import os
 import statistics
 import time
 from typing import List
 
 import fitz
-import torch
 from loguru import logger
 
 from magic_pdf.config.enums import SupportedPdfParseMethod
@@ -13,20 +13,13 @@ from magic_pdf.config.ocr_content_type import BlockType, ContentType
 from magic_pdf.data.dataset import Dataset, PageableData
 from magic_pdf.libs.boxbase import calculate_overlap_area_in_bbox1_area_ratio
 from magic_pdf.libs.clean_memory import clean_memory
-from magic_pdf.libs.config_reader import get_local_layoutreader_model_dir
+from magic_pdf.libs.config_reader import (get_local_layoutreader_model_dir,
+                                          get_reading_order_config)
 from magic_pdf.libs.convert_utils import dict_to_list
 from magic_pdf.libs.hash_utils import compute_md5
 from magic_pdf.libs.pdf_image_tools import cut_image_to_pil_image
 from magic_pdf.model.magic_model import MagicModel
 
-try:
-    import torchtext
-
-    if torchtext.__version__ >= '0.18.0':
-        torchtext.disable_torchtext_deprecation_warning()
-except ImportError:
-    pass
-
 from magic_pdf.model.sub_modules.model_init import AtomModelSingleton
 from magic_pdf.para.para_split_v3 import para_split
 from magic_pdf.pre_proc.construct_page_dict import ocr_construct_page_component_v2
@@ -71,23 +64,31 @@ def chars_to_content(span):
     else:
         # 先给chars按char['bbox']的中心点的x坐标排序
         span['chars'] = sorted(span['chars'], key=lambda x: (x['bbox'][0] + x['bbox'][2]) / 2)
+        chars = span['chars']
 
         # 求char的平均宽度
-        char_width_sum = sum([char['bbox'][2] - char['bbox'][0] for char in span['chars']])
-        char_avg_width = char_width_sum / len(span['chars'])
-
-        content = ''
-        for char in span['chars']:
+        char_width_sum = sum([char['bbox'][2] - char['bbox'][0] for char in chars])
+        char_avg_width = char_width_sum / len(chars)
+
+        # 与chars.index(char)一致，内容相同的char与第一次出现的char比较，第一个char与最后一个char比较
+        first_char_index = {}
+        content = []
+        for i, char in enumerate(chars):
+            char_index = first_char_index.setdefault(__char_key(char), i)
             # 如果下一个char的x0和上一个char的x1距离超过一个字符宽度，则需要在中间插入一个空格
-            if char['bbox'][0] - span['chars'][span['chars'].index(char) - 1]['bbox'][2] > char_avg_width:
-                content += ' '
-            content += char['c']
+            if char['bbox'][0] - chars[char_index - 1]['bbox'][2] > char_avg_width:
+                content.append(' ')
+            content.append(char['c'])
 
-        span['content'] = __replace_0xfffd(content)
+        span['content'] = __replace_0xfffd(''.join(content))
 
     del span['chars']
 
 
+def __char_key(char):
+    return tuple((k, tuple(v) if isinstance(v, list) else v) for k, v in sorted(char.items()))
+
+
 LINE_STOP_FLAG = ('.', '!', '?', '。', '！', '？', ')', '）', '"', '”', ':', '：', ';', '；', ']', '】', '}', '}', '>', '》', '、', ',', '，', '-', '—', '–',)
 LINE_START_FLAG = ('(', '（', '"', '“', '【', '{', '《', '<', '「', '『', '【', '[',)
 
@@ -97,8 +98,12 @@ def fill_char_in_spans(spans, all_chars):
     # 简单从上到下排一下序
     spans = sorted(spans, key=lambda x: x['bbox'][1])
 
+    # char的中心点必须严格位于span的上下边界之间，只需检查中心点所在网格行覆盖的span，网格行内span保持排序后的顺序
+    span_grid, cell_height = build_span_y_grid(spans)
     for char in all_chars:
-        for span in spans:
+        char_center_y = (char['bbox'][1] + char['bbox'][3]) / 2
+        for span_index in span_grid.get(math.floor(char_center_y / cell_height), ()):
+            span = spans[span_index]
             if calculate_char_in_span(char['bbox'], span['bbox'], char['c']):
                 span['chars'].append(char)
                 break
@@ -115,6 +120,28 @@ def fill_char_in_spans(spans, all_chars):
     return empty_spans
 
 
+def build_span_y_grid(spans):
+    """Index the spans by the rows of a uniform grid along y.
+
+    Args:
+        spans (list): the spans, in the order they are matched with the chars
+
+    Returns:
+        tuple: dict of row to the ascending indices of the spans overlapping the row, and the row height
+    """
+    span_heights = [span['bbox'][3] - span['bbox'][1] for span in spans if span['bbox'][3] > span['bbox'][1]]
+    # 网格行高取span高度的中位数，每个span只覆盖少数几行
+    cell_height = max(statistics.median(span_heights), 1) if span_heights else 1
+    span_grid = {}
+    for span_index, span in enumerate(spans):
+        y0, y1 = span['bbox'][1], span['bbox'][3]
+        if y1 <= y0:
+            continue
+        for row in range(math.floor(y0 / cell_height), math.floor(y1 / cell_height) + 1):
+            span_grid.setdefault(row, []).append(span_index)
+    return span_grid, cell_height
+
+
 # 使用鲁棒性更强的中心点坐标判断
 def calculate_char_in_span(char_bbox, span_bbox, char, span_height_radio=0.33):
     char_center_x = (char_bbox[0] + char_bbox[2]) / 2
@@ -259,9 +286,22 @@ def replace_text_span(pymu_spans, ocr_spans):
     return list(filter(lambda x: x['type'] != ContentType.Text, ocr_spans)) + pymu_spans
 
 
+# layoutreader一次最多排序的行数，模型最长支持510个token
+LAYOUTREADER_MAX_LINES = 200
+
+
 def model_init(model_name: str):
+    import torch
     from transformers import LayoutLMv3ForTokenClassification
 
+    try:
+        import torchtext
+
+        if torchtext.__version__ >= '0.18.0':
+            torchtext.disable_torchtext_deprecation_warning()
+    except ImportError:
+        pass
+
     if torch.cuda.is_available():
         device = torch.device('cuda')
         if torch.cuda.is_bf16_supported():
@@ -311,14 +351,142 @@ class ModelSingleton:
         return self._models[model_name]
 
 
-def do_predict(boxes: List[List[int]], model) -> List[int]:
+def do_predict(boxes: List[List[int]], model, decoder='greedy') -> List[int]:
     from magic_pdf.model.sub_modules.reading_oreder.layoutreader.helpers import (
-        boxes2inputs, parse_logits, prepare_inputs)
+        boxes2inputs, decode_logits, prepare_inputs)
 
     inputs = boxes2inputs(boxes)
     inputs = prepare_inputs(inputs, model)
     logits = model(**inputs).logits.cpu().squeeze(0)
-    return parse_logits(logits, len(boxes))
+    return decode_logits(logits, len(boxes), decoder)
+
+
+def do_batch_predict(boxes_list: List[List[List[int]]], model, decoder='greedy') -> List[List[int]]:
+    from magic_pdf.model.sub_modules.reading_oreder.layoutreader.helpers import (
+        batch_boxes2inputs, decode_logits, prepare_inputs)
+
+    inputs = batch_boxes2inputs(boxes_list)
+    inputs = prepare_inputs(inputs, model)
+    logits = model(**inputs).logits.cpu()
+    return [decode_logits(logits[i], len(boxes), decoder) for i, boxes in enumerate(boxes_list)]
+
+
+def split_lines_into_regions(
+    boxes: List[List[int]], groups: List[List[int]] = None, max_lines=LAYOUTREADER_MAX_LINES
+) -> List[List[int]]:
+    """Partition the lines of a page into regions of at most max_lines lines.
+
+    The groups of lines, the blocks of the page, are ordered by
+    recursive_xy_cut on the group boxes and packed in that order into regions,
+    a group with more than max_lines lines is split in its own line order.
+    Lines are not cut one by one, the gaps between the lines of a column would
+    split the page into rows across the columns.
+
+    Args:
+        boxes (List[List[int]]): the line boxes of the page, scaled to 0-1000
+        groups (List[List[int]], optional): the line indices of every group, every line is a group if None
+        max_lines (int, optional): max number of lines of a region. Defaults to LAYOUTREADER_MAX_LINES.
+
+    Returns:
+        List[List[int]]: the line indices of every region, regions in reading order
+    """
+    import numpy as np
+
+    from magic_pdf.model.sub_modules.reading_oreder.layoutreader.xycut import \
+        recursive_xy_cut
+
+    if groups is None:
+        groups = [[i] for i in range(len(boxes))]
+    group_boxes = np.array([
+        [
+            min(boxes[i][0] for i in group), min(boxes[i][1] for i in group),
+            max(boxes[i][2] for i in group), max(boxes[i][3] for i in group),
+        ]
+        for group in groups
+    ], dtype=int)
+    # 宽或高为0的框不产生投影，会被xycut漏掉
+    group_boxes[:, 2] = np.maximum(group_boxes[:, 2], group_boxes[:, 0] + 1)
+    group_boxes[:, 3] = np.maximum(group_boxes[:, 3], group_boxes[:, 1] + 1)
+    res = []
+    recursive_xy_cut(group_boxes, np.arange(len(groups)), res)
+    cut_order = [int(i) for i in res]
+    if len(cut_order) != len(groups):
+        seen = set(cut_order)
+        cut_order.extend(i for i in range(len(groups)) if i not in seen)
+
+    regions = []
+    region = []
+    for group_index in cut_order:
+        group = groups[group_index]
+        for start in range(0, len(group), max_lines):
+            chunk = group[start: start + max_lines]
+            if len(region) + len(chunk) > max_lines:
+                regions.append(region)
+                region = []
+            region.extend(chunk)
+    if region:
+        regions.append(region)
+    return regions
+
+
+def predict_line_orders(
+    boxes_list: List[List[List[int]]], batch_size=16, groups_list: List[List[List[int]]] = None
+) -> List[List[int]]:
+    """Predict the reading order of the lines of many pages with layoutreader.
+
+    A page with more than LAYOUTREADER_MAX_LINES lines is split into regions by
+    split_lines_into_regions, the lines of every region are ordered by
+    layoutreader and the regions are concatenated in their xy-cut order.
+    Pages and regions are ordered by the number of lines and run in batches of
+    batch_size, so that the inputs of a batch need little padding.
+
+    Args:
+        boxes_list (List[List[List[int]]]): the line boxes of every page, scaled to 0-1000
+        batch_size (int, optional): number of inputs of a forward pass. Defaults to 16.
+        groups_list (List[List[List[int]]], optional): the line groups of every page, see split_lines_into_regions
+
+    Returns:
+        List[List[int]]: the line orders of every page
+    """
+    import torch
+
+    from magic_pdf.model.sub_modules.reading_oreder.layoutreader.helpers import \
+        resolve_decoder
+
+    # 每个输入为(页面序号, 行序号列表)
+    inputs = []
+    for page_index, boxes in enumerate(boxes_list):
+        if len(boxes) > LAYOUTREADER_MAX_LINES:
+            groups = groups_list[page_index] if groups_list is not None else None
+            for region in split_lines_into_regions(boxes, groups):
+                inputs.append((page_index, region))
+        elif len(boxes) > 0:
+            inputs.append((page_index, list(range(len(boxes)))))
+
+    orders_list = [[] for _ in boxes_list]
+    if not inputs:
+        return orders_list
+
+    input_orders = [None] * len(inputs)
+    input_indices = sorted(range(len(inputs)), key=lambda i: len(inputs[i][1]))
+    decoder = resolve_decoder(get_reading_order_config().get('decoder', 'greedy'))
+    model_manager = ModelSingleton()
+    model = model_manager.get_model('layoutreader')
+    with torch.no_grad():
+        for start in range(0, len(input_indices), batch_size):
+            batch_indices = input_indices[start: start + batch_size]
+            batch_boxes = []
+            for i in batch_indices:
+                page_index, lines = inputs[i]
+                batch_boxes.append([boxes_list[page_index][line] for line in lines])
+            for i, orders in zip(batch_indices, do_batch_predict(batch_boxes, model, decoder)):
+                lines = inputs[i][1]
+                input_orders[i] = [lines[order] for order in orders]
+
+    # 同一页面的区域按顺序拼接
+    for (page_index, _), orders in zip(inputs, input_orders):
+        orders_list[page_index].extend(orders)
+    return orders_list
 
 
 def cal_block_index(fix_blocks, sorted_bboxes):
@@ -421,9 +589,17 @@ def insert_lines_into_block(block_bbox, line_height, page_w, page_h):
         return [[x0, y0, x1, y1]]
 
 
-def sort_lines_by_model(fix_blocks, page_w, page_h, line_height):
+def get_line_boxes_for_sort(fix_blocks, page_w, page_h, line_height):
+    """Collect the lines of the page which take part in the reading order,
+    and their boxes scaled to the 0-1000 input range of layoutreader.
+
+    Returns:
+        tuple: (page_line_list, boxes, line_groups), line_groups are the line indices of every block
+    """
     page_line_list = []
+    line_groups = []
     for block in fix_blocks:
+        group_start = len(page_line_list)
         if block['type'] in [
             BlockType.Text, BlockType.Title, BlockType.InterlineEquation,
             BlockType.ImageCaption, BlockType.ImageFootnote,
@@ -447,9 +623,8 @@ def sort_lines_by_model(fix_blocks, page_w, page_h, line_height):
             for line in lines:
                 block['lines'].append({'bbox': line, 'spans': []})
             page_line_list.extend(lines)
-
-    if len(page_line_list) > 200:  # layoutreader最高支持512line
-        return None
+        if len(page_line_list) > group_start:
+            line_groups.append(list(range(group_start, len(page_line_list))))
 
     # 使用layoutreader排序
     x_scale = 1000.0 / page_w
@@ -486,10 +661,12 @@ def sort_lines_by_model(fix_blocks, page_w, page_h, line_height):
             1000 >= right >= left >= 0 and 1000 >= bottom >= top >= 0
         ), f'Invalid box. right: {right}, left: {left}, bottom: {bottom}, top: {top}'  # noqa: E126, E121
         boxes.append([left, top, right, bottom])
-    model_manager = ModelSingleton()
-    model = model_manager.get_model('layoutreader')
-    with torch.no_grad():
-        orders = do_predict(boxes, model)
+    return page_line_list, boxes, line_groups
+
+
+def sort_lines_by_model(fix_blocks, page_w, page_h, line_height):
+    page_line_list, boxes, line_groups = get_line_boxes_for_sort(fix_blocks, page_w, page_h, line_height)
+    orders = predict_line_orders([boxes], groups_list=[line_groups])[0]
     sorted_bboxes = [page_line_list[i] for i in orders]
 
     return sorted_bboxes
@@ -611,9 +788,15 @@ def remove_outside_spans(spans, all_bboxes, all_discarded_blocks):
     return new_spans
 
 
-def parse_page_core(
+def parse_page_before_sort(
     page_doc: PageableData, magic_model, page_id, pdf_bytes_md5, imageWriter, parse_mode, lang
 ):
+    """Parse a page up to the reading order of its lines.
+
+    Returns:
+        tuple: (page_info, None) if the page is done without sorting, else (None, sort_task),
+            the page is finished by parse_page_after_sort with the orders of the lines of sort_task
+    """
     need_drop = False
     drop_reason = []
 
@@ -710,7 +893,7 @@ def parse_page_core(
             fix_discarded_blocks,
             need_drop,
             drop_reason,
-        )
+        ), None
 
     """对image和table截图"""
     spans = ocr_cut_image_and_table(
@@ -726,8 +909,35 @@ def parse_page_core(
     """获取所有line并计算正文line的高度"""
     line_height = get_line_height(fix_blocks)
 
-    """获取所有line并对line排序"""
-    sorted_bboxes = sort_lines_by_model(fix_blocks, page_w, page_h, line_height)
+    """获取所有参与排序的line"""
+    line_boxes = get_line_boxes_for_sort(fix_blocks, page_w, page_h, line_height)
+
+    sort_task = {
+        'page_id': page_id,
+        'page_w': page_w,
+        'page_h': page_h,
+        'fix_blocks': fix_blocks,
+        'line_boxes': line_boxes,
+        'fix_discarded_blocks': fix_discarded_blocks,
+        'need_drop': need_drop,
+        'drop_reason': drop_reason,
+    }
+    return None, sort_task
+
+
+def parse_page_after_sort(sort_task: dict, orders):
+    """Finish the page with the orders of its lines, orders is None if the
+    lines are not sorted by layoutreader."""
+    page_id = sort_task['page_id']
+    page_w, page_h = sort_task['page_w'], sort_task['page_h']
+    fix_blocks = sort_task['fix_blocks']
+    fix_discarded_blocks = sort_task['fix_discarded_blocks']
+    need_drop, drop_reason = sort_task['need_drop'], sort_task['drop_reason']
+
+    sorted_bboxes = None
+    if orders is not None:
+        page_line_list = sort_task['line_boxes'][0]
+        sorted_bboxes = [page_line_list[i] for i in orders]
 
     """根据line的中位数算block的序列关系"""
     fix_blocks = cal_block_index(fix_blocks, sorted_bboxes)
@@ -759,6 +969,19 @@ def parse_page_core(
     return page_info
 
 
+def parse_page_core(
+    page_doc: PageableData, magic_model, page_id, pdf_bytes_md5, imageWriter, parse_mode, lang
+):
+    page_info, sort_task = parse_page_before_sort(
+        page_doc, magic_model, page_id, pdf_bytes_md5, imageWriter, parse_mode, lang
+    )
+    if page_info is not None:
+        return page_info
+    _, boxes, line_groups = sort_task['line_boxes']
+    orders = predict_line_orders([boxes], groups_list=[line_groups])[0]
+    return parse_page_after_sort(sort_task, orders)
+
+
 def pdf_parse_union(
     model_list,
     dataset: Dataset,
@@ -793,6 +1016,20 @@ def pdf_parse_union(
     """初始化启动时间"""
     start_time = time.time()
 
+    """多页的line一起送入layoutreader排序"""
+    sort_batch_size = max(1, int(get_reading_order_config().get('batch_size', 16)))
+    sort_tasks = []
+
+    def flush_sort_tasks():
+        orders_list = predict_line_orders(
+            [task['line_boxes'][1] for task in sort_tasks],
+            sort_batch_size,
+            groups_list=[task['line_boxes'][2] for task in sort_tasks],
+        )
+        for task, orders in zip(sort_tasks, orders_list):
+            pdf_info_dict[f'page_{task["page_id"]}'] = parse_page_after_sort(task, orders)
+        sort_tasks.clear()
+
     for page_id, page in enumerate(dataset):
         """debug时输出每页解析的耗时."""
         if debug_mode:
@@ -804,9 +1041,11 @@ def pdf_parse_union(
 
         """解析pdf中的每一页"""
         if start_page_id <= page_id <= end_page_id:
-            page_info = parse_page_core(
+            page_info, sort_task = parse_page_before_sort(
                 page, magic_model, page_id, pdf_bytes_md5, imageWriter, parse_mode, lang
             )
+            if sort_task is not None:
+                sort_tasks.append(sort_task)
         else:
             page_info = page.get_page_info()
             page_w = page_info.w
@@ -814,7 +1053,16 @@ def pdf_parse_union(
             page_info = ocr_construct_page_component_v2(
                 [], [], page_id, page_w, page_h, [], [], [], [], [], True, 'skip page'
             )
+        # 等待排序的页面先用None占位保持页面顺序，排序完成后回填
         pdf_info_dict[f'page_{page_id}'] = page_info
+        if len(sort_tasks) >= sort_batch_size:
+            flush_sort_tasks()
+
+    flush_sort_tasks()
+
+    raster_cache = dataset.get_raster_cache()
+    logger.info(f'page raster cache stats: {raster_cache.stats()}')
+    raster_cache.clear()
 
     """分段"""
     para_split(pdf_info_dict)
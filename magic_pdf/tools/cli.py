@@ -7,7 +7,7 @@ from loguru import logger
 import magic_pdf.model as model_config
 from magic_pdf.data.data_reader_writer import FileBasedDataReader
 from magic_pdf.libs.version import __version__
-from magic_pdf.tools.common import do_parse, parse_pdf_methods
+from magic_pdf.tools.common import parse_pdf_methods, submit_or_parse
 
 
 @click.command()
@@ -92,7 +92,7 @@ def cli(path, output_dir, method, lang, debug_able, start_page_id, end_page_id):
         try:
             file_name = str(Path(doc_path).stem)
             pdf_data = read_fn(doc_path)
-            do_parse(
+            submit_or_parse(
                 output_dir,
                 file_name,
                 pdf_data,
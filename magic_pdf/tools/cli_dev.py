@@ -10,7 +10,7 @@ from magic_pdf.libs.config_reader import get_s3_config
 from magic_pdf.libs.path_utils import (parse_s3_range_params, parse_s3path,
                                        remove_non_official_s3_args)
 from magic_pdf.libs.version import __version__
-from magic_pdf.tools.common import do_parse, parse_pdf_methods
+from magic_pdf.tools.common import parse_pdf_methods, submit_or_parse
 
 
 def read_s3_path(s3path):
@@ -77,7 +77,7 @@ def jsonl(jsonl, method, output_dir):
     pdf_data = read_s3_path(s3_file_path)
 
     print(pdf_file_name, jso, method)
-    do_parse(
+    submit_or_parse(
         output_dir,
         pdf_file_name,
         pdf_data,
@@ -133,7 +133,7 @@ def pdf(pdf, json_data, output_dir, method):
 
     file_name = str(Path(full_pdf_path).stem)
     pdf_data = read_fn(full_pdf_path)
-    do_parse(
+    submit_or_parse(
         output_dir,
         file_name,
         pdf_data,
@@ -232,4 +232,13 @@ def do_parse(
     logger.info(f'local output dir is {local_md_dir}')
 
 
+def submit_or_parse(*args, **kwargs):
+    """Run the parse job in the magic-pdf daemon when it is running, else in
+    this process, same arguments as do_parse."""
+    from magic_pdf.tools.daemon import submit_parse
+
+    if not submit_parse(*args, **kwargs):
+        do_parse(*args, **kwargs)
+
+
 parse_pdf_methods = click.Choice(['ocr', 'txt', 'auto'])
@@ -0,0 +1,274 @@
+"""Resident magic-pdf process which keeps the models loaded and runs the
+parse jobs of the magic-pdf and magic-pdf-dev commands.
+
+Start it with ``magic-pdf-daemon``, while it is running the commands send
+their jobs to it over a unix domain socket instead of loading the models
+themselves, and parse in their own process when it is not running, or when
+it runs another version, another magic-pdf.json or other model switches.
+
+Every message is one json line, a parse request is followed by the bytes of
+the pdf.
+"""
+import json
+import os
+import socket
+import socketserver
+import threading
+import time
+
+import click
+from loguru import logger
+
+import magic_pdf.model as model_config
+from magic_pdf.libs.config_reader import get_config_identity, get_daemon_config
+from magic_pdf.libs.version import __version__
+
+# 连接守护进程的超时时间，超时视为守护进程未运行
+CONNECT_TIMEOUT = 1
+
+
+def get_socket_path(daemon_config: dict = None) -> str:
+    if daemon_config is None:
+        daemon_config = get_daemon_config()
+    return os.path.expanduser(daemon_config.get('socket_path', '~/.cache/magic_pdf/magic-pdf.sock'))
+
+
+def _send(sock: socket.socket, message: dict, payload: bytes = b''):
+    sock.sendall(json.dumps(message, ensure_ascii=False).encode('utf-8') + b'\n' + payload)
+
+
+def _recv(rfile) -> dict:
+    line = rfile.readline()
+    if not line:
+        raise ConnectionError('connection closed by the peer')
+    return json.loads(line.decode('utf-8'))
+
+
+def _connect(socket_path: str):
+    """Connect to the daemon, None if it is not running."""
+    if not hasattr(socket, 'AF_UNIX') or not os.path.exists(socket_path):
+        return None
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    sock.settimeout(CONNECT_TIMEOUT)
+    try:
+        sock.connect(socket_path)
+    except OSError:
+        sock.close()
+        return None
+    return sock
+
+
+def _request(socket_path: str, message: dict, payload: bytes = b'', timeout=None):
+    """Send a request and wait for the response, None if the daemon is not running."""
+    sock = _connect(socket_path)
+    if sock is None:
+        return None
+    with sock:
+        sock.settimeout(timeout)
+        _send(sock, message, payload)
+        with sock.makefile('rb') as rfile:
+            return _recv(rfile)
+
+
+def get_client_identity() -> dict:
+    """The settings of this process which the daemon has to share to produce
+    the same output as an in-process parse."""
+    return {
+        'version': __version__,
+        'config': get_config_identity(),
+        'use_inside_model': model_config.__use_inside_model__,
+        'model_mode': model_config.__model_mode__,
+    }
+
+
+def check_client_identity(client_identity: dict):
+    """Compare the identity of a client with the daemon's own.
+
+    Returns:
+        str | None: the reason of the mismatch, None if they match
+    """
+    identity = get_client_identity()
+    if client_identity.get('version') != identity['version']:
+        return f'daemon version {identity["version"]} != client version {client_identity.get("version")}'
+    client_config = client_identity.get('config') or {}
+    if client_config.get('md5') != identity['config']['md5']:
+        return f'daemon config {identity["config"]["path"]} differs from client config {client_config.get("path")}'
+    for flag in ['use_inside_model', 'model_mode']:
+        if client_identity.get(flag) != identity[flag]:
+            return f'daemon {flag} {identity[flag]} != client {flag} {client_identity.get(flag)}'
+    return None
+
+
+def submit_parse(output_dir, pdf_file_name, pdf_bytes, model_list, parse_method, debug_able, **kwargs) -> bool:
+    """Run do_parse in the daemon, same arguments as do_parse.
+
+    Returns:
+        bool: False if the daemon is not running or disabled, the job has to be parsed in this process then
+
+    Raises:
+        RuntimeError: the daemon failed to parse the pdf
+    """
+    daemon_config = get_daemon_config()
+    if not daemon_config.get('enable', True):
+        return False
+    socket_path = get_socket_path(daemon_config)
+
+    parse_kwargs = dict(
+        # 守护进程的工作目录与当前进程不同，输出目录转为绝对路径
+        output_dir=os.path.abspath(output_dir),
+        pdf_file_name=pdf_file_name,
+        model_list=model_list,
+        parse_method=parse_method,
+        debug_able=debug_able,
+        **kwargs,
+    )
+    message = {'action': 'parse', 'identity': get_client_identity(), 'pdf_size': len(pdf_bytes), 'kwargs': parse_kwargs}
+    submit_start = time.time()
+    try:
+        response = _request(socket_path, message, pdf_bytes)
+    except ConnectionError as e:
+        raise RuntimeError(f'magic-pdf daemon at {socket_path} closed the connection: {e}')
+    if response is None:
+        return False
+    if response['status'] == 'rejected':
+        logger.warning(f'magic-pdf daemon rejected the job: {response["error"]}, parse in process')
+        return False
+    if response['status'] != 'ok':
+        raise RuntimeError(f'magic-pdf daemon failed to parse {pdf_file_name}: {response["error"]}')
+    logger.info(f'{pdf_file_name} parsed by magic-pdf daemon, time: {round(time.time() - submit_start, 2)}')
+    return True
+
+
+class ParseRequestHandler(socketserver.StreamRequestHandler):
+
+    def _reply(self, response: dict):
+        self.wfile.write(json.dumps(response, ensure_ascii=False).encode('utf-8') + b'\n')
+
+    def handle(self):
+        try:
+            message = _recv(self.rfile)
+        except (ConnectionError, ValueError) as e:
+            logger.warning(f'bad request: {e}')
+            return
+
+        action = message.get('action')
+        if action == 'ping':
+            self._reply({'status': 'ok', 'version': __version__, 'pid': os.getpid()})
+        elif action == 'shutdown':
+            self._reply({'status': 'ok'})
+            # shutdown会等待serve_forever退出，不能在处理请求的线程中直接调用
+            threading.Thread(target=self.server.shutdown).start()
+        elif action == 'parse':
+            self._handle_parse(message)
+        else:
+            self._reply({'status': 'error', 'error': f'unknown action: {action}'})
+
+    def _handle_parse(self, message: dict):
+        pdf_bytes = self.rfile.read(message['pdf_size'])
+        # 版本、配置文件或模型开关与客户端不一致时，由客户端在自己的进程中解析
+        mismatch = check_client_identity(message.get('identity') or {})
+        if mismatch is not None:
+            self._reply({'status': 'rejected', 'error': mismatch})
+            return
+        if len(pdf_bytes) != message['pdf_size']:
+            self._reply({'status': 'error', 'error': 'incomplete pdf bytes'})
+            return
+
+        from magic_pdf.tools.common import do_parse
+
+        parse_kwargs = message['kwargs']
+        # 模型不支持并发推理，任务逐个执行
+        with self.server.job_lock:
+            job_start = time.time()
+            try:
+                do_parse(pdf_bytes=pdf_bytes, **parse_kwargs)
+            except (Exception, SystemExit) as e:
+                logger.exception(e)
+                self._reply({'status': 'error', 'error': repr(e)})
+                return
+        logger.info(f'{parse_kwargs["pdf_file_name"]} done, time: {round(time.time() - job_start, 2)}')
+        self._reply({'status': 'ok'})
+
+
+class ParseServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+    def __init__(self, socket_path: str):
+        self.job_lock = threading.Lock()
+        super().__init__(socket_path, ParseRequestHandler)
+
+
+def serve(socket_path: str, preload=True):
+    """Run the daemon until it is stopped."""
+    if _request(socket_path, {'action': 'ping'}, timeout=CONNECT_TIMEOUT) is not None:
+        raise click.ClickException(f'magic-pdf daemon is already running at {socket_path}')
+    if os.path.exists(socket_path):
+        # 上次异常退出残留的socket文件
+        os.remove(socket_path)
+    os.makedirs(os.path.dirname(socket_path) or '.', exist_ok=True)
+
+    model_config.__use_inside_model__ = True
+    model_config.__model_mode__ = 'full'
+    if preload:
+        from magic_pdf.model.doc_analyze_by_custom_model import ModelSingleton
+
+        # 预先加载cli默认参数下txt和ocr模式的模型
+        model_manager = ModelSingleton()
+        for ocr in [False, True]:
+            model_manager.get_model(ocr, False, None, None, None, None)
+
+    # socket文件在bind时按umask创建，创建前收紧umask，只允许当前用户连接
+    old_umask = os.umask(0o077)
+    try:
+        server = ParseServer(socket_path)
+    finally:
+        os.umask(old_umask)
+    os.chmod(socket_path, 0o600)
+    logger.info(f'magic-pdf daemon {__version__} is listening on {socket_path}, pid: {os.getpid()}')
+    try:
+        server.serve_forever()
+    finally:
+        server.server_close()
+        if os.path.exists(socket_path):
+            os.remove(socket_path)
+        logger.info('magic-pdf daemon stopped')
+
+
+@click.command()
+@click.version_option(__version__, '--version', '-v', help='display the version and exit')
+@click.option(
+    '-s',
+    '--socket',
+    'socket_path',
+    type=click.Path(),
+    default=None,
+    help='unix socket path of the daemon, defaults to daemon-config.socket_path of magic-pdf.json',
+)
+@click.option(
+    '--preload/--no-preload',
+    'preload',
+    default=True,
+    help='load the models of the txt and ocr modes before accepting jobs',
+)
+@click.option('--stop', 'stop', is_flag=True, default=False, help='stop the running daemon')
+@click.option('--status', 'status', is_flag=True, default=False, help='show whether the daemon is running')
+def cli(socket_path, preload, stop, status):
+    if not hasattr(socket, 'AF_UNIX'):
+        raise click.ClickException('magic-pdf daemon needs unix domain sockets, which are not supported here')
+    socket_path = os.path.expanduser(socket_path) if socket_path else get_socket_path()
+
+    if stop or status:
+        response = _request(socket_path, {'action': 'shutdown' if stop else 'ping'}, timeout=CONNECT_TIMEOUT)
+        if response is None:
+            click.echo(f'magic-pdf daemon is not running at {socket_path}')
+        elif stop:
+            click.echo('magic-pdf daemon stopped')
+        else:
+            click.echo(f'magic-pdf daemon {response["version"]} is running at {socket_path}, pid: {response["pid"]}')
+        return
+
+    serve(socket_path, preload)
+
+
+if __name__ == '__main__':
+    cli()
@@ -0,0 +1,145 @@
+"""Compare the speed, memory and output of the quantized UniMERNet modes with
+the full precision model on a fixed set of formula crops.
+
+usage:
+    python scripts/benchmark_mfr_quantization.py --crops-dir /path/to/formula/crops \
+        --labels labels.json --report report.md
+
+labels.json maps the crop file names to their ground truth latex, without it
+the latex of the full precision model is the reference. For every mode the
+report shows the recognition latency per crop, the speedup over fp32, the
+serialized model size, the growth of the process memory while the model is
+loaded and run, the character error rate and the BLEU-4 of the latex against
+the reference. With --report the table is also written as markdown together
+with the cpu, torch version and thread count it was measured with.
+"""
+import argparse
+import gc
+import io
+import json
+import math
+import os
+import platform
+import time
+from collections import Counter
+
+import torch
+from PIL import Image
+
+from magic_pdf.libs.config_reader import get_local_models_dir
+from magic_pdf.model.model_registry import get_process_rss
+from magic_pdf.model.sub_modules.mfr.unimernet.Unimernet import UnimernetModel
+
+
+def edit_distance(a: str, b: str) -> int:
+    prev = list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        cur = [i]
+        for j, cb in enumerate(b, 1):
+            cur.append(min(prev[j] + 1, cur[j - 1] + 1, prev[j - 1] + (ca != cb)))
+        prev = cur
+    return prev[-1]
+
+
+def bleu(candidate: str, reference: str, max_n=4) -> float:
+    """Sentence BLEU of the latex tokens, with add-one smoothing of the n-gram precisions."""
+    cand, ref = candidate.split(), reference.split()
+    if not cand or not ref:
+        return float(cand == ref)
+    log_precision = 0
+    for n in range(1, max_n + 1):
+        cand_ngrams = Counter(tuple(cand[i: i + n]) for i in range(len(cand) - n + 1))
+        ref_ngrams = Counter(tuple(ref[i: i + n]) for i in range(len(ref) - n + 1))
+        matches = sum(min(count, ref_ngrams[ngram]) for ngram, count in cand_ngrams.items())
+        log_precision += math.log((matches + 1) / (sum(cand_ngrams.values()) + 1)) / max_n
+    brevity = min(0.0, 1 - len(ref) / len(cand))
+    return math.exp(brevity + log_precision)
+
+
+def model_size(model: UnimernetModel) -> int:
+    buffer = io.BytesIO()
+    torch.save(model.model.state_dict(), buffer)
+    return buffer.tell()
+
+
+def recognize(model: UnimernetModel, images: list, batch_size: int):
+    formula_list = [{'latex': ''} for _ in images]
+    start = time.time()
+    model.batch_predict(formula_list, images, batch_size)
+    return [item['latex'] for item in formula_list], time.time() - start
+
+
+def run_mode(args, images: list, mode):
+    """Load and run one mode, returns the latex list, the time, the model size and the memory growth."""
+    gc.collect()
+    rss_before = get_process_rss() or 0
+    model = UnimernetModel(args.weight_dir, args.cfg_path, 'cpu', quantize=mode)
+    latex_list, cost = recognize(model, images, args.batch_size)
+    memory = max(0, (get_process_rss() or 0) - rss_before)
+    size = model_size(model)
+    del model
+    gc.collect()
+    return latex_list, cost, size, memory
+
+
+def main():
+    root_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--crops-dir', required=True, help='directory of formula crop images')
+    parser.add_argument('--labels', default=None, help='json file of crop file name to ground truth latex')
+    parser.add_argument('--weight-dir', default=os.path.join(get_local_models_dir(), 'MFR', 'unimernet_small'))
+    parser.add_argument('--cfg-path', default=os.path.join(
+        root_dir, 'magic_pdf', 'resources', 'model_config', 'UniMERNet', 'demo.yaml'))
+    parser.add_argument('--modes', nargs='+', default=['decoder', 'all'])
+    parser.add_argument('--batch-size', type=int, default=64)
+    parser.add_argument('--report', default=None, help='write the results as a markdown table to this file')
+    args = parser.parse_args()
+
+    names = sorted(n for n in os.listdir(args.crops_dir) if n.lower().endswith(('.png', '.jpg', '.jpeg')))
+    if args.labels:
+        with open(args.labels, 'r', encoding='utf-8') as f:
+            labels = json.load(f)
+        names = [n for n in names if n in labels]
+    images = [Image.open(os.path.join(args.crops_dir, n)).convert('RGB') for n in names]
+    print(f'crops: {len(images)}')
+
+    results = {}
+    for mode in [None] + args.modes:
+        results[mode] = run_mode(args, images, mode)
+    reference = [labels[n] for n in names] if args.labels else results[None][0]
+    ref_time = results[None][1]
+
+    # (mode, ms per crop, speedup, model MB, memory MB, cer, bleu)
+    rows = []
+    for mode, (latex_list, cost, size, memory) in results.items():
+        errors = sum(edit_distance(a, b) for a, b in zip(latex_list, reference))
+        cer = errors / max(sum(len(b) for b in reference), 1)
+        bleu_score = sum(bleu(a, b) for a, b in zip(latex_list, reference)) / max(len(images), 1)
+        rows.append((
+            mode or 'fp32', cost * 1000 / max(len(images), 1), ref_time / max(cost, 1e-9),
+            size / 1024 / 1024, memory / 1024 / 1024, cer, bleu_score,
+        ))
+
+    header = ['mode', 'ms/crop', 'speedup', 'model MB', 'memory MB', 'cer', 'bleu']
+    print(''.join(f'{h:>11}' for h in header))
+    for row in rows:
+        print(f'{row[0]:>11}' + ''.join(f'{v:>11.3f}' for v in row[1:]))
+
+    if args.report:
+        reference_name = 'ground truth latex' if args.labels else 'fp32 latex'
+        lines = [
+            f'crops: {len(images)}, reference: {reference_name}, batch size: {args.batch_size}, '
+            f'cpu: {platform.processor() or platform.machine()}, torch: {torch.__version__}, threads: {torch.get_num_threads()}',
+            '',
+            '| ' + ' | '.join(header) + ' |',
+            '| ' + ' | '.join(['---'] * len(header)) + ' |',
+        ]
+        for row in rows:
+            lines.append(f'| {row[0]} | ' + ' | '.join(f'{v:.3f}' for v in row[1:]) + ' |')
+        with open(args.report, 'w', encoding='utf-8') as f:
+            f.write('\n'.join(lines) + '\n')
+        print(f'report: {args.report}')
+
+
+if __name__ == '__main__':
+    main()
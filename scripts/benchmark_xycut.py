@@ -0,0 +1,123 @@
+"""Compare the vectorized xy-cut with the previous recursive implementation on
+synthetic pages.
+
+usage:
+    python scripts/benchmark_xycut.py --pages 200 --lines 400
+
+Every page is a multi column layout of line boxes with random gaps. The
+report shows the time of both implementations and checks that they produce
+the same order on every page.
+"""
+import argparse
+import time
+
+import numpy as np
+
+from magic_pdf.model.sub_modules.reading_oreder.layoutreader.xycut import (
+    batch_xy_cut)
+
+
+def legacy_projection_by_bboxes(boxes: np.array, axis: int) -> np.ndarray:
+    length = np.max(boxes[:, axis::2])
+    res = np.zeros(length, dtype=int)
+    for start, end in boxes[:, axis::2]:
+        res[start:end] += 1
+    return res
+
+
+def legacy_split_projection_profile(arr_values: np.array, min_value: float, min_gap: float):
+    arr_index = np.where(arr_values > min_value)[0]
+    if not len(arr_index):
+        return
+    arr_diff = arr_index[1:] - arr_index[0:-1]
+    arr_diff_index = np.where(arr_diff > min_gap)[0]
+    arr_zero_intvl_start = arr_index[arr_diff_index]
+    arr_zero_intvl_end = arr_index[arr_diff_index + 1]
+    arr_start = np.insert(arr_zero_intvl_end, 0, arr_index[0])
+    arr_end = np.append(arr_zero_intvl_start, arr_index[-1])
+    arr_end += 1
+    return arr_start, arr_end
+
+
+def legacy_recursive_xy_cut(boxes: np.ndarray, indices, res):
+    _indices = boxes[:, 1].argsort()
+    y_sorted_boxes = boxes[_indices]
+    y_sorted_indices = indices[_indices]
+
+    y_projection = legacy_projection_by_bboxes(boxes=y_sorted_boxes, axis=1)
+    pos_y = legacy_split_projection_profile(y_projection, 0, 1)
+    if not pos_y:
+        return
+
+    arr_y0, arr_y1 = pos_y
+    for r0, r1 in zip(arr_y0, arr_y1):
+        _indices = (r0 <= y_sorted_boxes[:, 1]) & (y_sorted_boxes[:, 1] < r1)
+        y_sorted_boxes_chunk = y_sorted_boxes[_indices]
+        y_sorted_indices_chunk = y_sorted_indices[_indices]
+
+        _indices = y_sorted_boxes_chunk[:, 0].argsort()
+        x_sorted_boxes_chunk = y_sorted_boxes_chunk[_indices]
+        x_sorted_indices_chunk = y_sorted_indices_chunk[_indices]
+
+        x_projection = legacy_projection_by_bboxes(boxes=x_sorted_boxes_chunk, axis=0)
+        pos_x = legacy_split_projection_profile(x_projection, 0, 1)
+        if not pos_x:
+            continue
+
+        arr_x0, arr_x1 = pos_x
+        if len(arr_x0) == 1:
+            res.extend(x_sorted_indices_chunk)
+            continue
+
+        for c0, c1 in zip(arr_x0, arr_x1):
+            _indices = (c0 <= x_sorted_boxes_chunk[:, 0]) & (x_sorted_boxes_chunk[:, 0] < c1)
+            legacy_recursive_xy_cut(x_sorted_boxes_chunk[_indices], x_sorted_indices_chunk[_indices], res)
+
+
+def make_page(rng: np.random.Generator, lines: int) -> np.ndarray:
+    columns = int(rng.integers(1, 4))
+    column_w = 1000 // columns
+    boxes = []
+    for i in range(lines):
+        column = i % columns
+        row = i // columns
+        x0 = column * column_w + int(rng.integers(5, 30))
+        x1 = (column + 1) * column_w - int(rng.integers(5, 30))
+        y0 = row * 8 + int(rng.integers(0, 3))
+        boxes.append([x0, y0, max(x1, x0 + 1), y0 + int(rng.integers(4, 7))])
+    boxes = np.array(boxes, dtype=int)
+    rng.shuffle(boxes)
+    return boxes
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--pages', type=int, default=200)
+    parser.add_argument('--lines', type=int, default=400)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    pages = [make_page(rng, args.lines) for _ in range(args.pages)]
+
+    start = time.time()
+    legacy_orders = []
+    for boxes in pages:
+        res = []
+        legacy_recursive_xy_cut(boxes, np.arange(len(boxes)), res)
+        legacy_orders.append([int(i) for i in res])
+    legacy_time = time.time() - start
+
+    start = time.time()
+    orders = batch_xy_cut(pages)
+    vectorized_time = time.time() - start
+
+    mismatches = sum(a != b for a, b in zip(legacy_orders, orders))
+    print(f'pages: {args.pages}, lines per page: {args.lines}')
+    print(f'legacy:     {legacy_time:.3f}s')
+    print(f'vectorized: {vectorized_time:.3f}s, speedup: {legacy_time / max(vectorized_time, 1e-9):.2f}x')
+    print(f'mismatched pages: {mismatches}')
+
+
+if __name__ == '__main__':
+    main()
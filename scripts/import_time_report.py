@@ -0,0 +1,65 @@
+"""Report the slowest imports of a magic_pdf entry module.
+
+usage:
+    python scripts/import_time_report.py
+    python scripts/import_time_report.py --module magic_pdf.model.doc_analyze_by_custom_model --top 30
+
+The module is imported in a fresh interpreter with ``-X importtime``, the
+report lists the total import time and the top level packages and modules
+which took the most cumulative time, so that a heavy dependency which is
+imported eagerly (torch, paddle, ultralytics...) is easy to spot.
+"""
+import argparse
+import subprocess
+import sys
+
+
+def parse_import_time(stderr: str) -> list:
+    """Parse the ``-X importtime`` output.
+
+    Returns:
+        list: [(module, self_us, cumulative_us, depth)] in import order
+    """
+    entries = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|', 2)
+        # 缩进表示导入的嵌套深度
+        depth = (len(name) - len(name.lstrip(' '))) // 2
+        entries.append((name.strip(), int(self_us), int(cumulative_us), depth))
+    return entries
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--module', default='magic_pdf.tools.cli', help='the module to import')
+    parser.add_argument('--top', type=int, default=20, help='number of modules to list')
+    args = parser.parse_args()
+
+    proc = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', f'import {args.module}'],
+        capture_output=True, text=True,
+    )
+    entries = parse_import_time(proc.stderr)
+    if proc.returncode != 0:
+        print(proc.stderr[-2000:])
+        sys.exit(proc.returncode)
+
+    total_us = sum(self_us for _, self_us, _, _ in entries)
+    print(f'import {args.module}: {total_us / 1e6:.2f}s, {len(entries)} modules')
+
+    # 顶层导入的累计耗时即各依赖包的总耗时
+    top_level = sorted((e for e in entries if e[3] <= 1), key=lambda e: e[2], reverse=True)
+    print(f'\n{"cumulative(s)":>14}  top level import')
+    for name, _, cumulative_us, _ in top_level[:args.top]:
+        print(f'{cumulative_us / 1e6:>14.3f}  {name}')
+
+    slowest = sorted(entries, key=lambda e: e[1], reverse=True)
+    print(f'\n{"self(s)":>14}  module')
+    for name, self_us, _, _ in slowest[:args.top]:
+        print(f'{self_us / 1e6:>14.3f}  {name}')
+
+
+if __name__ == '__main__':
+    main()
@@ -52,7 +52,11 @@ if __name__ == '__main__':
                      "rapidocr-paddle",  # rapidocr-paddle
                      "rapid_table",  # rapid_table
                      "PyYAML",  # yaml
-                     "detectron2"
+                     "detectron2",
+                     "scipy",  # layoutreader的assignment解码
+                     ],
+            "onnx": ["onnx",  # 导出layout和公式检测模型
+                     "onnxruntime",  # cpu上运行导出的onnx模型
                      ],
             "old_linux":[
                 "albumentations<=1.4.20", # 1.4.21引入的simsimd不支持2019年及更早的linux系统
@@ -66,7 +70,8 @@ if __name__ == '__main__':
         entry_points={
             "console_scripts": [
                 "magic-pdf = magic_pdf.tools.cli:cli",
-                "magic-pdf-dev = magic_pdf.tools.cli_dev:cli" 
+                "magic-pdf-dev = magic_pdf.tools.cli_dev:cli",
+                "magic-pdf-daemon = magic_pdf.tools.daemon:cli",
             ],
         },  # 项目提供的可执行命令
         include_package_data=True,  # 是否包含非代码文件，如数据文件、配置文件等
@@ -0,0 +1,84 @@
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+import fitz
+import numpy as np
+import pytest
+
+from magic_pdf.data import prefetch
+from magic_pdf.data.dataset import PymuDocDataset
+from magic_pdf.data.prefetch import iter_page_images_prefetch
+from magic_pdf.data.utils import iter_page_images
+
+
+def make_dataset(page_nums=5):
+    # 每页的文字与尺寸不同，页序错乱时图像无法对上
+    doc = fitz.open()
+    for i in range(page_nums):
+        page = doc.new_page(width=200 + i * 10, height=300)
+        page.insert_text((20, 40 + i * 20), f'page {i}', fontsize=20)
+    return PymuDocDataset(doc.tobytes())
+
+
+class RecordingExecutor(ProcessPoolExecutor):
+    """记录提交的渲染任务，检查预取队列的深度."""
+    submitted = []
+
+    def submit(self, fn, *args, **kwargs):
+        RecordingExecutor.submitted.append(args[0])
+        return super().submit(fn, *args, **kwargs)
+
+
+@pytest.fixture
+def recording_executor(monkeypatch):
+    RecordingExecutor.submitted = []
+    monkeypatch.setattr(prefetch, 'ProcessPoolExecutor', RecordingExecutor)
+    return RecordingExecutor
+
+
+@pytest.mark.parametrize('start_page_id, end_page_id, prefetch_pages, workers', [
+    (0, None, 2, 2),
+    (1, 3, 2, 1),
+    (0, None, 10, 2),
+])
+def test_prefetch_matches_iter_page_images(recording_executor, start_page_id, end_page_id, prefetch_pages, workers):
+    dataset = make_dataset()
+    expected = list(iter_page_images(dataset, start_page_id, end_page_id))
+
+    results = []
+    for index, img_dict in iter_page_images_prefetch(dataset, start_page_id, end_page_id, prefetch_pages, workers):
+        # 渲染任务最多领先已消费的页prefetch_pages页
+        rendered_nums = sum(1 for i, d in results if d['img'] is not None) + (img_dict['img'] is not None)
+        assert len(recording_executor.submitted) - rendered_nums < prefetch_pages
+        results.append((index, img_dict))
+
+    assert [index for index, _ in results] == [index for index, _ in expected]
+    for (_, img_dict), (_, expected_dict) in zip(results, expected):
+        assert img_dict['width'] == expected_dict['width']
+        assert img_dict['height'] == expected_dict['height']
+        if expected_dict['img'] is None:
+            assert img_dict['img'] is None
+        else:
+            assert np.array_equal(img_dict['img'], expected_dict['img'])
+
+
+@pytest.mark.parametrize('prefetch_pages, workers, end_page_id', [(0, 2, None), (2, 0, None), (2, 2, 0)])
+def test_prefetch_disabled_falls_back(recording_executor, prefetch_pages, workers, end_page_id):
+    dataset = make_dataset(3)
+    results = list(iter_page_images_prefetch(dataset, 0, end_page_id, prefetch_pages, workers))
+    expected = list(iter_page_images(dataset, 0, end_page_id))
+    assert recording_executor.submitted == []
+    assert [index for index, _ in results] == [index for index, _ in expected]
+
+
+def test_prefetch_workers_cleanup_on_early_stop(recording_executor):
+    dataset = make_dataset()
+    page_iter = iter_page_images_prefetch(dataset, 0, None, prefetch_pages=3, workers=2)
+    index, img_dict = next(page_iter)
+    assert index == 0 and img_dict['img'] is not None
+    assert multiprocessing.active_children()
+
+    # 消费者提前停止时关闭进程池，渲染进程全部退出
+    page_iter.close()
+    assert len(recording_executor.submitted) == 3
+    assert multiprocessing.active_children() == []
@@ -0,0 +1,43 @@
+import fitz
+
+from magic_pdf.data.dataset import PymuDocDataset
+from magic_pdf.data.utils import iter_page_images
+
+
+def test_iter_page_images_in_range():
+    with open('tests/unittest/test_data/assets/pdfs/test_01.pdf', 'rb') as f:
+        bits = f.read()
+    datasets = PymuDocDataset(bits)
+
+    page_images = list(iter_page_images(datasets, 0, 0))
+    assert len(page_images) == len(datasets)
+    for index, img_dict in page_images:
+        full_img_dict = datasets.get_page(index).get_image()
+        if index == 0:
+            assert img_dict['img'] is not None
+        else:
+            assert img_dict['img'] is None
+        # the size of the skipped pages must be the same as the rendered one
+        assert img_dict['width'] == full_img_dict['width']
+        assert img_dict['height'] == full_img_dict['height']
+
+
+def test_page_raster_cache_reuses_page():
+    with open('tests/unittest/test_data/assets/pdfs/test_01.pdf', 'rb') as f:
+        bits = f.read()
+    datasets = PymuDocDataset(bits)
+    page = datasets.get_page(0)
+    raster_cache = datasets.get_raster_cache()
+
+    # doc_analyze的分析图不占用缓存
+    page.get_image()
+    assert len(raster_cache) == 0
+
+    # 216dpi的截图尺寸与直接渲染一致，第二次截图后整页缓存，之后的截图从缓存中裁剪
+    for i in range(4):
+        clip = [50, 60 + i * 100, 250, 160 + i * 100]
+        img = page.get_raster(216, clip=clip)
+        pix = page.get_doc().get_pixmap(clip=clip, matrix=fitz.Matrix(3, 3))
+        assert img.shape == (pix.height, pix.width, 3)
+    assert raster_cache.misses == 2 and raster_cache.derived == 2
+    assert (0, 216, None) in raster_cache._entries
@@ -0,0 +1,52 @@
+import json
+
+import fitz
+
+from magic_pdf.data.dataset import PymuDocDataset
+from magic_pdf.libs import config_reader
+from magic_pdf.model import doc_analyze_by_custom_model
+
+
+class FakeMathGateModel:
+    layout_batch_size = 2
+    math_gate = True
+
+    def __init__(self):
+        self.batch_sizes = []
+
+    def detect_pages(self, images, math_hints=None):
+        assert len(math_hints) == len(images)
+        self.batch_sizes.append(len(images))
+        return [[{'page': 'layout'}] for _ in images], [[] for _ in images]
+
+    def __call__(self, image, layout_res=None, formula_queue=None, mfd_res=None, text_lines=None, math_hint=None):
+        if layout_res is None:
+            # 单页批次需要该页的数学线索
+            assert math_hint is not None
+            self.batch_sizes.append(1)
+            layout_res = [{'page': 'layout'}]
+        return layout_res
+
+    def pop_math_gate_stats(self):
+        return {'pages': 0, 'text_layer_skips': 0, 'probe_skips': 0}
+
+
+# 公式门控开启时，末尾不满一批的页面同样带有数学线索
+def test_doc_analyze_math_gate_trailing_batch(tmp_path, monkeypatch):
+    config_file = tmp_path / 'magic-pdf.json'
+    config_file.write_text(json.dumps({'render-config': {'prefetch_pages': 0}}), encoding='utf-8')
+    monkeypatch.setattr(config_reader, 'CONFIG_FILE_NAME', str(config_file))
+
+    with fitz.open() as doc:
+        for page_no in range(3):
+            page = doc.new_page()
+            for line in range(20):
+                page.insert_text((72, 72 + line * 20), f'page {page_no} line {line} ' * 4, fontsize=14)
+        pdf_bytes = doc.tobytes()
+
+    fake_model = FakeMathGateModel()
+    monkeypatch.setattr(doc_analyze_by_custom_model.ModelSingleton, 'get_model', lambda self, *args: fake_model)
+    infer_result = doc_analyze_by_custom_model.doc_analyze(PymuDocDataset(pdf_bytes))
+
+    assert fake_model.batch_sizes == [2, 1]
+    assert all(page['layout_dets'] == [{'page': 'layout'}] for page in infer_result.get_infer_res())
@@ -0,0 +1,65 @@
+import json
+import os
+
+import numpy as np
+
+from magic_pdf.libs import config_reader
+from magic_pdf.model.inference_cache import (InferenceResultCache,
+                                             LocalInferenceCacheStorage,
+                                             PageResultCache)
+
+
+def test_inference_cache_local_eviction(tmp_path):
+    cache = InferenceResultCache(LocalInferenceCacheStorage(str(tmp_path), max_bytes=300))
+    model_config = {'model_mode': 'full', 'ocr': False, 'lang': None}
+
+    key_a = InferenceResultCache.make_key(b'pdf a', model_config)
+    key_b = InferenceResultCache.make_key(b'pdf b', model_config)
+    assert key_a != key_b
+    assert key_a != InferenceResultCache.make_key(b'pdf a', dict(model_config, ocr=True))
+
+    model_json = [{'layout_dets': [], 'page_info': {'page_no': 0, 'height': 100, 'width': 'x' * 100}}]
+    assert cache.get(key_a) is None
+    cache.put(key_a, model_json)
+    assert cache.get(key_a) == model_json
+
+    # 超出max_bytes时淘汰最久未使用的结果
+    os.utime(tmp_path / f'{key_a}.json', (0, 0))
+    cache.put(key_b, model_json)
+    assert cache.get(key_a) is None
+    assert cache.get(key_b) == model_json
+
+
+# magic-pdf.json修改后缓存key随之变化
+def test_inference_cache_key_follows_config_file(tmp_path, monkeypatch):
+    from magic_pdf.model.doc_analyze_by_custom_model import get_model_config_identity
+
+    config_file = tmp_path / 'magic-pdf.json'
+    config = {'models-dir': str(tmp_path), 'device-mode': 'cpu', 'formula-config': {'math_gate': False}}
+    config_file.write_text(json.dumps(config), encoding='utf-8')
+    monkeypatch.setattr(config_reader, 'CONFIG_FILE_NAME', str(config_file))
+
+    key = InferenceResultCache.make_key(b'pdf a', get_model_config_identity(False))
+    assert key == InferenceResultCache.make_key(b'pdf a', get_model_config_identity(False))
+
+    config['formula-config']['math_gate'] = True
+    config_file.write_text(json.dumps(config), encoding='utf-8')
+    assert key != InferenceResultCache.make_key(b'pdf a', get_model_config_identity(False))
+
+
+def test_page_cache_key_follows_config_file(tmp_path, monkeypatch):
+    from magic_pdf.model.doc_analyze_by_custom_model import get_model_config_identity
+
+    config_file = tmp_path / 'magic-pdf.json'
+    config = {'models-dir': str(tmp_path), 'device-mode': 'cpu', 'table-config': {'enable': False}}
+    config_file.write_text(json.dumps(config), encoding='utf-8')
+    monkeypatch.setattr(config_reader, 'CONFIG_FILE_NAME', str(config_file))
+
+    img = np.zeros((20, 10, 3), dtype=np.uint8)
+    key = PageResultCache.make_key(img, get_model_config_identity(False))
+    # doc_analyze的参数覆盖配置文件，结果相同时key也相同
+    assert key == PageResultCache.make_key(img, get_model_config_identity(False, table_enable=False))
+
+    config['table-config']['enable'] = True
+    config_file.write_text(json.dumps(config), encoding='utf-8')
+    assert key != PageResultCache.make_key(img, get_model_config_identity(False))
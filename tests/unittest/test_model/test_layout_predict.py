@@ -0,0 +1,165 @@
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+import torch
+
+# ppocr随paddleocr安装，导入paddleocr后才能导入pdf_extract_kit
+pytest.importorskip('paddleocr')
+
+from magic_pdf.config.constants import MODEL_NAME  # noqa: E402
+from magic_pdf.model.pdf_extract_kit import CustomPEKModel  # noqa: E402
+
+
+def make_pages(page_nums):
+    # 页面宽度与像素值都编码页码，结果错位时可以发现
+    return [np.full((100, 80 + i * 10, 3), i, dtype=np.uint8) for i in range(page_nums)]
+
+
+def make_layout_model(layout_model_name, layout_model, layout_batch_size):
+    model = CustomPEKModel.__new__(CustomPEKModel)
+    model.layout_model_name = layout_model_name
+    model.layout_batch_size = layout_batch_size
+    model._get_atom_model = {'layout_model': layout_model}.get
+    return model
+
+
+class FakeYolo:
+    """按doclayout_yolo的接口返回结果，检测框位于原页面在截图中的位置."""
+
+    def __init__(self):
+        self.batch_sizes = []
+
+    def predict(self, images, **kwargs):
+        if not isinstance(images, list):
+            images = [images]
+        self.batch_sizes.append(len(images))
+        results = []
+        for image in images:
+            width, height = image.size
+            page_width = width // 2
+            page_no = np.asarray(image)[height // 2, width // 2, 0]
+            # 截图左右各粘贴了页面宽度一半的留白
+            xyxy = [page_width // 2 + 10, 20 + page_no, page_width // 2 + page_width - 5, 60]
+            results.append(SimpleNamespace(boxes=SimpleNamespace(
+                xyxy=torch.tensor([xyxy], dtype=torch.float32),
+                conf=torch.tensor([0.9]),
+                cls=torch.tensor([int(page_no)]),
+            )))
+        return results
+
+
+@pytest.mark.parametrize('page_nums, batch_size, target_batch_sizes', [
+    (5, 2, [2, 2, 1]),
+    (4, 2, [2, 2]),
+    (3, 8, [3]),
+    (1, 2, [1]),
+])
+def test_layout_predict_doclayout_yolo_alignment(page_nums, batch_size, target_batch_sizes):
+    from magic_pdf.model.sub_modules.layout.doclayout_yolo.DocLayoutYOLO import \
+        DocLayoutYOLOModel
+
+    yolo_model = DocLayoutYOLOModel.__new__(DocLayoutYOLOModel)
+    yolo_model.model = FakeYolo()
+    yolo_model.device = 'cpu'
+    model = make_layout_model(MODEL_NAME.DocLayout_YOLO, yolo_model, batch_size)
+    pages = make_pages(page_nums)
+
+    images_layout_res = model.layout_predict(pages)
+
+    assert yolo_model.model.batch_sizes == target_batch_sizes
+    assert len(images_layout_res) == page_nums
+    for page_no, (page, layout_res) in enumerate(zip(pages, images_layout_res)):
+        width = page.shape[1]
+        # 检测框平移回页面坐标
+        assert layout_res == [{
+            'category_id': page_no,
+            'poly': [10, 20 + page_no, width - 5, 20 + page_no, width - 5, 60, 10, 60],
+            'score': 0.9,
+        }]
+
+
+class FakeLayoutlmv3:
+    def __init__(self):
+        self.calls = []
+
+    def __call__(self, image, ignore_catids=[]):
+        self.calls.append(('single', 1, ignore_catids))
+        return [{'page': int(image[0, 0, 0])}]
+
+    def batch_predict(self, images, batch_size, ignore_catids=[]):
+        self.calls.append(('batch', batch_size, ignore_catids))
+        return [[{'page': int(image[0, 0, 0])}] for image in images]
+
+
+@pytest.mark.parametrize('page_nums, target_calls', [
+    (5, [('batch', 2, [])]),
+    (1, [('single', 1, [])]),
+])
+def test_layout_predict_layoutlmv3_alignment(page_nums, target_calls):
+    layout_model = FakeLayoutlmv3()
+    model = make_layout_model(MODEL_NAME.LAYOUTLMv3, layout_model, 2)
+    images_layout_res = model.layout_predict(make_pages(page_nums))
+    assert layout_model.calls == target_calls
+    assert images_layout_res == [[{'page': i}] for i in range(page_nums)]
+
+
+class FakeRCNN:
+    """记录送入模型的输入，每页返回一个编码页码的检测框."""
+
+    def __init__(self):
+        self.inputs = []
+
+    def __call__(self, inputs):
+        from detectron2.structures import Boxes, Instances
+
+        self.inputs.append(inputs)
+        outputs = []
+        for item in inputs:
+            page_no = float(item['image'][0, 0, 0])
+            instances = Instances((item['height'], item['width']))
+            instances.pred_boxes = Boxes(torch.tensor([[0.0, page_no, 10.0, 20.0]]))
+            instances.pred_classes = torch.tensor([1])
+            instances.scores = torch.tensor([0.5])
+            outputs.append({'instances': instances})
+        return outputs
+
+
+@pytest.mark.parametrize('input_format', ['BGR', 'RGB'])
+def test_layoutlmv3_batch_predict_matches_default_predictor(input_format):
+    pytest.importorskip('detectron2')
+    from detectron2.data import transforms as T
+    from detectron2.engine import DefaultPredictor
+
+    from magic_pdf.model.sub_modules.layout.layoutlmv3.model_init import \
+        Layoutlmv3_Predictor
+
+    predictor = DefaultPredictor.__new__(DefaultPredictor)
+    predictor.cfg = SimpleNamespace(MODEL=SimpleNamespace(DEVICE='cpu'))
+    predictor.input_format = input_format
+    predictor.aug = T.ResizeShortestEdge([800, 800], 1333)
+    predictor.model = FakeRCNN()
+    layout_model = Layoutlmv3_Predictor.__new__(Layoutlmv3_Predictor)
+    layout_model.predictor = predictor
+    pages = make_pages(5)
+    # 区分通道顺序
+    for page in pages:
+        page[:, :, 2] = 200
+
+    images_layout_res = layout_model.batch_predict(pages, 2, ignore_catids=[])
+    batch_inputs = [item for inputs in predictor.model.inputs for item in inputs]
+    assert [len(inputs) for inputs in predictor.model.inputs] == [2, 2, 1]
+
+    predictor.model.inputs = []
+    single_res = [layout_model(page, ignore_catids=[]) for page in pages]
+    single_inputs = [inputs[0] for inputs in predictor.model.inputs]
+
+    # 批量推理的预处理与DefaultPredictor逐页推理一致
+    for batch_item, single_item in zip(batch_inputs, single_inputs):
+        assert batch_item['height'] == single_item['height']
+        assert batch_item['width'] == single_item['width']
+        assert torch.equal(batch_item['image'].cpu(), single_item['image'].cpu())
+    assert images_layout_res == single_res
+    assert [res[0]['poly'][1] for res in images_layout_res] == [
+        float(page[0, 0, 2 if input_format == 'RGB' else 0]) for page in pages
+    ]
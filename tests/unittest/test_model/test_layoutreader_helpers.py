@@ -0,0 +1,63 @@
+import torch
+
+from magic_pdf.model.sub_modules.reading_oreder.layoutreader.helpers import (
+    batch_boxes2inputs, boxes2inputs)
+
+
+def test_batch_boxes2inputs_matches_single_page():
+    boxes_list = [
+        [[10, 10, 500, 30], [10, 40, 500, 60], [10, 70, 300, 90]],
+        [[600, 100, 900, 120]],
+    ]
+    batch = batch_boxes2inputs(boxes_list)
+    assert batch['input_ids'].shape == (2, 5)
+
+    for i, boxes in enumerate(boxes_list):
+        single = boxes2inputs(boxes)
+        length = len(boxes) + 2
+        for key in ['bbox', 'input_ids', 'attention_mask']:
+            assert torch.equal(batch[key][i, :length], single[key][0])
+        # padding部分不参与attention
+        assert batch['attention_mask'][i, length:].sum() == 0
+
+
+def test_split_lines_into_regions():
+    from magic_pdf.pdf_parse_union_core_v2 import split_lines_into_regions
+
+    # 两栏各225行，右栏的block排在前面
+    right_column = [[520, 40 + i * 4, 980, 42 + i * 4] for i in range(225)]
+    left_column = [[20, 40 + i * 4, 480, 42 + i * 4] for i in range(225)]
+    groups = [list(range(0, 225)), list(range(225, 450))]
+    regions = split_lines_into_regions(right_column + left_column, groups, max_lines=200)
+
+    assert all(len(region) <= 200 for region in regions)
+    assert sum(regions, []) == list(range(225, 450)) + list(range(0, 225))
+
+
+def test_batch_xy_cut():
+    from magic_pdf.model.sub_modules.reading_oreder.layoutreader.xycut import batch_xy_cut
+
+    # 两栏交错排列，左栏两行，右栏两行，顺序打乱
+    page = [[520, 25, 980, 45], [20, 40, 480, 60], [20, 10, 480, 30], [520, 55, 980, 75]]
+    assert batch_xy_cut([page, []]) == [[2, 1, 0, 3], []]
+
+
+def test_parse_logits_by_assignment():
+    from magic_pdf.model.sub_modules.reading_oreder.layoutreader.helpers import (
+        parse_logits, parse_logits_by_assignment)
+
+    generator = torch.Generator().manual_seed(0)
+    length = 120
+    # 模型输出的logits包含CLS、EOS和padding位置
+    target = torch.randperm(length, generator=generator)
+    logits = torch.randn(length + 4, length + 4, generator=generator)
+    logits[torch.arange(1, length + 1), target] += 8
+    assert parse_logits_by_assignment(logits, length) == parse_logits(logits, length) == target.tolist()
+
+    # 预测模糊时两种解码都是排列，assignment的总得分不低于greedy
+    logits = torch.randn(length + 2, length + 2, generator=generator)
+    scores = torch.log_softmax(logits[1: length + 1, :length], dim=-1)
+    greedy = parse_logits(logits, length)
+    assignment = parse_logits_by_assignment(logits, length)
+    assert sorted(greedy) == sorted(assignment) == list(range(length))
+    assert scores[range(length), assignment].sum() >= scores[range(length), greedy].sum()
@@ -0,0 +1,57 @@
+import pytest
+import torch
+from PIL import Image
+
+pytest.importorskip('unimernet')
+
+from magic_pdf.model.sub_modules.mfr.unimernet.Unimernet import (  # noqa: E402
+    FormulaRecognitionQueue, UnimernetModel)
+
+
+class FakeUnimernet:
+    def __init__(self):
+        self.batches = []
+
+    def generate(self, samples):
+        # 用图片的宽高作为识别结果
+        sizes = [f'{int(w)}x{int(h)}' for w, h in samples['image'].tolist()]
+        self.batches.append(sizes)
+        return {'pred_str': sizes}
+
+
+def fake_mfr_model() -> UnimernetModel:
+    mfr_model = UnimernetModel.__new__(UnimernetModel)
+    mfr_model.model = FakeUnimernet()
+    mfr_model.device = 'cpu'
+    mfr_model.mfr_transform = lambda image: torch.tensor(image.size, dtype=torch.float32)
+    return mfr_model
+
+
+def test_batch_predict_scatters_latex_by_aspect_bucket():
+    mfr_model = fake_mfr_model()
+    # 宽的单行公式和窄高的公式面积相同
+    sizes = [(400, 20), (40, 200), (30, 10), (80, 100), (200, 40), (20, 400)]
+    formula_list = [{'latex': ''} for _ in sizes]
+    mfr_model.batch_predict(formula_list, [Image.new('RGB', size) for size in sizes], batch_size=2)
+
+    assert [item['latex'] for item in formula_list] == [f'{w}x{h}' for w, h in sizes]
+    assert mfr_model.model.batches == [['20x400', '40x200'], ['80x100', '30x10'], ['200x40', '400x20']]
+
+
+def test_formula_queue_flushes_across_pages():
+    mfr_model = fake_mfr_model()
+    queue = FormulaRecognitionQueue(mfr_model, batch_size=2, max_pending=3)
+    pages = [[(30, 10), (60, 20)], [], [(10, 50), (90, 30), (40, 40)], [(120, 20)]]
+
+    formula_lists = []
+    for sizes in pages:
+        formula_list = [{'latex': ''} for _ in sizes]
+        formula_lists.append(formula_list)
+        queue.put(formula_list, [Image.new('RGB', size) for size in sizes])
+    # 满max_pending时自动识别，剩余的在flush时识别
+    assert len(queue) == 1
+    queue.flush()
+    assert len(queue) == 0
+
+    for sizes, formula_list in zip(pages, formula_lists):
+        assert [item['latex'] for item in formula_list] == [f'{w}x{h}' for w, h in sizes]
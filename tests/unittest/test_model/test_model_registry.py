@@ -0,0 +1,64 @@
+from magic_pdf.model.model_registry import ModelRegistry
+
+
+def test_model_registry_lru_eviction():
+    events = []
+    registry = ModelRegistry('test registry', max_entries=2, measure=False)
+    registry.add_listener(lambda event, key, size: events.append((event, key)))
+
+    assert registry.get('ch', lambda: 'ocr_ch') == 'ocr_ch'
+    assert registry.get('en', lambda: 'ocr_en') == 'ocr_en'
+    # 命中后ch成为最近使用，加载第三个模型时淘汰en
+    assert registry.get('ch', lambda: 'reloaded') == 'ocr_ch'
+    registry.get('japan', lambda: 'ocr_japan')
+
+    assert 'ch' in registry and 'en' not in registry
+    assert events == [('load', 'ch'), ('load', 'en'), ('load', 'japan'), ('evict', 'en')]
+    assert registry.stats()['hits'] == 1
+    assert registry.get('en', lambda: 'ocr_en_reloaded') == 'ocr_en_reloaded'
+    assert registry.stats()['loads'] == 4
+
+
+class FakeWrapper:
+    def __init__(self, module):
+        # 与Unimernet等封装一致，torch模块位于属性中
+        self.model = module
+        self.name = 'fake'
+
+
+def test_model_registry_sizes_by_parameter_bytes():
+    import torch
+
+    linear = torch.nn.Linear(10, 20)
+    norm = torch.nn.BatchNorm1d(20)
+    expected = sum(t.numel() * t.element_size() for t in [*linear.parameters(), *norm.parameters(), *norm.buffers()])
+
+    registry = ModelRegistry('test registry')
+    # 共享的模块只统计一次
+    registry.get('model', lambda: FakeWrapper([linear, norm, {'shared': linear}]))
+    assert registry.stats()['bytes'] == expected
+
+
+def test_model_registry_rss_fallback(monkeypatch):
+    from magic_pdf.model import model_registry
+
+    rss = iter([1000, 1500])
+    monkeypatch.setattr(model_registry, 'get_process_rss', lambda: next(rss))
+    monkeypatch.setattr(model_registry, 'get_cuda_allocated', lambda: None)
+    registry = ModelRegistry('test registry')
+    registry.get('paddle', lambda: FakeWrapper(object()))
+    assert registry.stats()['bytes'] == 500
+
+
+def test_atom_model_table_key(monkeypatch):
+    from magic_pdf.model.model_list import AtomicModel
+    from magic_pdf.model.sub_modules import model_init
+
+    monkeypatch.setattr(model_init.AtomModelSingleton, '_registry', ModelRegistry('test registry', measure=False))
+    monkeypatch.setattr(model_init, 'atom_model_init', lambda model_name, **kwargs: dict(kwargs))
+    singleton = model_init.AtomModelSingleton()
+    kwargs = dict(table_model_name='rapid_table', table_max_time=400, table_batch_size=1)
+    model = singleton.get_atom_model(AtomicModel.Table, **kwargs)
+    assert singleton.get_atom_model(AtomicModel.Table, **kwargs) is model
+    assert singleton.get_atom_model(AtomicModel.Table, **dict(kwargs, table_max_time=10)) is not model
+    assert singleton.get_atom_model(AtomicModel.Table, **dict(kwargs, table_batch_size=4)) is not model
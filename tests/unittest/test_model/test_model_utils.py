@@ -0,0 +1,137 @@
+import os
+
+import fitz
+import numpy as np
+import pytest
+
+from magic_pdf.model.sub_modules.model_utils import (get_onnx_weights,
+                                                     is_blank_image)
+
+
+def test_is_blank_image():
+    page = np.full((2200, 1700, 3), 255, dtype=np.uint8)
+    assert is_blank_image(page)
+
+    # 扫描噪点和页码仍视为空白
+    page[2100:2130, 840:860] = 0
+    assert is_blank_image(page)
+
+    page[200:400, 200:1500] = 0
+    assert not is_blank_image(page)
+
+    assert is_blank_image(np.zeros((0, 0, 3), dtype=np.uint8))
+
+
+def test_is_blank_page_sparse_scan():
+    from magic_pdf.model.doc_analyze_by_custom_model import is_blank_page
+
+    with fitz.open() as doc:
+        page = doc.new_page()
+        img = np.full((2200, 1700, 3), 255, dtype=np.uint8)
+        assert is_blank_page(img, page)
+
+        # 没有文本层的扫描页上只有页码时不能视为空白
+        img[2100:2130, 840:880] = 0
+        assert is_blank_image(img)
+        assert not is_blank_page(img, page)
+
+        # 有文本层且最多只有页码的页面仍视为空白
+        page.insert_text((300, 800), '12')
+        assert is_blank_page(img, page)
+
+
+class FakeExportModel:
+    """ultralytics风格的检测模型，export写出onnx文件或失败."""
+    export_fails = False
+
+    def __init__(self, weight, task=None):
+        self.weight = weight
+        self.task = task
+        self.export_calls = []
+
+    def export(self, **kwargs):
+        self.export_calls.append(kwargs)
+        if self.export_fails:
+            raise RuntimeError('onnx not installed')
+        onnx_path = os.path.splitext(self.weight)[0] + '.onnx'
+        with open(onnx_path, 'wb') as f:
+            f.write(b'onnx')
+        return onnx_path
+
+
+@pytest.fixture
+def weight_file(tmp_path):
+    weight = tmp_path / 'model.pt'
+    weight.write_bytes(b'pt')
+    return str(weight)
+
+
+@pytest.mark.parametrize('onnx_exists, export_fails, target', [
+    (True, False, 'onnx'),
+    (True, True, 'onnx'),
+    (False, False, 'onnx'),
+    (False, True, None),
+])
+def test_get_onnx_weights(monkeypatch, weight_file, onnx_exists, export_fails, target):
+    onnx_path = os.path.splitext(weight_file)[0] + '.onnx'
+    if onnx_exists:
+        with open(onnx_path, 'wb') as f:
+            f.write(b'onnx')
+    monkeypatch.setattr(FakeExportModel, 'export_fails', export_fails)
+    model = FakeExportModel(weight_file)
+
+    result = get_onnx_weights(model, weight_file, imgsz=1024)
+
+    assert result == (onnx_path if target else None)
+    # 已导出的onnx直接复用，不再导出
+    if onnx_exists:
+        assert model.export_calls == []
+    else:
+        assert model.export_calls == [{'format': 'onnx', 'imgsz': 1024, 'dynamic': True, 'device': 'cpu'}]
+
+
+@pytest.mark.parametrize('module_name, class_name, model_cls_name, model_attr, imgsz', [
+    ('doclayout_yolo', 'DocLayoutYOLOModel', 'YOLOv10', 'model', 1024),
+    ('ultralytics', 'YOLOv8MFDModel', 'YOLO', 'mfd_model', 1888),
+])
+@pytest.mark.parametrize('onnx_exists, export_fails', [(True, True), (False, False), (False, True)])
+def test_onnx_backend(monkeypatch, weight_file, module_name, class_name, model_cls_name, model_attr, imgsz, onnx_exists, export_fails):
+    pytest.importorskip(module_name)
+    if module_name == 'doclayout_yolo':
+        from magic_pdf.model.sub_modules.layout.doclayout_yolo import \
+            DocLayoutYOLO as detector_module
+    else:
+        from magic_pdf.model.sub_modules.mfd.yolov8 import \
+            YOLOv8 as detector_module
+
+    onnx_path = os.path.splitext(weight_file)[0] + '.onnx'
+    if onnx_exists:
+        with open(onnx_path, 'wb') as f:
+            f.write(b'onnx')
+    created = []
+
+    class RecordingModel(FakeExportModel):
+        def __init__(self, weight, task=None):
+            super().__init__(weight, task)
+            created.append(self)
+
+    monkeypatch.setattr(FakeExportModel, 'export_fails', export_fails)
+    monkeypatch.setattr(detector_module, model_cls_name, RecordingModel)
+
+    detector = getattr(detector_module, class_name)(weight_file, 'cuda', backend='onnx')
+    model = getattr(detector, model_attr)
+
+    if onnx_exists or not export_fails:
+        # 加载onnx在cpu上推理
+        assert [(m.weight, m.task) for m in created] == [(weight_file, None), (onnx_path, 'detect')]
+        assert detector.device == 'cpu'
+    else:
+        # 导出失败时退回pytorch
+        assert [(m.weight, m.task) for m in created] == [(weight_file, None)]
+        assert model is created[0]
+        assert detector.device == 'cuda'
+    assert created[0].export_calls == ([] if onnx_exists else [{'format': 'onnx', 'imgsz': imgsz, 'dynamic': True, 'device': 'cpu'}])
+
+    torch_detector = getattr(detector_module, class_name)(weight_file, 'cuda', backend='torch')
+    assert getattr(torch_detector, model_attr).weight == weight_file
+    assert torch_detector.device == 'cuda'
@@ -0,0 +1,191 @@
+import numpy as np
+import pytest
+from PIL import Image
+
+# ppocr随paddleocr安装，导入paddleocr后才能导入
+pytest.importorskip('paddleocr')
+
+from magic_pdf.model.pdf_extract_kit import CustomPEKModel  # noqa: E402
+from magic_pdf.model.sub_modules.ocr.paddleocr.ocr_utils import \
+    get_text_layer_dt_boxes  # noqa: E402
+from magic_pdf.model.sub_modules.ocr.paddleocr.ppocr_273_mod import \
+    ModifiedPaddleOCR  # noqa: E402
+
+
+def poly_of(bbox):
+    x0, y0, x1, y1 = bbox
+    return [x0, y0, x1, y0, x1, y1, x0, y1]
+
+
+def dt_box_to_bbox(box):
+    return [float(box[0][0]), float(box[0][1]), float(box[2][0]), float(box[2][1])]
+
+
+@pytest.mark.parametrize('line_bbox, target_bbox', [
+    ([30, 30, 100, 50], [30, 30, 100, 50]),
+    # 中心在区域内的行裁剪到区域范围，坐标仍为页面坐标
+    ([10, 100, 60, 130], [20, 100, 60, 120]),
+    ([350, 10, 400, 30], [350, 20, 380, 30]),
+    # 中心在区域外的行被丢弃
+    ([0, 0, 30, 30], None),
+    ([370, 100, 420, 140], None),
+])
+def test_get_text_layer_dt_boxes(line_bbox, target_bbox):
+    dt_boxes = get_text_layer_dt_boxes([{'bbox': line_bbox, 'text': 'line'}], [20, 20, 380, 120])
+    if target_bbox is None:
+        assert dt_boxes == []
+    else:
+        assert [dt_box_to_bbox(box) for box in dt_boxes] == [target_bbox]
+
+
+class FakeDetModel:
+    def __init__(self, dt_boxes):
+        self.dt_boxes = dt_boxes
+        self.calls = []
+
+    def ocr(self, img, mfd_res=None, rec=True):
+        self.calls.append((img.shape, mfd_res, rec))
+        return [self.dt_boxes]
+
+
+def make_text_layer_model(ocr_model):
+    model = CustomPEKModel.__new__(CustomPEKModel)
+    model.apply_ocr = False
+    model.ocr_batch_rec = True
+    model.ocr_text_layer_det = True
+    # 模型属性从AtomModelSingleton获取，这里直接返回假模型
+    model._get_atom_model = {'ocr_model': ocr_model}.get
+    return model
+
+
+def test_ocr_predict_text_layer_det():
+    page = np.full((300, 400, 3), 255, dtype=np.uint8)
+    region_a, region_b = [20, 20, 380, 120], [20, 150, 380, 280]
+    page[30:110, 30:370] = 0
+    page[160:260, 30:370] = 0
+    text_lines = [
+        # 相邻的两行合并为一个框
+        {'bbox': [30, 30, 100, 50], 'text': 'a'},
+        {'bbox': [100, 30, 200, 50], 'text': 'b'},
+        # 与公式重叠的行在公式处断开
+        {'bbox': [30, 70, 370, 90], 'text': 'c'},
+        # 跨越区域下边的行裁剪到区域内
+        {'bbox': [10, 100, 60, 130], 'text': 'd'},
+        # 中心不在任何区域内
+        {'bbox': [300, 285, 350, 299], 'text': 'e'},
+    ]
+    mfd_res = [{'bbox': [150, 70, 200, 90]}]
+    # 区域b没有文本层的行，交给检测模型，检测框为截图坐标，截图四周各有50像素的留白
+    det_model = FakeDetModel([[[60, 60], [120, 60], [120, 80], [60, 80]]])
+    model = make_text_layer_model(det_model)
+
+    ocr_res = model.ocr_predict(Image.fromarray(page), [{'poly': poly_of(region_a)}, {'poly': poly_of(region_b)}], mfd_res, text_lines)
+
+    assert len(det_model.calls) == 1
+    assert det_model.calls[0][2] is False
+    assert all(res['category_id'] == 15 and res['text'] == '' and res['score'] == 1.0 for res in ocr_res)
+    assert sorted(res['poly'] for res in ocr_res) == sorted([
+        poly_of([30, 30, 200, 50]),
+        poly_of([30, 70, 149, 90]),
+        poly_of([201, 70, 370, 90]),
+        poly_of([20, 100, 60, 120]),
+        poly_of([30, 160, 90, 180]),
+    ])
+
+
+def test_ocr_predict_without_text_lines_uses_detector():
+    page = np.full((300, 400, 3), 255, dtype=np.uint8)
+    page[30:110, 30:370] = 0
+    det_model = FakeDetModel([[[60, 60], [120, 60], [120, 80], [60, 80]]])
+    model = make_text_layer_model(det_model)
+
+    ocr_res = model.ocr_predict(Image.fromarray(page), [{'poly': poly_of([20, 20, 380, 120])}], [], None)
+    assert len(det_model.calls) == 1
+    assert [res['poly'] for res in ocr_res] == [poly_of([30, 30, 90, 50])]
+
+
+class FakeBatchOcrModel:
+    """每个区域依次返回预设的检测框，识别结果由检测框决定."""
+    drop_score = 0.5
+
+    def __init__(self, region_dt_boxes, rec_scores):
+        self.region_dt_boxes = list(region_dt_boxes)
+        self.rec_scores = rec_scores
+        self.rec_calls = []
+
+    def ocr(self, img, mfd_res=None, rec=True):
+        assert rec is False
+        return [self.region_dt_boxes.pop(0)]
+
+    def get_text_line_crops(self, img, dt_boxes):
+        return [tuple(box[0]) for box in dt_boxes]
+
+    def batch_rec(self, img_crop_list):
+        self.rec_calls.append(list(img_crop_list))
+        return [(f'text{x}_{y}', self.rec_scores[(x, y)]) for x, y in img_crop_list]
+
+
+def box_at(x, y):
+    return [[x, y], [x + 40, y], [x + 40, y + 20], [x, y + 20]]
+
+
+def test_batch_ocr_maps_rec_res_to_regions():
+    page = np.full((400, 400, 3), 255, dtype=np.uint8)
+    regions = [[0, 0, 200, 100], [0, 120, 200, 220], [0, 240, 200, 340]]
+    for x0, y0, x1, y1 in regions:
+        page[y0 + 5:y1 - 5, x0 + 5:x1 - 5] = 0
+    # 第二个区域没有检测到文本行，识别结果不能错位
+    region_dt_boxes = [[box_at(60, 60), box_at(110, 60)], None, [box_at(70, 60), box_at(60, 90), box_at(110, 90)]]
+    rec_scores = {(60, 60): 0.9, (110, 60): 0.3, (70, 60): 0.8, (60, 90): 0.95, (110, 90): 0.7}
+    ocr_model = FakeBatchOcrModel(region_dt_boxes, rec_scores)
+    model = make_text_layer_model(ocr_model)
+
+    ocr_res = model.batch_ocr(Image.fromarray(page), [{'poly': poly_of(bbox)} for bbox in regions], [])
+
+    # 所有区域的文本行只调用一次识别
+    assert ocr_model.rec_calls == [[(60, 60), (110, 60), (70, 60), (60, 90), (110, 90)]]
+    # 截图四周各有50像素的留白，分数低于drop_score的(110, 60)被丢弃
+    assert [(res['text'], res['poly'][:2], res['score']) for res in ocr_res] == [
+        ('text60_60', [10, 10], 0.9),
+        ('text70_60', [20, 250], 0.8),
+        ('text60_90', [10, 280], 0.95),
+        ('text110_90', [60, 280], 0.7),
+    ]
+
+
+def test_batch_ocr_without_text_lines():
+    page = np.full((200, 200, 3), 255, dtype=np.uint8)
+    ocr_model = FakeBatchOcrModel([[], None], {})
+    model = make_text_layer_model(ocr_model)
+    regions = [{'poly': poly_of([0, 0, 100, 100])}, {'poly': poly_of([100, 100, 200, 200])}]
+    assert model.batch_ocr(Image.fromarray(page), regions, []) == []
+    assert ocr_model.rec_calls == [[]]
+
+
+class FakeTextSystem:
+    def __init__(self, name):
+        self.name = name
+        self.calls = []
+
+    def __call__(self, img_crop_list):
+        self.calls.append(list(img_crop_list))
+        if self.name == 'cls':
+            return [f'cls_{img}' for img in img_crop_list], [], 0
+        return [(img, 0.9) for img in img_crop_list], 0
+
+
+@pytest.mark.parametrize('use_angle_cls, cls, target', [
+    (True, True, ['cls_a', 'cls_b', 'cls_c']),
+    (True, False, ['a', 'b', 'c']),
+    (False, True, ['a', 'b', 'c']),
+])
+def test_batch_rec_keeps_crop_order(use_angle_cls, cls, target):
+    ocr = ModifiedPaddleOCR.__new__(ModifiedPaddleOCR)
+    ocr.use_angle_cls = use_angle_cls
+    ocr.text_classifier = FakeTextSystem('cls')
+    ocr.text_recognizer = FakeTextSystem('rec')
+
+    assert ocr.batch_rec(['a', 'b', 'c'], cls=cls) == [(text, 0.9) for text in target]
+    assert ocr.text_recognizer.calls == [target]
+    assert ocr.batch_rec([]) == []
+    assert len(ocr.text_recognizer.calls) == 1
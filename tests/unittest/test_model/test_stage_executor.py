@@ -0,0 +1,64 @@
+import threading
+import time
+
+import pytest
+
+from magic_pdf.model.sub_modules.stage_executor import StageExecutor
+
+
+@pytest.mark.parametrize('max_workers', [1, 3])
+def test_stage_executor_results_by_stage(max_workers):
+    executor = StageExecutor(max_workers)
+    results = executor.run({'layout': lambda: 'layout_res', 'mfd': lambda: 'mfd_res', 'ocr': lambda: None})
+    executor.shutdown()
+    assert results == {'layout': 'layout_res', 'mfd': 'mfd_res', 'ocr': None}
+
+
+def test_stage_executor_runs_stages_concurrently():
+    # 两个阶段互相等待，只有并发执行时才能同时越过barrier
+    barrier = threading.Barrier(2, timeout=2)
+    thread_names = {}
+
+    def stage(name):
+        barrier.wait()
+        thread_names[name] = threading.current_thread().name
+        return name
+
+    executor = StageExecutor(2)
+    results = executor.run({'layout': lambda: stage('layout'), 'mfd': lambda: stage('mfd')})
+    executor.shutdown()
+    assert results == {'layout': 'layout', 'mfd': 'mfd'}
+    assert thread_names['layout'] != thread_names['mfd']
+    assert all(name.startswith('magic_pdf_stage') for name in thread_names.values())
+
+
+def test_stage_executor_single_worker_runs_in_caller_thread():
+    executor = StageExecutor(1)
+    results = executor.run({'layout': lambda: threading.current_thread().name})
+    assert results == {'layout': threading.current_thread().name}
+
+
+def test_stage_executor_raises_after_all_stages_finish():
+    finished = []
+
+    def failing_stage(exc, delay):
+        time.sleep(delay)
+        finished.append(type(exc))
+        raise exc
+
+    def slow_stage():
+        time.sleep(0.3)
+        finished.append('slow')
+        return 'slow'
+
+    executor = StageExecutor(3)
+    # layout的异常晚于mfd发生，仍按阶段顺序抛出layout的异常
+    with pytest.raises(ValueError):
+        executor.run({
+            'layout': lambda: failing_stage(ValueError('layout'), 0.1),
+            'mfd': lambda: failing_stage(KeyError('mfd'), 0),
+            'ocr': slow_stage,
+        })
+    # 抛出异常时慢阶段已经结束，不会在后台继续使用模型
+    assert sorted(map(str, finished)) == sorted(map(str, [KeyError, ValueError, 'slow']))
+    executor.shutdown()
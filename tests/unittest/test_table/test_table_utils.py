@@ -0,0 +1,91 @@
+import threading
+import time
+
+import pytest
+
+from magic_pdf.model.sub_modules.table.table_utils import (
+    TableDeadlineRunner, get_table_ocr_result)
+
+
+def sleeping_fn(seconds, result):
+    time.sleep(seconds)
+    return result
+
+
+def test_table_deadline_runner_returns_result():
+    runner = TableDeadlineRunner(max_time=1)
+    assert runner.run(sleeping_fn, 0, '<table></table>') == '<table></table>'
+    assert runner.pop_stats() == {'timeouts': 0, 'skipped': 0}
+
+
+def test_table_deadline_runner_timeout():
+    runner = TableDeadlineRunner(max_time=0.1)
+    start = time.time()
+    assert runner.run(sleeping_fn, 0.5, '<table></table>') is None
+    assert time.time() - start < 0.4
+    assert runner.timeouts == 1
+
+
+def test_table_deadline_runner_deadline_override():
+    runner = TableDeadlineRunner(max_time=0.1)
+    # StructEqTable按批数放宽deadline
+    assert runner.run(sleeping_fn, 0.2, 'ok', deadline=1) == 'ok'
+    assert runner.timeouts == 0
+
+
+def test_table_deadline_runner_waits_for_timed_out_call():
+    runner = TableDeadlineRunner(max_time=0.2)
+    assert runner.run(sleeping_fn, 0.3, 'stuck') is None
+    # 超时的调用在有界等待内结束，下一个表格不会被跳过
+    assert runner.run(sleeping_fn, 0, 'next') == 'next'
+    assert runner.pop_stats() == {'timeouts': 1, 'skipped': 0}
+
+
+def test_table_deadline_runner_busy_skip_and_recovery():
+    release = threading.Event()
+    runner = TableDeadlineRunner(max_time=0.1)
+    assert runner.run(release.wait, 5) is None
+    calls = []
+    assert runner.run(calls.append, 'skipped') is None
+    assert calls == []
+    assert runner.pop_stats() == {'timeouts': 1, 'skipped': 1}
+
+    release.set()
+    assert runner.run(sleeping_fn, 0, 'recovered') == 'recovered'
+    assert runner.pop_stats() == {'timeouts': 0, 'skipped': 0}
+
+
+TABLE_BBOX = [100, 200, 300, 400]
+
+
+@pytest.mark.parametrize('line_bbox, target_box', [
+    # 完全在表格内，平移到截图坐标
+    ([110, 210, 150, 230], [10, 10, 50, 30]),
+    # 中心在表格内但跨越左边和上边，裁剪到表格范围
+    ([90, 195, 140, 215], [0, 0, 40, 15]),
+    # 中心在表格内但跨越右边和下边
+    ([280, 390, 310, 405], [180, 190, 200, 200]),
+    # 中心恰好在表格边上仍然保留
+    ([80, 220, 120, 240], [0, 20, 20, 40]),
+    # 中心在表格外，跨越边缘的行也被丢弃
+    ([50, 210, 140, 230], None),
+    ([110, 390, 150, 420], None),
+    ([400, 210, 450, 230], None),
+])
+def test_get_table_ocr_result(line_bbox, target_box):
+    ocr_result = get_table_ocr_result([{'bbox': line_bbox, 'text': 'cell'}], TABLE_BBOX)
+    if target_box is None:
+        assert ocr_result == []
+    else:
+        x0, y0, x1, y1 = target_box
+        assert ocr_result == [[[[x0, y0], [x1, y0], [x1, y1], [x0, y1]], 'cell', 1.0]]
+
+
+def test_get_table_ocr_result_keeps_line_order():
+    text_lines = [
+        {'bbox': [110, 300, 150, 320], 'text': 'b'},
+        {'bbox': [0, 0, 50, 20], 'text': 'outside'},
+        {'bbox': [110, 210, 150, 230], 'text': 'a'},
+    ]
+    assert [text for _, text, _ in get_table_ocr_result(text_lines, TABLE_BBOX)] == ['b', 'a']
+    assert get_table_ocr_result([], TABLE_BBOX) == []
@@ -0,0 +1,60 @@
+import json
+import threading
+
+import pytest
+
+from magic_pdf.libs import config_reader
+from magic_pdf.tools import common, daemon
+
+
+@pytest.fixture
+def socket_path(tmp_path, monkeypatch):
+    socket_path = str(tmp_path / 'magic-pdf.sock')
+    config_file = tmp_path / 'magic-pdf.json'
+    config_file.write_text(json.dumps({'daemon-config': {'enable': True, 'socket_path': socket_path}}), encoding='utf-8')
+    monkeypatch.setattr(config_reader, 'CONFIG_FILE_NAME', str(config_file))
+    return socket_path
+
+
+def test_daemon_protocol(socket_path, monkeypatch):
+    # 守护进程未运行时在当前进程解析
+    assert daemon.submit_parse('out', 'a', b'%PDF', [], 'auto', False) is False
+
+    jobs = []
+
+    def fake_do_parse(pdf_bytes, **kwargs):
+        if kwargs['pdf_file_name'] == 'broken':
+            raise ValueError('broken pdf')
+        jobs.append((pdf_bytes, kwargs))
+
+    monkeypatch.setattr(common, 'do_parse', fake_do_parse)
+    server = daemon.ParseServer(socket_path)
+    server_thread = threading.Thread(target=server.serve_forever)
+    server_thread.start()
+    try:
+        assert daemon._request(socket_path, {'action': 'ping'})['status'] == 'ok'
+
+        assert daemon.submit_parse('out', 'a', b'%PDF-1.7', [], 'txt', False, lang='en') is True
+        pdf_bytes, kwargs = jobs[0]
+        assert pdf_bytes == b'%PDF-1.7'
+        assert kwargs['pdf_file_name'] == 'a' and kwargs['parse_method'] == 'txt' and kwargs['lang'] == 'en'
+
+        with pytest.raises(RuntimeError):
+            daemon.submit_parse('out', 'broken', b'%PDF', [], 'auto', False)
+
+        # 版本或配置不一致时拒绝，由客户端自己解析
+        for identity in [
+            dict(daemon.get_client_identity(), version='0.0.0'),
+            dict(daemon.get_client_identity(), config={'path': 'other.json', 'md5': 'other'}),
+            dict(daemon.get_client_identity(), use_inside_model=False),
+        ]:
+            message = {'action': 'parse', 'identity': identity, 'pdf_size': 4, 'kwargs': {}}
+            assert daemon._request(socket_path, message, b'%PDF')['status'] == 'rejected'
+        assert len(jobs) == 1
+
+        assert daemon._request(socket_path, {'action': 'shutdown'})['status'] == 'ok'
+        server_thread.join(timeout=10)
+        assert not server_thread.is_alive()
+    finally:
+        server.shutdown()
+        server.server_close()
@@ -19,6 +19,7 @@ from magic_pdf.libs.boxbase import (__is_overlaps_y_exceeds_threshold,
                                     get_bbox_in_boundary,
                                     get_minbox_if_overlap_by_ratio)
 from magic_pdf.libs.commons import get_top_percent_list, join_path, mymax
+from magic_pdf.libs import config_reader
 from magic_pdf.libs.config_reader import get_s3_config
 from magic_pdf.libs.path_utils import parse_s3path
 
@@ -535,6 +536,96 @@ def test_get_s3_config() -> None:
     assert convert_string_to_list(target_data) == list(get_s3_config(bucket_name))
 
 
+# 配置按文件修改缓存，返回副本
+def test_read_config_memoized(tmp_path, monkeypatch) -> None:
+    config_file = tmp_path / 'magic-pdf.json'
+    config_file.write_text('{"models-dir": "/tmp/models"}', encoding='utf-8')
+    monkeypatch.setattr(config_reader, 'CONFIG_FILE_NAME', str(config_file))
+
+    config = config_reader.read_config()
+    config['models-dir'] = 'changed'
+    assert config_reader.read_config() == {'models-dir': '/tmp/models'}
+
+    config_file.write_text('{"models-dir": "/data/magic/models"}', encoding='utf-8')
+    assert config_reader.read_config() == {'models-dir': '/data/magic/models'}
+
+
+# char按中心点填入span，同一行的两栏span互不干扰
+def test_fill_char_in_spans() -> None:
+    from magic_pdf.pdf_parse_union_core_v2 import fill_char_in_spans
+
+    def make_span(bbox):
+        return {'bbox': bbox, 'content': '', 'chars': [], 'height': bbox[3] - bbox[1], 'width': 10}
+
+    spans = [make_span([300, 100, 400, 112]), make_span([100, 100, 200, 112]), make_span([100, 113, 200, 125])]
+    chars = [{'c': c, 'bbox': (x, y, x + 6, y + 10)}
+             for c, x, y in [('b', 107, 101), ('d', 300, 101), ('a', 100, 101), ('c', 120, 101), ('e', 100, 114)]]
+    empty_spans = fill_char_in_spans(spans, chars)
+
+    assert [span['content'] for span in spans] == ['d', 'ab c', 'e']
+    assert empty_spans == []
+
+
+# 重复绘制的相同char与原list.index实现的拼接结果一致
+def test_chars_to_content_duplicate_chars() -> None:
+    from magic_pdf.pdf_parse_union_core_v2 import chars_to_content
+
+    def index_content(chars):
+        chars = sorted(chars, key=lambda x: (x['bbox'][0] + x['bbox'][2]) / 2)
+        char_avg_width = sum([char['bbox'][2] - char['bbox'][0] for char in chars]) / len(chars)
+        content = ''
+        for char in chars:
+            if char['bbox'][0] - chars[chars.index(char) - 1]['bbox'][2] > char_avg_width:
+                content += ' '
+            content += char['c']
+        return content
+
+    # 加粗文字常被绘制两次，b与d各有一个完全相同的副本，副本与第一个char之前的char比较，因此前面也有空格
+    chars = [{'c': c, 'bbox': (x, 0, x + 6, 10)} for c, x in [('a', 100), ('b', 120), ('b', 120), ('c', 127), ('d', 150), ('d', 150)]]
+    span = {'chars': chars}
+    chars_to_content(span)
+    assert span['content'] == index_content(chars) == 'a b bc d d'
+
+
+# 线程预算按配置和cpu数计算，并发阶段平分线程
+@pytest.mark.parametrize('threads_config, stage_workers, cpu_count, target', [
+    ({'total_threads': 8}, 1, 32, (8, 1, 8, 1)),
+    ({'total_threads': 8}, 2, 32, (8, 2, 4, 1)),
+    ({'total_threads': 8}, 3, 32, (8, 3, 2, 1)),
+    ({'total_threads': 2}, 4, 32, (2, 4, 1, 1)),
+    ({'total_threads': 4, 'interop_threads': 2}, 1, 32, (4, 1, 4, 2)),
+    ({}, 1, 16, (16, 1, 16, 1)),
+    ({}, 2, 16, (16, 2, 8, 1)),
+    ({'worker_processes': 4}, 2, 16, (4, 2, 2, 1)),
+    ({'total_threads': 0, 'worker_processes': 3}, 1, 16, (5, 1, 5, 1)),
+    ({'total_threads': None, 'worker_processes': None, 'interop_threads': None}, None, 16, (16, 1, 16, 1)),
+    ({}, 0, 16, (16, 1, 16, 1)),
+    ({'worker_processes': 32}, 1, 16, (1, 1, 1, 1)),
+    ({}, 1, 1, (1, 1, 1, 1)),
+    ({}, 4, 1, (1, 4, 1, 1)),
+    ({}, 1, None, (1, 1, 1, 1)),
+])
+def test_compute_thread_budget(monkeypatch, threads_config, stage_workers, cpu_count, target) -> None:
+    from magic_pdf.libs import thread_budget
+
+    monkeypatch.setattr(thread_budget.os, 'cpu_count', lambda: cpu_count)
+    budget = thread_budget.compute_thread_budget(threads_config, stage_workers)
+    assert (budget['total_threads'], budget['stage_workers'], budget['torch_threads'], budget['torch_interop_threads']) == target
+    assert budget['paddle_threads'] == budget['opencv_threads'] == budget['torch_threads']
+
+
+# 未配置threads-config时不修改各后端的线程数
+def test_apply_thread_budget_without_config(monkeypatch) -> None:
+    from magic_pdf.libs import thread_budget
+
+    monkeypatch.setattr(thread_budget, '_thread_budget', None)
+    for env_var in thread_budget.THREAD_ENV_VARS:
+        monkeypatch.delenv(env_var, raising=False)
+    assert thread_budget.apply_thread_budget(None, 2) is None
+    assert thread_budget.get_thread_budget() is None
+    assert not any(env_var in os.environ for env_var in thread_budget.THREAD_ENV_VARS)
+
+
 def convert_string_to_list(s):
     cleaned_s = s.strip("'")
     items = cleaned_s.split(',')